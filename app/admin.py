@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.core.files.uploadedfile import UploadedFile
 from .models import (
     DownloadEmail,
     Contact,
@@ -9,8 +10,11 @@ from .models import (
     CompanyInformation, 
     CompanyFAQ,
     CompanyBlog,
-    ProductBlog
+    ProductBlog,
+    MediaUpload,
+    SlugRedirect,
 )
+from .uploads import QUEUED_FIELDS, enqueue
 
 
 # -------------------------------------------------------------------
@@ -70,6 +74,45 @@ class ProductAdmin(admin.ModelAdmin):
                 'schema_rating', 'schema_review_count'
             )
         }),
+        ('Translations', {
+            'classes': ('collapse',),
+            'description': 'Per-language overrides of the name, descriptions and meta fields; '
+                           'anything left out falls back to English.',
+            'fields': ('translations',),
+        }),
+    )
+
+    def save_model(self, request, obj, form, change):
+        # New video/COA/TDS files are staged locally and uploaded to remote
+        # storage by the upload queue; the field keeps its old value until then.
+        queued = {}
+        for field in QUEUED_FIELDS:
+            value = form.cleaned_data.get(field)
+            if field in form.changed_data and isinstance(value, UploadedFile):
+                queued[field] = value
+                setattr(obj, field, form.initial.get(field) or None)
+        super().save_model(request, obj, form, change)
+        for field, upload in queued.items():
+            enqueue(obj, field, upload)
+        if queued:
+            self.message_user(
+                request,
+                f"Uploading {', '.join(queued)} in the background; the product will link to the new files once done."
+            )
+
+
+# -------------------------------------------------------------------
+# Media Upload Queue Admin
+# -------------------------------------------------------------------
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ('product', 'field_name', 'filename', 'status', 'attempts', 'updated_at')
+    list_filter = ('status', 'field_name')
+    search_fields = ('product__name', 'filename')
+    list_select_related = ('product',)
+    readonly_fields = (
+        'product', 'field_name', 'filename', 'staged_name', 'staged_on', 'remote_name', 'size',
+        'status', 'attempts', 'last_error', 'next_attempt_at', 'created_at', 'updated_at'
     )
 
 
@@ -88,12 +131,16 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 # -------------------------------------------------------------------
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'company', 'product', 'created_at', 'is_read')
+    list_display = ('name', 'email', 'company', 'product_interest', 'created_at', 'is_read')
     list_filter = ('product', 'is_read', 'created_at')
     search_fields = ('name', 'email', 'company', 'message')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
 
+    def product_interest(self, obj):
+        return obj.get_product_display_name
+    product_interest.short_description = "Product Interest"
+
 
 # -------------------------------------------------------------------
 # DownloadEmail Admin
@@ -112,12 +159,14 @@ class DownloadEmailAdmin(admin.ModelAdmin):
 @admin.register(ProductFAQ)
 class ProductFAQAdmin(admin.ModelAdmin):
     list_display = ('product', 'question')
+    list_select_related = ('product',)
     search_fields = ('product__name', 'question')
 
 
 @admin.register(ProductApplication)
 class ProductApplicationAdmin(admin.ModelAdmin):
     list_display = ('product', 'title')
+    list_select_related = ('product',)
     search_fields = ('product__name', 'title')
 
 
@@ -146,6 +195,7 @@ class CompanyInformationAdmin(admin.ModelAdmin):
 @admin.register(CompanyFAQ)
 class CompanyFAQAdmin(admin.ModelAdmin):
     list_display = ('question', 'get_company_name')
+    list_select_related = ('CompanyInformation',)
     search_fields = ('question', 'answer')
 
     def get_company_name(self, obj):
@@ -156,6 +206,7 @@ class CompanyFAQAdmin(admin.ModelAdmin):
 @admin.register(CompanyBlog)
 class CompanyBlogAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'company_name', 'published_at')
+    list_select_related = ('CompanyBlog',)
     search_fields = ('title', 'content', 'author')
     prepopulated_fields = {'slug': ('title',)}
     list_filter = ('published_at',)
@@ -163,6 +214,7 @@ class CompanyBlogAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('CompanyBlog', 'title', 'slug', 'content', 'author', 'published_at', 'image')}),
         ('SEO', {'fields': ('meta_title', 'meta_description', 'meta_keywords')}),
+        ('Translations', {'classes': ('collapse',), 'fields': ('translations',)}),
     )
 
     def company_name(self, obj):
@@ -173,6 +225,7 @@ class CompanyBlogAdmin(admin.ModelAdmin):
 @admin.register(ProductBlog)
 class ProductBlogAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'product_name', 'published_at')
+    list_select_related = ('product',)
     search_fields = ('title', 'content', 'author')
     prepopulated_fields = {'slug': ('title',)}
     list_filter = ('published_at',)
@@ -180,8 +233,20 @@ class ProductBlogAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('product', 'title', 'slug', 'content', 'author', 'published_at')}),
         ('SEO', {'fields': ('meta_title', 'meta_description', 'meta_keywords')}),
+        ('Translations', {'classes': ('collapse',), 'fields': ('translations',)}),
     )
 
     def product_name(self, obj):
         return obj.product.name
     product_name.short_description = "Product"
+
+
+# -------------------------------------------------------------------
+# Slug redirects (old product/blog URLs)
+# -------------------------------------------------------------------
+@admin.register(SlugRedirect)
+class SlugRedirectAdmin(admin.ModelAdmin):
+    list_display = ('old_slug', 'new_slug', 'kind', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('old_slug', 'new_slug')
+    readonly_fields = ('created_at',)
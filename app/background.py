@@ -0,0 +1,52 @@
+"""
+Small shared thread pool for work that must stay off the request thread.
+
+Jobs run in a process-local ThreadPoolExecutor. Each job closes the database
+connections it opened so worker threads never leak connections. Set
+``BACKGROUND_TASKS_EAGER = True`` (e.g. in tests) to run jobs inline.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='app-background',
+                )
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+    finally:
+        connections.close_all()
+
+
+def submit(fn, *args, **kwargs):
+    """Schedule ``fn(*args, **kwargs)`` and return a Future."""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+            future.set_exception(e)
+        return future
+    return _get_executor().submit(_run, fn, args, kwargs)
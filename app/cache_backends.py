@@ -0,0 +1,29 @@
+"""
+Cache backends that count hits and misses for app.perf.
+
+``get_many`` on these backends is BaseCache's loop over ``get``, so counting
+in ``get`` covers both.
+"""
+from django.core.cache.backends import filebased, locmem
+
+from . import perf
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            perf.record_cache(0, 1)
+            return default
+        perf.record_cache(1, 0)
+        return value
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    pass
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
@@ -0,0 +1,133 @@
+"""
+Versioned cache for data shown on most pages.
+
+Every key embeds a content version number. Saving or deleting any of the
+cached models bumps the version (see app.signals), so all entries are
+replaced together and nothing needs to be deleted one by one. The version
+lives in the ``state`` cache, which only holds it, the facet index, the
+related-content revisions and the locks around them, and so never culls them; if it is lost anyway it
+restarts from the clock, above every version already used. ``warm()``
+fills them in at worker start (gunicorn ``post_worker_init``) and from
+``manage.py warm_caches``.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.connection import ConnectionProxy
+
+from .models import CompanyBlog, CompanyInformation, Product, ProductBlog, ProductCategory
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'content-version'
+_NONE = '__none__'
+
+state = ConnectionProxy(caches, 'state')
+
+
+def _seed():
+    return time.time_ns() // 1000
+
+
+def content_version():
+    version = state.get(VERSION_KEY)
+    if version is None:
+        state.add(VERSION_KEY, _seed(), None)
+        version = state.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Retire every entry by moving to a new version."""
+    try:
+        state.incr(VERSION_KEY)
+    except ValueError:
+        state.add(VERSION_KEY, _seed(), None)
+
+
+class LockTimeout(Exception):
+    """A state lock was still held by someone else after waiting for it."""
+
+
+@contextmanager
+def state_lock(key, timeout):
+    """
+    Hold ``key`` in the state cache for at most ``timeout`` seconds.
+
+    The key stores a token of this holder and is only deleted while it
+    still does, so a holder that outlived its timeout never releases the
+    next one's lock. Waits up to ``timeout`` for the lock, then raises
+    LockTimeout.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while not state.add(key, token, timeout):
+        if time.monotonic() > deadline:
+            raise LockTimeout(key)
+        time.sleep(0.1)
+    try:
+        yield
+    finally:
+        if state.get(key) == token:
+            state.delete(key)
+
+
+def cached(name, build, force=False):
+    key = f'content:{content_version()}:{name}'
+    value = None if force else cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, _NONE if value is None else value, settings.CONTENT_CACHE_TIMEOUT)
+    return None if value == _NONE else value
+
+
+def company_info(force=False):
+    return cached('company-info', CompanyInformation.objects.first, force)
+
+
+def categories(force=False):
+    return cached('categories', lambda: list(ProductCategory.objects.all()), force)
+
+
+def active_products():
+    """The products the catalog lists; the facet index covers the same ones."""
+    return Product.objects.filter(is_active=True).select_related('category')
+
+
+def product_list(force=False):
+    return cached('products', lambda: list(active_products()), force)
+
+
+def product_names(force=False):
+    """Active products as an ordered {slug: name} dict (contact form choices and lookups)."""
+    return cached('product-names', lambda: dict(
+        Product.objects.filter(is_active=True).values_list('slug', 'name')
+    ), force)
+
+
+SITEMAP_QUERYSETS = {
+    'products': lambda: Product.objects.filter(is_active=True),
+    'company_blogs': lambda: CompanyBlog.objects.all(),
+    'product_blogs': lambda: ProductBlog.objects.all(),
+}
+
+
+def sitemap_items(section, force=False):
+    return cached(f'sitemap:{section}', lambda: list(SITEMAP_QUERYSETS[section]()), force)
+
+
+def warm(force=False):
+    """Populate every cached entry; ``force`` rebuilds ones already present."""
+    start = time.perf_counter()
+    company_info(force)
+    categories(force)
+    product_list(force)
+    product_names(force)
+    for section in SITEMAP_QUERYSETS:
+        sitemap_items(section, force)
+    logger.info('Warmed content caches (version %s) in %.1f ms',
+                content_version(), (time.perf_counter() - start) * 1000)
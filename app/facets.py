@@ -0,0 +1,337 @@
+"""
+Facet counts and filters for the product catalog.
+
+Buyers narrow the catalog by category, grade, form, packaging and ISO
+certification. Each active product gets a bit position. For each facet
+value, the index keeps an int with a bit set for every product that has
+that value, plus the count of those products. A selection is then a few
+ORs and ANDs of those ints, and the count for each option under a
+selection is one ``int.bit_count()``. No GROUP BY runs per request.
+
+The free-text fields hold lists such as "IP/BP/USP" or "Powder/Granules",
+so values are split on ``,``, ``/`` and ``;`` and matched without regard
+to case.
+
+A snapshot of the index lives in the ``state`` cache (see app.caching),
+and each worker keeps a local copy. When a product is saved or deleted,
+``update`` does not rewrite the snapshot. It records the product's pk under
+the next revision number and bumps the revision. Workers that are behind
+re-read just those products and move their bits. Every ``COMPACT_EVERY``
+revisions the snapshot is written again. ``manage.py build_facets``
+rebuilds the index from scratch. If the snapshot or a change it needs is
+missing, ``current`` returns None and queues a rebuild in the background;
+until it is back, pages match selections with ``matches`` and show no
+counts.
+"""
+import copy
+import logging
+import re
+import time
+
+from django.db import transaction
+from django.utils.text import slugify
+from django.utils.translation import gettext_noop
+
+from . import background
+from .caching import active_products, state, state_lock
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'facet-index'
+REVISION_KEY = 'facet-revision'
+REBUILD_KEY = 'facet-rebuild-queued'
+LOCK_KEY = 'facet-lock'
+LOCK_TIMEOUT = 60
+COMPACT_EVERY = 100
+CHUNK_SIZE = 2000
+
+# Labels are translated in the template
+FACETS = {
+    'category': gettext_noop('Category'),
+    'grade': gettext_noop('Grade'),
+    'form': gettext_noop('Form'),
+    'packaging': gettext_noop('Packaging'),
+    'iso_certifications': gettext_noop('ISO certification'),
+}
+_SPLIT_RE = re.compile(r'\s*[,/;]\s*')
+NOT_APPLICABLE = frozenset({'na', 'n/a', 'none', '-'})
+
+_local = {}
+
+
+def queryset():
+    return active_products().only(
+        'pk', 'category__slug', 'category__name', *list(FACETS)[1:])
+
+
+def product_values(product):
+    """``{facet: [(key, label), ...]}`` for one product."""
+    values = {}
+    if product.category_id:
+        values['category'] = [(product.category.slug, product.category.name)]
+    for facet in list(FACETS)[1:]:
+        text = (getattr(product, facet) or '').strip()
+        if not text or text.casefold() in NOT_APPLICABLE:
+            continue
+        values[facet] = [(slugify(part), part) for part in _SPLIT_RE.split(text) if slugify(part)]
+    return values
+
+
+def selection(params):
+    """The facet selections in ``params`` as ``{facet: {key, ...}}``."""
+    return {facet: set(params.getlist(facet)) for facet in FACETS if params.getlist(facet)}
+
+
+def matches(product, selected):
+    """Whether ``product`` has one of the selected keys of every facet (no index needed)."""
+    values = product_values(product)
+    return all({key for key, _ in values.get(facet, ())} & keys for facet, keys in selected.items())
+
+
+# ------------------------------------------------------------------
+# Index
+# ------------------------------------------------------------------
+class FacetIndex:
+    """Bitsets of product positions per facet value, with their counts."""
+
+    snapshot = 0  # for indexes pickled before snapshots were tracked
+
+    def __init__(self):
+        self.revision = 0
+        self.snapshot = 0   # revision of the snapshot in the state cache
+        self.ids = []       # bit position -> product pk (None when free)
+        self.pos = {}       # product pk -> bit position
+        self.free = []      # positions of removed products, reused first
+        self.all = 0        # bits of every indexed product
+        self.bits = {facet: {} for facet in FACETS}
+        self.counts = {facet: {} for facet in FACETS}
+        self.labels = {facet: {} for facet in FACETS}
+        self.keys = {}      # product pk -> {facet: keys}, for removal
+
+    def add(self, pk, values):
+        if self.free:
+            position = self.free.pop()
+            self.ids[position] = pk
+        else:
+            position = len(self.ids)
+            self.ids.append(pk)
+        self.pos[pk] = position
+        bit = 1 << position
+        self.all |= bit
+        self.keys[pk] = {}
+        for facet, pairs in values.items():
+            keys = self.keys[pk][facet] = {key for key, _ in pairs}
+            for key, label in pairs:
+                self.labels[facet].setdefault(key, label)
+            for key in keys:
+                self.bits[facet][key] = self.bits[facet].get(key, 0) | bit
+                self.counts[facet][key] = self.counts[facet].get(key, 0) + 1
+
+    def remove(self, pk):
+        position = self.pos.pop(pk, None)
+        if position is None:
+            return
+        bit = 1 << position
+        self.all &= ~bit
+        for facet, keys in self.keys.pop(pk).items():
+            for key in keys:
+                self.bits[facet][key] &= ~bit
+                self.counts[facet][key] -= 1
+                if not self.counts[facet][key]:
+                    del self.bits[facet][key], self.counts[facet][key], self.labels[facet][key]
+        self.ids[position] = None
+        self.free.append(position)
+
+    def copy(self):
+        """A copy that can be changed while requests still read this one."""
+        clone = copy.copy(self)
+        clone.ids, clone.pos, clone.free, clone.keys = list(self.ids), dict(self.pos), list(self.free), dict(self.keys)
+        for name in ('bits', 'counts', 'labels'):
+            setattr(clone, name, {facet: dict(values) for facet, values in getattr(self, name).items()})
+        return clone
+
+    def _masks(self, selected):
+        """One mask per selected facet; a key no product has matches nothing."""
+        masks = {}
+        for facet, keys in selected.items():
+            mask = 0
+            for key in keys:
+                mask |= self.bits.get(facet, {}).get(key, 0)
+            masks[facet] = mask
+        return masks
+
+    def match(self, selected):
+        """Bits of the products matching every facet (any of its selected values)."""
+        mask = self.all
+        for facet_mask in self._masks(selected).values():
+            mask &= facet_mask
+        return mask
+
+    def mask(self, pks):
+        """Bits of the indexed products among ``pks``."""
+        mask = 0
+        for pk in pks:
+            position = self.pos.get(pk)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def pks(self, mask):
+        """Product pks whose bits are set in ``mask``."""
+        return {self.ids[position] for position, bit in enumerate(reversed(bin(mask)[2:])) if bit == '1'}
+
+    def options(self, selected, within=None):
+        """
+        ``[{'name', 'label', 'options': [{'key', 'label', 'count', 'selected'}]}]``.
+
+        Each option's count is the number of products it would give with
+        the selections of the *other* facets, so options in one facet can
+        be combined. ``within`` limits the counts to the products in that
+        mask (those left by the spec filters).
+        """
+        masks = self._masks(selected)
+        base = self.all if within is None else self.all & within
+        result = []
+        for facet, label in FACETS.items():
+            if masks or within is not None:
+                others = base
+                for other, mask in masks.items():
+                    if other != facet:
+                        others &= mask
+                counts = {key: (bits & others).bit_count() for key, bits in self.bits[facet].items()}
+            else:
+                counts = self.counts[facet]
+            chosen = selected.get(facet, set())
+            options = [
+                {'key': key, 'label': self.labels[facet][key], 'count': count, 'selected': key in chosen}
+                for key, count in counts.items() if count or key in chosen
+            ]
+            if options:
+                options.sort(key=lambda option: (-option['count'], option['label'].casefold()))
+                result.append({'name': facet, 'label': label, 'options': options})
+        return result
+
+
+# ------------------------------------------------------------------
+# Storage
+# ------------------------------------------------------------------
+def _change_key(revision):
+    return f'facet-change:{revision}'
+
+
+def _save(index):
+    """Write ``index`` as the snapshot and make it current."""
+    index.snapshot = index.revision
+    state.set(INDEX_KEY, index, None)
+    state.set(REVISION_KEY, index.revision, None)
+    _local['index'] = index
+
+
+def _rebuild():
+    previous = state.get(REVISION_KEY)
+    index = FacetIndex()
+    for product in queryset().order_by('pk').iterator(chunk_size=CHUNK_SIZE):
+        index.add(product.pk, product_values(product))
+    # Revisions restart from the clock if the old one was lost
+    index.revision = previous + 1 if previous is not None else time.time_ns() // 1000
+    old = state.get(INDEX_KEY)
+    _save(index)
+    if old is not None and previous is not None and previous - old.snapshot <= 2 * COMPACT_EVERY:
+        state.delete_many([_change_key(r) for r in range(old.snapshot + 1, previous + 1)])
+    return index
+
+
+def rebuild():
+    """Index every active product from scratch."""
+    start = time.perf_counter()
+    with state_lock(LOCK_KEY, LOCK_TIMEOUT):
+        index = _rebuild()
+    logger.info('Rebuilt facet index: %d products in %.1f ms',
+                len(index.pos), (time.perf_counter() - start) * 1000)
+    return index
+
+
+def _apply(index, pks):
+    """Move the bits of ``pks`` in ``index`` to match the database."""
+    products = {product.pk: product for product in queryset().filter(pk__in=pks)}
+    for pk in pks:
+        index.remove(pk)
+        if pk in products:
+            index.add(pk, product_values(products[pk]))
+
+
+def _catch_up(index, revision):
+    """A copy of ``index`` at ``revision``, or None if a change was evicted."""
+    if index.revision >= revision:
+        return index
+    keys = [_change_key(r) for r in range(index.revision + 1, revision + 1)]
+    if len(keys) > 2 * COMPACT_EVERY:
+        return None
+    changes = state.get_many(keys)
+    if len(changes) < len(keys):
+        return None
+    index = index.copy()
+    _apply(index, set(changes.values()))
+    index.revision = revision
+    return index
+
+
+def _sync():
+    """This worker's index brought up to the current revision, or None."""
+    revision = state.get(REVISION_KEY)
+    if revision is None:
+        return None
+    index = _local.get('index')
+    if index is not None and index.revision == revision:
+        return index
+    if index is not None and index.revision < revision:
+        index = _catch_up(index, revision)
+    if index is None or index.revision < revision:
+        snapshot = state.get(INDEX_KEY)
+        index = _catch_up(snapshot, revision) if snapshot is not None else None
+    if index is not None:
+        _local['index'] = index
+    return index
+
+
+def current():
+    """
+    This worker's copy of the index, caught up with changes made by other
+    processes; None while a lost index is rebuilt in the background.
+    """
+    index = _sync()
+    if index is None:
+        _local.pop('index', None)
+        if state.add(REBUILD_KEY, 1, LOCK_TIMEOUT):
+            background.submit(rebuild)
+    return index
+
+
+def update(pk):
+    """Move product ``pk``'s bits after it was saved or deleted."""
+    with state_lock(LOCK_KEY, LOCK_TIMEOUT):
+        index = _sync()
+        if index is None:
+            _rebuild()
+            return
+        index = index.copy()
+        _apply(index, {pk})
+        index.revision += 1
+        # The change is recorded before the revision that points at it
+        state.set(_change_key(index.revision), pk, None)
+        if index.revision - index.snapshot >= COMPACT_EVERY:
+            replayed = range(max(index.snapshot, index.revision - 2 * COMPACT_EVERY) + 1, index.revision + 1)
+            _save(index)
+            state.delete_many([_change_key(r) for r in replayed])
+        else:
+            state.set(REVISION_KEY, index.revision, None)
+            _local['index'] = index
+
+
+def schedule_update(pk):
+    """Queue ``update`` to run once the current transaction commits."""
+    transaction.on_commit(lambda: background.submit(update, pk))
+
+
+def schedule_rebuild():
+    transaction.on_commit(lambda: background.submit(rebuild))
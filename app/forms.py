@@ -1,8 +1,24 @@
 # forms.py
 from django import forms
+from . import caching
 from .models import Contact
 
+
+def product_choices():
+    # Cached and versioned with the catalog, so rendering the form runs no query.
+    return [
+        ('', 'Select a chemical product'),
+        *caching.product_names().items(),
+        (Contact.OTHER_PRODUCT, Contact.OTHER_PRODUCT_LABEL),
+    ]
+
+
 class ContactForm(forms.ModelForm):
+    product = forms.ChoiceField(
+        choices=product_choices, required=False, label='Product Interest',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
     class Meta:
         model = Contact
         fields = ['name', 'email', 'company', 'phone', 'product', 'message']
@@ -25,9 +41,6 @@ class ContactForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Enter your phone number (optional)'
             }),
-            'product': forms.Select(attrs={
-                'class': 'form-control'
-            }),
             'message': forms.Textarea(attrs={
                 'class': 'form-control',
                 'placeholder': 'Tell us about your requirements...',
@@ -0,0 +1,148 @@
+"""
+HTTP caching policy for a CDN or reverse proxy in front of the site.
+
+``cache_policy`` sets ``Cache-Control`` (max-age, stale-while-revalidate,
+stale-if-error) on a view's response when it is safe to share: an anonymous
+GET or HEAD that set no session and used no CSRF token. Anything else is
+marked private.
+
+Views call ``tag(request, obj, ...)`` for the rows they render; the keys go
+out in a ``Surrogate-Key`` header. When one of those models is saved or
+deleted, ``purge_for(instance)`` hands the affected keys to the purger named
+by ``HTTP_CACHE_PURGER`` once the transaction commits.
+"""
+import logging
+import urllib.request
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+from . import background
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+CACHEABLE_STATUSES = (200, 203, 204, 300, 301, 404, 410)
+
+# Keys for pages that list many rows of a model rather than one row
+PRODUCT_LIST = 'product-list'
+BLOG_LIST = 'blog-list'
+SITEMAP = 'sitemap'
+
+
+def surrogate_key(obj):
+    return f'{obj._meta.model_name}-{obj.pk}'
+
+
+def tag(request, *items):
+    """Tag the response to ``request`` with model instances or plain keys."""
+    keys = request.__dict__.setdefault('surrogate_keys', set())
+    for item in items:
+        if item is None:
+            continue
+        keys.add(item if isinstance(item, str) else surrogate_key(item))
+
+
+def is_shareable(request, response):
+    return (
+        request.method in ('GET', 'HEAD')
+        and response.status_code in CACHEABLE_STATUSES
+        and getattr(request, 'session_free', False)
+        and not request.session.modified
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not response.cookies
+    )
+
+
+def cache_policy(max_age, stale_while_revalidate=0, stale_if_error=0, keys=()):
+    """Apply a shared caching policy and ``Surrogate-Key`` header to a view."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.has_header('Cache-Control'):
+                return response
+            if not is_shareable(request, response):
+                patch_cache_control(response, private=True, max_age=0)
+                return response
+            directives = {'public': True, 'max_age': max_age}
+            if stale_while_revalidate:
+                directives['stale_while_revalidate'] = stale_while_revalidate
+            if stale_if_error:
+                directives['stale_if_error'] = stale_if_error
+            patch_cache_control(response, **directives)
+            tag(request, *keys)
+            surrogate_keys = getattr(request, 'surrogate_keys', None)
+            if surrogate_keys:
+                response[SURROGATE_KEY_HEADER] = ' '.join(sorted(surrogate_keys))
+            return response
+        return wrapped
+    return decorator
+
+
+# ------------------------------------------------------------------
+# Purging
+# ------------------------------------------------------------------
+def keys_for(instance):
+    """Surrogate keys whose pages change when ``instance`` changes."""
+    keys = {surrogate_key(instance)}
+    name = instance._meta.model_name
+    if name == 'product':
+        keys |= {PRODUCT_LIST, SITEMAP, f'productcategory-{instance.category_id}'}
+    elif name == 'productcategory':
+        keys.add(PRODUCT_LIST)
+    elif name in ('companyblog', 'productblog'):
+        keys |= {BLOG_LIST, SITEMAP}
+        if name == 'productblog':
+            keys.add(f'product-{instance.product_id}')
+    elif name in ('productfaq', 'productapplication'):
+        # Rendered on the product page only
+        keys.add(f'product-{instance.product_id}')
+    return keys
+
+
+class LoggingPurger:
+    """Default purger: records what would be purged."""
+
+    def purge(self, keys):
+        logger.info('Cache purge: %s', ' '.join(keys))
+
+
+class HTTPPurger:
+    """
+    Send ``PURGE`` with a ``Surrogate-Key`` header to ``HTTP_CACHE_PURGE_URL``
+    (Varnish xkey / Fastly-style purge endpoint).
+    """
+
+    def purge(self, keys):
+        request = urllib.request.Request(
+            settings.HTTP_CACHE_PURGE_URL, method='PURGE',
+            headers={SURROGATE_KEY_HEADER: ' '.join(keys)},
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+        logger.info('Purged %s', ' '.join(keys))
+
+
+class LocalProxyPurger:
+    """Purge the in-process ``app.localproxy`` stand-in."""
+
+    def purge(self, keys):
+        from .localproxy import default_store
+        default_store.purge(keys)
+
+
+@lru_cache(maxsize=None)
+def get_purger():
+    return import_string(settings.HTTP_CACHE_PURGER)()
+
+
+def purge(keys):
+    if keys:
+        background.submit(get_purger().purge, sorted(keys))
+
+
+def purge_for(instance):
+    purge(keys_for(instance))
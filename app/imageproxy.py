@@ -0,0 +1,93 @@
+"""
+Local cache for remote product images (Google Drive / googleusercontent).
+
+The first request for ``/img/<pk>/<key>.webp`` downloads the product's remote
+image, resizes it and stores it under ``image_proxy/<key>/<content-hash>.webp``
+in MEDIA_ROOT. Later requests are served straight from disk with immutable
+cache headers, so catalog pages no longer wait on third-party image hosts.
+"""
+import hashlib
+import logging
+import os
+import re
+import urllib.request
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DRIVE_FILE_RE = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+
+
+def normalize_image_url(url):
+    """Convert a Google Drive share link to a direct, embeddable URL."""
+    if not url:
+        return None
+    match = DRIVE_FILE_RE.search(url)
+    if match:
+        return f"https://drive.google.com/uc?export=view&id={match.group(1)}"
+    return url
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:16]
+
+
+def _proxy_dir(key):
+    return os.path.join(settings.MEDIA_ROOT, 'image_proxy', key)
+
+
+def cached_path(key):
+    """Return the stored file for ``key``, or None if it was never fetched."""
+    try:
+        names = os.listdir(_proxy_dir(key))
+    except FileNotFoundError:
+        return None
+    names = [n for n in names if n.endswith('.webp')]
+    return os.path.join(_proxy_dir(key), names[0]) if names else None
+
+
+def fetch_image(url, timeout=None, max_bytes=None):
+    """Download ``url`` and return its bytes."""
+    timeout = timeout or getattr(settings, 'IMAGE_PROXY_TIMEOUT', 10)
+    max_bytes = max_bytes or getattr(settings, 'IMAGE_PROXY_MAX_BYTES', 15 * 1024 * 1024)
+    request = urllib.request.Request(url, headers={'User-Agent': 'VasudevImageProxy/1.0'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f'Image at {url} is larger than {max_bytes} bytes')
+    return data
+
+
+def store_image(key, data):
+    """Resize ``data`` to WebP and store it under its content hash."""
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    max_width = getattr(settings, 'IMAGE_PROXY_MAX_WIDTH', 1280)
+    if image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=82)
+    encoded = buffer.getvalue()
+
+    directory = _proxy_dir(key)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha256(encoded).hexdigest()[:16] + '.webp')
+    tmp_path = f'{path}.{os.getpid()}.part'
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_or_fetch(url):
+    """Return the local path for ``url``, downloading it the first time."""
+    key = url_key(url)
+    path = cached_path(key)
+    if path is None:
+        path = store_image(key, fetch_image(url))
+        logger.info('Cached remote image %s as %s', url, path)
+    return path
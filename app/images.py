@@ -0,0 +1,160 @@
+"""
+Responsive image derivatives for uploaded product and blog images.
+
+For every original, ``generate_derivatives`` writes resized copies in each
+configured format next to the file (``photo.640w.webp``, ``photo.640w.jpg``,
+...) plus ``photo.manifest.json`` describing them. Templates read the
+manifest through ``get_manifest`` to build ``srcset`` attributes. Saving a
+product or blog post queues ``build_later`` rather than resizing inside the
+admin request.
+"""
+import base64
+import json
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from . import background, caching
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_CACHE_PREFIX = 'image-manifest:'
+PLACEHOLDER_WIDTH = 16
+
+# Pillow format name and MIME type for each derivative format
+FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def derivative_widths():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 960, 1280))
+
+
+def derivative_formats():
+    """Configured formats the installed Pillow can encode; JPEG is always last."""
+    formats = getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('webp', 'jpeg'))
+    usable = [f for f in formats if f != 'jpeg' and features.check(f)]
+    return usable + ['jpeg']
+
+
+def manifest_name(name):
+    return os.path.splitext(name)[0] + '.manifest.json'
+
+
+def _encode(image, fmt):
+    pil_format, _mime = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    options = {'quality': 80}
+    if pil_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(storage, name):
+    """Create resized copies of ``name`` in ``storage`` and return the manifest."""
+    with storage.open(name, 'rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    width, height = original.size
+    stem = os.path.splitext(name)[0]
+    # Never larger than the largest configured width, nor than the original
+    configured = derivative_widths()
+    widths = sorted({w for w in configured if w < width} | {min(width, max(configured))})
+    manifest = {'width': width, 'height': height, 'sources': {}}
+
+    for fmt in derivative_formats():
+        entries = []
+        for w in widths:
+            h = max(1, round(height * w / width))
+            resized = original if w == width else original.resize((w, h), Image.LANCZOS)
+            target = f'{stem}.{w}w.{EXTENSIONS[fmt]}'
+            if storage.exists(target):
+                storage.delete(target)
+            saved = storage.save(target, ContentFile(_encode(resized, fmt)))
+            entries.append({'width': w, 'height': h, 'name': saved})
+        manifest['sources'][fmt] = entries
+
+    target = manifest_name(name)
+    if storage.exists(target):
+        storage.delete(target)
+    storage.save(target, ContentFile(json.dumps(manifest).encode()))
+    cache.set(MANIFEST_CACHE_PREFIX + name, manifest, None)
+    return manifest
+
+
+def get_manifest(storage, name):
+    """Return the derivative manifest for ``name``, or None if none exists."""
+    key = MANIFEST_CACHE_PREFIX + name
+    manifest = cache.get(key)
+    if manifest is None:
+        try:
+            with storage.open(manifest_name(name), 'rb') as f:
+                manifest = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        cache.set(key, manifest, 60 * 60)
+    return manifest or None
+
+
+def ensure_derivatives(fieldfile):
+    """Build derivatives for a saved ImageField file if it has none yet."""
+    if not fieldfile:
+        return None
+    storage, name = fieldfile.storage, fieldfile.name
+    if storage.exists(manifest_name(name)):
+        return get_manifest(storage, name)
+    try:
+        return generate_derivatives(storage, name)
+    except Exception:
+        logger.exception('Could not build image derivatives for %s', name)
+        return None
+
+
+def _build(fieldfiles):
+    built = False
+    for fieldfile in fieldfiles:
+        if not fieldfile.storage.exists(manifest_name(fieldfile.name)) and ensure_derivatives(fieldfile):
+            built = True
+    if built:
+        # Pages rendered in the meantime used the plain <img>; one bump per object.
+        caching.invalidate()
+
+
+def build_later(*fieldfiles):
+    """Build one object's image derivatives in the background after the transaction commits."""
+    fieldfiles = [fieldfile for fieldfile in fieldfiles if fieldfile]
+    if fieldfiles:
+        transaction.on_commit(lambda: background.submit(_build, fieldfiles))
+
+
+def make_placeholder(fileobj):
+    """
+    Return ``(data_uri, width, height)`` for an image file object.
+
+    The data URI is a tiny blurred WebP (a few hundred bytes) meant to be
+    inlined as a background while the real image loads.
+    """
+    image = ImageOps.exif_transpose(Image.open(fileobj))
+    width, height = image.size
+    thumb_height = max(1, round(height * PLACEHOLDER_WIDTH / width))
+    thumb = image.convert('RGB').resize((PLACEHOLDER_WIDTH, thumb_height), Image.BILINEAR)
+    buffer = BytesIO()
+    thumb.save(buffer, 'WEBP', quality=30)
+    data_uri = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    return data_uri, width, height
@@ -0,0 +1,72 @@
+"""
+Server-rendered translations.
+
+Every page exists once per language in ``LANGUAGES``. LocaleMiddleware
+takes the language from the URL prefix (``i18n_patterns``). English has no
+prefix. Template strings come from the gettext catalogs in ``locale/``.
+Product and blog text comes from each row's ``translations`` field:
+
+    {"es": {"name": "...", "short_description": "..."}, "fr": {...}}
+
+``localize`` copies the active language's values onto instances before
+they are rendered. A missing value falls back to the English column.
+Because the URL alone decides the language, each variant can be cached
+like any other page (app.pagecache, the CDN), and responses do not vary on
+``Accept-Language`` (app.middleware.URLLocaleMiddleware).
+
+Only the templates' navigation and labels are in the catalogs; page bodies
+are English unless a row has a translation. So hreflang alternates and the
+sitemap list a product or blog post only in the languages it is translated
+into (``translated_languages``), and other pages list none.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import translation
+
+TRANSLATABLE_FIELDS = {
+    'product': ('name', 'short_description', 'detailed_description',
+                'meta_title', 'meta_description', 'meta_keywords'),
+    'companyblog': ('title', 'content', 'meta_title', 'meta_description', 'meta_keywords'),
+    'productblog': ('title', 'content', 'meta_title', 'meta_description', 'meta_keywords'),
+}
+
+
+def language_codes():
+    return [code for code, _ in settings.LANGUAGES]
+
+
+def translated_languages(obj):
+    """The default language plus those ``obj`` has translated text for, in ``LANGUAGES`` order."""
+    translated = {code for code, values in (obj.translations or {}).items() if any(values.values())}
+    return [code for code in language_codes() if code == settings.LANGUAGE_CODE or code in translated]
+
+
+def validate_translations(value):
+    if not isinstance(value, dict):
+        raise ValidationError('Translations must be an object keyed by language code.')
+    for code, fields in value.items():
+        if code not in language_codes() or code == settings.LANGUAGE_CODE:
+            raise ValidationError(f'Unknown or default language: {code!r}.')
+        if not isinstance(fields, dict) or not all(isinstance(v, str) for v in fields.values()):
+            raise ValidationError(f'Translations for {code!r} must map field names to text.')
+
+
+def localize(*objs, language=None):
+    """
+    Show ``objs`` in ``language`` (default: the active one).
+
+    Only for rendering: a localized instance must never be saved.
+    """
+    language = language or translation.get_language()
+    if not language or language == settings.LANGUAGE_CODE:
+        return
+    for obj in objs:
+        if obj is None:
+            continue
+        values = (obj.translations or {}).get(language) or {}
+        for field in TRANSLATABLE_FIELDS[obj._meta.model_name]:
+            if values.get(field):
+                setattr(obj, field, values[field])
+        # The precomputed head block is English; templates fall back to
+        # their inline tags, which use the fields set above.
+        obj.seo_head = ''
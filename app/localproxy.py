@@ -0,0 +1,195 @@
+"""
+In-process caching reverse proxy, a stand-in for the CDN in tests and local
+load runs.
+
+``CachingProxy`` wraps the WSGI application (``devapp/wsgi.py`` does so when
+``HTTP_CACHE_LOCAL_PROXY=true``) and honours the headers set by
+app.httpcache: public responses are kept for ``s-maxage``/``max-age``, served
+stale while one background refresh runs during ``stale-while-revalidate``,
+served stale when the app fails during ``stale-if-error``, and dropped by
+``Surrogate-Key`` purges. Responses carry ``X-Cache: HIT``, ``STALE`` or
+``MISS``.
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .httpcache import SURROGATE_KEY_HEADER
+
+
+def parse_cache_control(value):
+    directives = {}
+    for part in value.split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"')
+    return directives
+
+
+class Entry:
+    __slots__ = ('status', 'headers', 'body', 'stored_at', 'ttl', 'swr', 'sie', 'keys')
+
+    def __init__(self, status, headers, body, ttl, swr, sie, keys):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = time.monotonic()
+        self.ttl = ttl
+        self.swr = swr
+        self.sie = sie
+        self.keys = keys
+
+    def age(self):
+        return time.monotonic() - self.stored_at
+
+
+class Store:
+    """LRU response store with a surrogate key index."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, cache_key, entry):
+        with self._lock:
+            self._drop(cache_key)
+            self._entries[cache_key] = entry
+            for key in entry.keys:
+                self._by_key.setdefault(key, set()).add(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def purge(self, keys):
+        with self._lock:
+            for key in keys:
+                for cache_key in list(self._by_key.get(key, ())):
+                    self._drop(cache_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+
+    def _drop(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            cache_keys = self._by_key.get(key)
+            if cache_keys is not None:
+                cache_keys.discard(cache_key)
+                if not cache_keys:
+                    del self._by_key[key]
+
+
+default_store = Store()
+
+
+class CachingProxy:
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or default_store
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if not self._may_use_cache(environ):
+            return self.app(environ, start_response)
+        cache_key = (environ.get('PATH_INFO', ''), environ.get('QUERY_STRING', ''))
+        entry = self.store.get(cache_key)
+        if entry is not None:
+            age = entry.age()
+            if age < entry.ttl:
+                return self._respond(start_response, environ, entry, 'HIT')
+            if age < entry.ttl + entry.swr:
+                self._refresh_in_background(cache_key, environ)
+                return self._respond(start_response, environ, entry, 'STALE')
+
+        status, headers, body = self._fetch(environ)
+        if int(status.split()[0]) >= 500 and entry is not None and entry.age() < entry.ttl + entry.sie:
+            return self._respond(start_response, environ, entry, 'STALE')
+        if environ['REQUEST_METHOD'] == 'GET':
+            self._maybe_store(cache_key, status, headers, body)
+        start_response(status, headers + [('X-Cache', 'MISS')])
+        return [body]
+
+    def _may_use_cache(self, environ):
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return False
+        # Logged-in users and admin sessions always go to Django.
+        return settings.SESSION_COOKIE_NAME not in environ.get('HTTP_COOKIE', '') \
+            and 'HTTP_AUTHORIZATION' not in environ
+
+    def _fetch(self, environ):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, list(headers)
+
+        result = self.app(environ, capture)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return captured['status'], captured['headers'], body
+
+    def _maybe_store(self, cache_key, status, headers, body):
+        header_map = {name.lower(): value for name, value in headers}
+        if int(status.split()[0]) not in (200, 301, 404) or 'set-cookie' in header_map:
+            return
+        vary = header_map.get('vary', '').lower()
+        if '*' in vary or 'cookie' in vary:
+            return
+        directives = parse_cache_control(header_map.get('cache-control', ''))
+        if 'public' not in directives or 'private' in directives or 'no-store' in directives:
+            return
+        try:
+            ttl = int(directives.get('s-maxage') or directives.get('max-age') or 0)
+            swr = int(directives.get('stale-while-revalidate') or 0)
+            sie = int(directives.get('stale-if-error') or 0)
+        except ValueError:
+            return
+        if ttl <= 0:
+            return
+        keys = frozenset(header_map.get(SURROGATE_KEY_HEADER.lower(), '').split())
+        self.store.put(cache_key, Entry(status, headers, body, ttl, swr, sie, keys))
+
+    def _refresh_in_background(self, cache_key, environ):
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        refresh_environ = {
+            k: v for k, v in environ.items()
+            if not k.startswith('wsgi.') or k in ('wsgi.url_scheme', 'wsgi.version', 'wsgi.multithread',
+                                                  'wsgi.multiprocess', 'wsgi.run_once', 'wsgi.errors')
+        }
+        refresh_environ.update({'REQUEST_METHOD': 'GET', 'wsgi.input': io.BytesIO(b'')})
+
+        def refresh():
+            try:
+                status, headers, body = self._fetch(refresh_environ)
+                self._maybe_store(cache_key, status, headers, body)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
+        threading.Thread(target=refresh, name='proxy-refresh', daemon=True).start()
+
+    def _respond(self, start_response, environ, entry, state):
+        headers = entry.headers + [('Age', str(int(entry.age()))), ('X-Cache', state)]
+        start_response(entry.status, headers)
+        return [b''] if environ.get('REQUEST_METHOD') == 'HEAD' else [entry.body]
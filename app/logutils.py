@@ -0,0 +1,102 @@
+"""
+Non-blocking, structured logging.
+
+``AsyncHandler`` is a ``QueueHandler`` that formats the record on the calling
+thread and hands it to a per-process ``QueueListener``, which does the actual
+stream or file I/O. The queue is bounded: when it is full the record is
+dropped and counted (``AsyncHandler.dropped`` and the
+``log_records_dropped_total`` metric) instead of blocking the request.
+
+``RequestIDFilter`` stamps each record with the current request ID, which
+``RequestIDMiddleware`` takes from ``X-Request-ID`` or generates.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+request_id_var = ContextVar('request_id', default='-')
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIDFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; ``extra`` fields are included as-is."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, separators=(',', ':'))
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Queue records for a background ``QueueListener`` writing to ``target``.
+
+    ``target`` is the dotted path of the real handler class and
+    ``target_kwargs`` its arguments. The queue and listener are created per
+    process on first use, so a preloaded gunicorn master never hands a
+    listener thread (or a locked queue) to its workers.
+    """
+
+    def __init__(self, target='logging.StreamHandler', target_kwargs=None, maxsize=10000):
+        super().__init__(None)
+        self.target = import_string(target)(**(target_kwargs or {}))
+        # Records arrive already formatted by prepare().
+        self.target.setFormatter(logging.Formatter('%(message)s'))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            from . import metrics
+            metrics.inc('log_records_dropped_total', logger=record.name)
+
+    def close(self):
+        # logging.shutdown() calls this at exit, draining the queue.
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+        self.target.close()
+        super().close()
@@ -0,0 +1,62 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app import caching, seo, seohead
+
+FIELDS = ['meta_description', 'seo_head', 'seo_hash']
+RELATED = {'product': ('category',), 'companyblog': (), 'productblog': ('product',)}
+
+
+class Command(BaseCommand):
+    help = "Fill blank meta descriptions and rebuild SEO head blocks for rows whose content changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--model', choices=sorted(RELATED), action='append',
+                            help='Only this model (repeatable; default: all).')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild rows even if their content hash is unchanged.')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would change without writing.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total_updated = 0
+        for name in options['model'] or sorted(RELATED):
+            model = apps.get_model('app', name)
+            seen, updated = self._backfill(model, options)
+            total_updated += updated
+            self.stdout.write(f'{name}: {seen} row(s) checked, {updated} updated.')
+
+        if total_updated and not options['dry_run']:
+            caching.invalidate()
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {total_updated} row(s) in {time.perf_counter() - started:.1f}s.'))
+
+    def _backfill(self, model, options):
+        queryset = model.objects.select_related(*RELATED[model._meta.model_name]).order_by('pk')
+        seen = updated = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination: each chunk is an index range scan, however deep we are.
+            chunk = list(queryset.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            seen += len(chunk)
+            changed = []
+            for obj in chunk:
+                if not options['force'] and obj.seo_hash == seo.content_hash(obj):
+                    continue
+                seo.fill_text(obj)
+                obj.seo_head = seohead.build(obj)
+                obj.seo_hash = seo.content_hash(obj)
+                changed.append(obj)
+            updated += len(changed)
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, FIELDS)
+        return seen, updated
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app import caching, specs
+from app.models import Product
+
+
+class Command(BaseCommand):
+    help = "Parse the product spec text into the numeric spec columns used by the catalog range filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Count what would change without writing.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        queryset = Product.objects.only('pk', *specs.COLUMNS, *specs.COLUMNS.values()).order_by('pk')
+        seen = updated = 0
+        unparsed = []
+        last_pk = 0
+        while True:
+            # Keyset pagination, as in backfill_seo
+            chunk = list(queryset.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            seen += len(chunk)
+            changed = [product for product in chunk if specs.fill(product)]
+            for product in chunk:
+                for field, column in specs.COLUMNS.items():
+                    text = getattr(product, field)
+                    if text and text.strip() and getattr(product, column) is None:
+                        unparsed.append((product.pk, field, text))
+            updated += len(changed)
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    Product.objects.bulk_update(changed, list(specs.COLUMNS.values()))
+
+        for pk, field, text in unparsed:
+            self.stdout.write(f'  product {pk}: no number in {field} {text!r}')
+        if updated and not options['dry_run']:
+            caching.invalidate()
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {updated} of {seen} product(s), {len(unparsed)} spec value(s) left unparsed, '
+            f'in {time.perf_counter() - started:.1f}s.'))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from app.middleware import ServerTimingMiddleware
+
+
+def _view(request):
+    return HttpResponse('ok')
+
+
+def _per_call(handler, request, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        handler(request)
+    return (time.perf_counter() - start) / iterations
+
+
+def measure(iterations, rounds):
+    """``(overhead_us, bare_s, timed_s)`` per request, header included."""
+    request = RequestFactory().get('/bench/')
+    with override_settings(PERF_TIMING_SAMPLE_RATE=1.0, PERF_LOG_SAMPLE_RATE=0.0,
+                           INTERNAL_IPS=[request.META['REMOTE_ADDR']]):
+        wrapped = ServerTimingMiddleware(_view)
+        _per_call(wrapped, request, 1000)  # warm up
+        # Keep the best round of each to damp scheduler noise.
+        bare = min(_per_call(_view, request, iterations) for _ in range(rounds))
+        timed = min(_per_call(wrapped, request, iterations) for _ in range(rounds))
+    return (timed - bare) * 1e6, bare, timed
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of ServerTimingMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--budget-us', type=float, default=50.0,
+                            help='Fail if the overhead exceeds this many microseconds.')
+
+    def handle(self, *args, **options):
+        overhead_us, bare, timed = measure(options['iterations'], options['rounds'])
+
+        self.stdout.write(f'bare view      : {bare * 1e6:7.2f} us/request')
+        self.stdout.write(f'with middleware: {timed * 1e6:7.2f} us/request')
+        self.stdout.write(f'overhead       : {overhead_us:7.2f} us/request (budget {options["budget_us"]} us)')
+        if overhead_us > options['budget_us']:
+            raise CommandError('ServerTimingMiddleware overhead is over budget')
+        self.stdout.write(self.style.SUCCESS('Within budget.'))
@@ -0,0 +1,171 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import CompanyBlog, Product
+from devapp.server_profiles import PROFILES, asgi_available
+
+from .replay_load import percentile, replay, summarize
+
+# (path, weight) for the fixed request mix; product and blog pages are
+# filled in from the database.
+BASE_MIX = [
+    ('/', 6),
+    ('/products', 4),
+    ('/aboutus', 1),
+    ('/ourservices', 1),
+    ('/sitemap.xml', 1),
+    ('/healthz', 1),
+]
+MAX_ERROR_RATE = 0.01
+
+
+def request_mix():
+    mix = list(BASE_MIX)
+    for slug in Product.objects.filter(is_active=True).values_list('slug', flat=True)[:5]:
+        mix.append((f'/product/{slug}/', 2))
+    for slug in CompanyBlog.objects.values_list('slug', flat=True)[:3]:
+        mix.append((f'/blog/{slug}/', 1))
+    return mix
+
+
+def build_records(mix, total):
+    """Deterministic interleaving of ``mix`` scaled to ``total`` requests."""
+    weight = sum(w for _path, w in mix)
+    paths = [path for path, w in mix for _ in range(w)]
+    rounds = max(1, total // weight)
+    return [{'ts': 0, 'method': 'GET', 'path': path, 'query': ''} for _ in range(rounds) for path in paths]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/healthz', timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in os.listdir('/proc'):
+        if not child.isdigit():
+            continue
+        try:
+            with open(f'/proc/{child}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            pids.append(int(child))
+    return pids
+
+
+def memory_mb(pids):
+    """
+    Total PSS of ``pids`` in MB, so pages shared by the preloaded master and
+    its workers are counted once. Falls back to RSS.
+    """
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                field = 'Pss:'
+                lines = f.readlines()
+        except OSError:
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    field = 'VmRSS:'
+                    lines = f.readlines()
+            except OSError:
+                continue
+        for line in lines:
+            if line.startswith(field):
+                total_kb += int(line.split()[1])
+                break
+    return total_kb / 1024
+
+
+class Command(BaseCommand):
+    help = "Run each gunicorn profile against a fixed request mix and recommend one by throughput per MB."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=None)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--warmup', type=int, default=200)
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or [p for p in PROFILES if p != 'asgi' or asgi_available()]
+        mix = request_mix()
+        records = build_records(mix, options['requests'])
+        warmup = build_records(mix, options['warmup'])
+        results = {}
+        for profile in profiles:
+            self.stderr.write(f'Benchmarking {profile}...')
+            results[profile] = self.run_profile(profile, records, warmup, options['concurrency'])
+
+        usable = {p: r for p, r in results.items() if r['error_rate'] <= MAX_ERROR_RATE}
+        recommended = max(usable, key=lambda p: usable[p]['rps_per_mb']) if usable else None
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'recommended': recommended}, indent=2))
+            return
+        self.stdout.write(f"{'profile':10} {'workers':>7} {'req/s':>8} {'p95 ms':>8} {'errors':>7} {'MB':>7} {'req/s/MB':>9}")
+        for profile, row in results.items():
+            self.stdout.write(
+                f"{profile:10} {row['workers']:>7} {row['rps']:8.1f} {row['p95_ms']:8.1f} "
+                f"{row['error_rate']:7.1%} {row['memory_mb']:7.1f} {row['rps_per_mb']:9.3f}"
+            )
+        if recommended is None:
+            raise CommandError(f'Every profile had more than {MAX_ERROR_RATE:.0%} errors')
+        self.stdout.write(self.style.SUCCESS(f'Recommended: GUNICORN_PROFILE={recommended}'))
+
+    def run_profile(self, profile, records, warmup, concurrency):
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, GUNICORN_PROFILE=profile,
+                   DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'devapp.settings'))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_until_up(base_url):
+                raise CommandError(f'gunicorn ({profile}) did not start')
+            replay(warmup, base_url, concurrency, speedup=0)
+            pids = process_tree(server.pid)  # every worker has booted by now
+            raw, elapsed = replay(records, base_url, concurrency, speedup=0)
+            memory = memory_mb(pids)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        latencies = sorted(latency for _route, _status, latency in raw)
+        errors = sum(row['error_rate'] * row['count'] for row in summarize(raw).values())
+        rps = len(raw) / elapsed
+        return {
+            'workers': len(pids) - 1,
+            'rps': rps,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'error_rate': errors / len(raw) if raw else 1.0,
+            'memory_mb': memory,
+            'rps_per_mb': rps / memory if memory else 0.0,
+        }
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app import facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the catalog facet index (value bitsets and counts)."
+
+    def handle(self, *args, **options):
+        index = facets.rebuild()
+        values = sum(len(keys) for keys in index.counts.values())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(index.pos)} product(s), {values} facet value(s).'))
@@ -0,0 +1,57 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.images import generate_derivatives, manifest_name
+from app.models import CompanyBlog, Product
+from app.signals import PRODUCT_IMAGE_FIELDS
+
+IMAGE_FIELDS = {'product': PRODUCT_IMAGE_FIELDS, 'companyblog': ('image',)}
+MODELS = {'product': Product, 'companyblog': CompanyBlog}
+
+
+def _storage(model_name, field):
+    return MODELS[model_name]._meta.get_field(field).storage
+
+
+def _build(model_name, field, name):
+    # Runs in a forked worker; it must not reuse the parent's DB connection.
+    connections.close_all()
+    generate_derivatives(_storage(model_name, field), name)
+    return name
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image derivatives for existing product and blog images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: CPU count).')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild images that already have a manifest.')
+
+    def handle(self, *args, **options):
+        # (model, field, name): each file is built with its own field's storage
+        jobs = set()
+        for model_name, fields in IMAGE_FIELDS.items():
+            for row in MODELS[model_name].objects.values_list(*fields):
+                jobs.update((model_name, field, name) for field, name in zip(fields, row) if name)
+        if not options['force']:
+            jobs = {job for job in jobs if not _storage(job[0], job[1]).exists(manifest_name(job[2]))}
+        if not jobs:
+            self.stdout.write('No images need derivatives.')
+            return
+
+        connections.close_all()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(_build, *job): job[2] for job in sorted(jobs)}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {done} image(s), {failed} failed.'))
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app import caching
+from app.placeholders import PLACEHOLDER_MODELS, refresh_placeholder
+
+
+def _process_batch(model_name, pks, force):
+    # Runs in a forked worker; it must not reuse the parent's DB connection.
+    connections.close_all()
+    model = PLACEHOLDER_MODELS[model_name]
+    return sum(refresh_placeholder(model, pk, force=force) for pk in pks)
+
+
+class Command(BaseCommand):
+    help = "Compute low-quality image placeholders for existing products and blogs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: CPU count).')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild placeholders even if the source image is unchanged.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        jobs = []
+        for model_name, model in PLACEHOLDER_MODELS.items():
+            pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            for i in range(0, len(pks), batch_size):
+                jobs.append((model_name, pks[i:i + batch_size]))
+
+        connections.close_all()
+        updated = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(_process_batch, name, pks, options['force']) for name, pks in jobs]
+            for future in as_completed(futures):
+                updated += future.result()
+        if updated:
+            caching.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} placeholder(s) in {len(jobs)} batch(es).'))
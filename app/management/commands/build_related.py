@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app import related
+
+
+class Command(BaseCommand):
+    help = "Recompute the related products and related blog posts (TF-IDF nearest neighbours)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(related.QUERYSETS), action='append',
+                            help='Only this kind (repeatable; default: all).')
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or sorted(related.QUERYSETS):
+            index = related.rebuild(kind)
+            self.stdout.write(f'{kind}: {len(index.ids)} object(s), {len(index.vocab)} term(s).')
+        self.stdout.write(self.style.SUCCESS('Related content rebuilt.'))
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import pagecache, views  # noqa: F401 -- importing views registers the pages
+
+
+class Command(BaseCommand):
+    help = "Render every page-cached view in every language into the page cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', action='append', choices=[code for code, _ in settings.LANGUAGES],
+                            help='Only this language (repeatable; default: all).')
+        parser.add_argument('--force', action='store_true', help='Re-render pages that are still fresh.')
+
+    def handle(self, *args, **options):
+        if not settings.PAGE_CACHE_ENABLED:
+            self.stdout.write('PAGE_CACHE_ENABLED is off; nothing to do.')
+            return
+        started = time.perf_counter()
+        rendered, skipped = pagecache.prerender_all(options['language'], options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} page(s), skipped {skipped} fresh or in progress, '
+            f'in {time.perf_counter() - started:.1f}s.'))
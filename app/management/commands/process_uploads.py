@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.uploads import due_jobs, process_upload
+
+
+class Command(BaseCommand):
+    help = ("Upload this host's queued product media to remote storage. Web workers already do this; "
+            "run it on the web host to drain the queue by hand.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process due jobs and exit.')
+        parser.add_argument('--interval', type=float, default=10.0,
+                            help='Seconds between queue polls.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            for job_id in due_jobs():
+                if process_upload(job_id):
+                    self.stdout.write(f'Uploaded job {job_id}')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,90 @@
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def log_files(path):
+    """The query log and its rotated backups, oldest first."""
+    backups = [f'{path}.{i}' for i in range(settings.QUERY_LOG_BACKUP_COUNT, 0, -1)]
+    return [p for p in backups + [str(path)] if os.path.exists(p)]
+
+
+def aggregate(paths, since=None):
+    """
+    Fold query log lines into per-(view, fingerprint) totals.
+
+    Each row holds ``requests`` (requests that ran it), ``count``, ``ms``,
+    ``max_per_request``, ``n_plus_one`` (requests flagged) and ``slow``.
+    """
+    rows = defaultdict(lambda: {'requests': 0, 'count': 0, 'ms': 0.0, 'max_per_request': 0,
+                                'n_plus_one': 0, 'slow': 0, 'slowest_ms': 0.0})
+    requests = defaultdict(int)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since and record.get('ts', 0) < since:
+                    continue
+                view = record.get('view')
+                kind = record.get('type')
+                if kind == 'request':
+                    requests[view] += 1
+                    for fp, count, ms in record['queries']:
+                        row = rows[view, fp]
+                        row['requests'] += 1
+                        row['count'] += count
+                        row['ms'] += ms
+                        row['max_per_request'] = max(row['max_per_request'], count)
+                elif kind == 'n_plus_one':
+                    rows[view, record['fingerprint']]['n_plus_one'] += 1
+                elif kind == 'slow':
+                    row = rows[view, record['fingerprint']]
+                    row['slow'] += 1
+                    row['slowest_ms'] = max(row['slowest_ms'], record['ms'])
+    return rows, requests
+
+
+class Command(BaseCommand):
+    help = "Summarise the worst SQL fingerprints per view from the query log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=str(settings.QUERY_LOG_PATH))
+        parser.add_argument('--since', type=float, help='Only lines with ts at or after this Unix time.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=('ms', 'count', 'n_plus_one', 'slow'), default='ms')
+        parser.add_argument('--json', action='store_true', help='Print the rows as JSON.')
+
+    def handle(self, *args, **options):
+        paths = log_files(options['path'])
+        if not paths:
+            raise CommandError(f"No query log at {options['path']} (is QUERY_LOG_SAMPLE_RATE set?)")
+        rows, requests = aggregate(paths, since=options['since'])
+        ranked = sorted(rows.items(), key=lambda item: item[1][options['sort']], reverse=True)[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps([
+                dict(row, view=view, fingerprint=fp, view_requests=requests[view])
+                for (view, fp), row in ranked
+            ], indent=2))
+            return
+
+        self.stdout.write(f'{sum(requests.values())} requests across {len(requests)} views')
+        for (view, fp), row in ranked:
+            per_request = row['count'] / requests[view] if requests[view] else 0
+            flags = []
+            if row['n_plus_one']:
+                flags.append(f"N+1 in {row['n_plus_one']} requests")
+            if row['slow']:
+                flags.append(f"{row['slow']} slow, worst {row['slowest_ms']:.0f} ms")
+            self.stdout.write(
+                f"\n{view}: {row['ms']:.1f} ms total, {row['count']} runs "
+                f"({per_request:.1f}/request, max {row['max_per_request']})"
+                + (f" [{'; '.join(flags)}]" if flags else '')
+            )
+            self.stdout.write(f'    {fp[:300]}')
@@ -0,0 +1,165 @@
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def load_records(path, include_unsafe=False, limit=None):
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'path' not in record or 'ts' not in record:
+                continue
+            if not include_unsafe and record.get('method', 'GET') not in ('GET', 'HEAD'):
+                continue
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    records.sort(key=lambda r: r['ts'])
+    return records
+
+
+def route_for(record):
+    if record.get('route') is not None:
+        return '/' + record['route']
+    try:
+        return '/' + resolve(record['path']).route
+    except Resolver404:
+        return 'unmatched'
+
+
+def replay(records, base_url, concurrency=8, speedup=1.0, timeout=30.0):
+    """
+    Replay ``records`` against ``base_url`` and return ``(results, elapsed)``.
+
+    Requests keep their original spacing divided by ``speedup``; a speed-up
+    of 0 sends them as fast as ``concurrency`` allows.
+    """
+    opener = urllib.request.build_opener(_NoRedirect)
+    jobs = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+    first_ts = records[0]['ts'] if records else 0
+    start = time.perf_counter()
+
+    def worker():
+        while True:
+            record = jobs.get()
+            if record is None:
+                return
+            if speedup > 0:
+                delay = (record['ts'] - first_ts) / speedup - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            url = base_url.rstrip('/') + record['path']
+            if record.get('query'):
+                url += '?' + record['query']
+            request = urllib.request.Request(url, method=record.get('method', 'GET'))
+            sent = time.perf_counter()
+            try:
+                with opener.open(request, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except Exception:
+                status = None
+            latency = time.perf_counter() - sent
+            with results_lock:
+                results.append((route_for(record), status, latency))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for record in records:
+        jobs.put(record)
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results):
+    by_route = defaultdict(list)
+    for route, status, latency in results:
+        by_route[route].append((status, latency))
+    summary = {}
+    for route, rows in by_route.items():
+        latencies = sorted(latency for _status, latency in rows)
+        errors = sum(1 for status, _latency in rows if status is None or status >= 500)
+        summary[route] = {
+            'count': len(rows),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'error_rate': errors / len(rows),
+        }
+    return summary
+
+
+class Command(BaseCommand):
+    help = "Replay a captured requests.jsonl file against a running server and report latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default=None,
+                            help='JSONL capture (default: ACCESS_LOG_PATH).')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--speedup', type=float, default=1.0,
+                            help='Divide original request spacing by this factor; 0 = no pacing.')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--include-unsafe', action='store_true',
+                            help='Also replay POST and other non-GET requests.')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON.')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.ACCESS_LOG_PATH
+        try:
+            records = load_records(path, options['include_unsafe'], options['limit'])
+        except FileNotFoundError:
+            raise CommandError(f'No capture file at {path}')
+        if not records:
+            raise CommandError(f'{path} has no replayable requests')
+
+        results, elapsed = replay(
+            records, options['base_url'], options['concurrency'], options['speedup'],
+        )
+        summary = summarize(results)
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'requests': len(results), 'elapsed_s': elapsed,
+                'throughput_rps': len(results) / elapsed, 'routes': summary,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{len(results)} requests in {elapsed:.2f}s = {len(results) / elapsed:.1f} req/s")
+        self.stdout.write(f"{'route':40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+        for route, row in sorted(summary.items(), key=lambda item: -item[1]['count']):
+            self.stdout.write(
+                f"{route[:40]:40} {row['count']:7d} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} "
+                f"{row['p99_ms']:9.1f} {row['error_rate']:8.1%}"
+            )
@@ -0,0 +1,102 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so nothing is already imported or cached.
+PROBE = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devapp.settings')
+from devapp.wsgi import application
+loaded = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+
+def hit(path):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    status = []
+    start = time.perf_counter()
+    response = application(environ, lambda s, h, exc_info=None: status.append(s))
+    b''.join(response)
+    response.close()
+    return status[0], time.perf_counter() - start
+
+status, first = hit(sys.argv[1])
+_, second = hit(sys.argv[1])
+print(json.dumps({
+    'status': status, 'load': loaded - t0, 'first': first, 'second': second,
+    'finished_at': time.time(),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Turn ``-X importtime`` output into a list of root nodes."""
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len('import time:'):].split('|', 2)
+        raw_name = raw_name[1:]
+        depth = (len(raw_name) - len(raw_name.lstrip(' '))) // 2
+        node = {
+            'name': raw_name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'children': pending.pop(depth + 1, []),
+        }
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+class Command(BaseCommand):
+    help = "Report an import-time tree and time-to-first-request for a cold worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/robots.txt',
+                            help='URL requested as the first request (default: /robots.txt).')
+        parser.add_argument('--min-ms', type=float, default=5.0,
+                            help='Hide imports cheaper than this (cumulative).')
+        parser.add_argument('--max-depth', type=int, default=4)
+        parser.add_argument('--json', action='store_true', help='Print raw results as JSON.')
+
+    def handle(self, *args, **options):
+        started_at = time.time()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['path']],
+            capture_output=True, text=True, cwd=str(settings.BASE_DIR),
+        )
+        if proc.returncode != 0:
+            self.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(proc.returncode)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        tree = parse_importtime(proc.stderr)
+        result['time_to_first_request'] = result['finished_at'] - started_at - result['second']
+
+        if options['json']:
+            self.stdout.write(json.dumps({'timings': result, 'imports': tree}, indent=2))
+            return
+
+        self.stdout.write(f"Imports slower than {options['min_ms']} ms (cumulative / self):")
+        for node in sorted(tree, key=lambda n: -n['cumulative_ms']):
+            self._print_node(node, 0, options)
+        self.stdout.write('')
+        self.stdout.write(f"Django + WSGI app load : {result['load'] * 1000:8.1f} ms")
+        self.stdout.write(f"First request {options['path']} : {result['first'] * 1000:8.1f} ms ({result['status']})")
+        self.stdout.write(f"Second request         : {result['second'] * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Time to first request  : {result['time_to_first_request'] * 1000:8.1f} ms (process spawn to first response)"
+        ))
+
+    def _print_node(self, node, depth, options):
+        if node['cumulative_ms'] < options['min_ms'] or depth > options['max_depth']:
+            return
+        self.stdout.write(
+            f"{'  ' * depth}{node['cumulative_ms']:8.1f} / {node['self_ms']:6.1f} ms  {node['name']}"
+        )
+        for child in sorted(node['children'], key=lambda n: -n['cumulative_ms']):
+            self._print_node(child, depth + 1, options)
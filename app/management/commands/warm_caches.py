@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app import caching
+
+
+class Command(BaseCommand):
+    help = "Fill the content caches (company info, categories, products, sitemap)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild entries that are already cached.')
+        parser.add_argument('--invalidate', action='store_true', help='Move to a new cache version first.')
+
+    def handle(self, *args, **options):
+        if options['invalidate']:
+            caching.invalidate()
+        caching.warm(force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Content caches warm (version {caching.content_version()}).'))
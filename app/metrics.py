@@ -0,0 +1,218 @@
+"""
+Prometheus-style metrics aggregated across gunicorn workers.
+
+Each thread records into its own dict, so the request path never takes a
+lock. A daemon thread per process periodically merges those shards and
+writes them to ``METRICS_DIR/<pid>.json`` (atomic rename); the ``/metrics``
+view sums every worker's file and renders the text exposition format.
+When a worker exits, the gunicorn master folds its file into
+``retired.json`` (``retire``), so counters keep their totals and files of
+dead pids do not pile up.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route.', LATENCY_BUCKETS),
+    'db_queries_per_request': ('histogram', 'Database queries per request by route.', COUNT_BUCKETS),
+    'smtp_send_duration_seconds': ('histogram', 'Time spent sending email.', LATENCY_BUCKETS),
+    'storage_call_duration_seconds': ('histogram', 'Remote media storage call latency.', LATENCY_BUCKETS),
+    'model_inserts_total': ('counter', 'Rows inserted by model.', None),
+    'log_records_dropped_total': ('counter', 'Log records dropped because the log queue was full.', None),
+    'slug_lookups_total': ('counter', 'Product/blog slug lookups by result (found, redirect, missing).', None),
+}
+
+RETIRED_FILE = 'retired.json'
+
+_shards = []
+_shards_lock = threading.Lock()
+_local = threading.local()
+_flusher_pid = None
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None or _local.pid != os.getpid():
+        shard = {}
+        _local.shard, _local.pid = shard, os.getpid()
+        with _shards_lock:
+            _shards.append((os.getpid(), shard))
+        _ensure_flusher()
+    return shard
+
+
+def inc(name, amount=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    shard = _shard()
+    shard[key] = shard.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    shard = _shard()
+    buckets = METRICS[name][2]
+    row = shard.get(key)
+    if row is None:
+        # One slot per bucket, then +Inf, sum, count
+        row = shard[key] = [0] * (len(buckets) + 3)
+    row[bisect_left(buckets, value)] += 1
+    row[-2] += value
+    row[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def snapshot():
+    """Merge every thread's shard in this process."""
+    merged = {}
+    pid = os.getpid()
+    with _shards_lock:
+        # Shards inherited from a pre-fork master belong to the master.
+        shards = [shard for owner, shard in _shards if owner == pid]
+    for shard in shards:
+        for key, value in list(shard.items()):
+            _merge(merged, key, value)
+    return merged
+
+
+def _merge(into, key, value):
+    if isinstance(value, list):
+        row = into.setdefault(key, [0] * len(value))
+        for i, v in enumerate(value):
+            row[i] += v
+    else:
+        into[key] = into.get(key, 0) + value
+
+
+def _encode(data):
+    return [[name, list(labels), value] for (name, labels), value in data.items()]
+
+
+def _decode(rows):
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows}
+
+
+def _write(directory, filename, data):
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(_encode(data), f)
+    os.replace(tmp_path, os.path.join(directory, filename))
+
+
+def _read(path):
+    with open(path) as f:
+        return _decode(json.load(f))
+
+
+def flush():
+    _write(settings.METRICS_DIR, f'{os.getpid()}.json', snapshot())
+
+
+def retire(pid, directory=None):
+    """Fold dead worker ``pid``'s file into ``retired.json`` and delete it."""
+    directory = directory or settings.METRICS_DIR
+    path = os.path.join(directory, f'{pid}.json')
+    try:
+        rows = _read(path)
+    except FileNotFoundError:
+        return
+    except ValueError:
+        rows = {}
+    try:
+        merged = _read(os.path.join(directory, RETIRED_FILE))
+    except (OSError, ValueError):
+        merged = {}
+    for key, value in rows.items():
+        _merge(merged, key, value)
+    _write(directory, RETIRED_FILE, merged)
+    os.unlink(path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _shards_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def collect():
+    """Sum the flushed data of every worker plus this process's live counters."""
+    merged = {}
+    own = f'{os.getpid()}.json'
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith('.json') or name == own:
+            continue
+        try:
+            rows = _read(os.path.join(settings.METRICS_DIR, name))
+        except (OSError, ValueError):
+            continue
+        for key, value in rows.items():
+            _merge(merged, key, value)
+    for key, value in snapshot().items():
+        _merge(merged, key, value)
+    return merged
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render(data):
+    """Render merged metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (n, labels), value in data.items() if n == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,239 @@
+"""Request middleware for the public site."""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.locale import LocaleMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import cc_delim_re, patch_cache_control
+
+from . import metrics, perf, querylog
+from .logutils import request_id_var
+from .perf import RequestMetrics
+
+perf_logger = logging.getLogger('app.perf')
+
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestIDMiddleware:
+    """
+    Tag the request with an ID for log correlation.
+
+    A well-formed ``X-Request-ID`` from the proxy is reused, otherwise one is
+    generated. It is exposed as ``request.request_id``, added to every log
+    record by ``app.logutils.RequestIDFilter`` and echoed in the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class AccessLogMiddleware:
+    """
+    Append a sample of requests to a JSONL file for offline load replay.
+
+    Each line holds ``ts``, ``method``, ``path``, ``query``, ``route``,
+    ``status`` and ``duration_ms``; ``manage.py replay_load`` reads the same
+    format. Disabled unless ``ACCESS_LOG_SAMPLE_RATE`` is above zero.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.ACCESS_LOG_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path = settings.ACCESS_LOG_PATH
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        self._write({
+            'ts': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', ''),
+            'route': match.route if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+        })
+        return response
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                # O_APPEND keeps whole lines intact across gunicorn workers.
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._file = os.fdopen(fd, 'a', buffering=1)
+            self._file.write(line)
+
+
+def _sees_timings(request):
+    if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    # Without a session cookie there is no user to look up.
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+class ServerTimingMiddleware:
+    """
+    Measure DB, template, cache and total time for sampled requests.
+
+    Sampled responses to ``INTERNAL_IPS`` and logged-in staff get a
+    ``Server-Timing`` header, marked private so no shared cache stores it.
+    The header shows query counts, so the public never sees it. A further
+    ``PERF_LOG_SAMPLE_RATE`` share is logged to ``app.perf`` with the
+    numbers as structured fields. ``manage.py bench_middleware`` checks the
+    overhead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_TIMING_SAMPLE_RATE
+        self.log_rate = settings.PERF_LOG_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        request_metrics = RequestMetrics().activate()
+        try:
+            with connection.execute_wrapper(request_metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            request_metrics.deactivate()
+        total = time.perf_counter() - request_metrics.start
+        if _sees_timings(request):
+            response['Server-Timing'] = request_metrics.server_timing(total)
+            patch_cache_control(response, private=True)
+        if self.log_rate and random.random() < self.log_rate:
+            fields = request_metrics.as_log_fields(total)
+            fields.update(method=request.method, path=request.path, status=response.status_code)
+            perf_logger.info('request timing', extra={'perf': fields})
+        return response
+
+
+class MetricsMiddleware:
+    """Record request count, latency and DB queries per route for /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.route) if match else 'unmatched'
+        metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', duration, route=route)
+        request_metrics = perf.current()
+        if request_metrics is not None:
+            metrics.observe('db_queries_per_request', request_metrics.db_count, route=route)
+        return response
+
+
+class QueryLogMiddleware:
+    """
+    Fingerprint the SQL of sampled requests and log slow statements and N+1
+    patterns (see app.querylog). Disabled unless ``QUERY_LOG_SAMPLE_RATE`` is
+    above zero.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.QUERY_LOG_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = settings.QUERY_SLOW_MS / 1000
+        self.threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        tracker = querylog.QueryTracker(self.slow_seconds)
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        if tracker.stats:
+            match = getattr(request, 'resolver_match', None)
+            view = (match.url_name or match.route) if match else 'unmatched'
+            querylog.write(tracker.records(view, self.threshold))
+        return response
+
+
+class AnonymousSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that leaves anonymous page views alone.
+
+    A GET or HEAD without a session cookie outside ``SESSION_REQUIRED_PATHS``
+    gets an empty session (no database read, since there is no key to load),
+    and the response is passed through untouched: no session save, no
+    ``Set-Cookie`` and no ``Vary: Cookie``. If a view does write to the
+    session, it is saved as usual.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.session_free = (
+            request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not request.path.startswith(settings.SESSION_REQUIRED_PATHS)
+        )
+
+    def process_response(self, request, response):
+        if getattr(request, 'session_free', False) and not request.session.modified:
+            return response
+        return super().process_response(request, response)
+
+
+class URLLocaleMiddleware(LocaleMiddleware):
+    """
+    LocaleMiddleware without ``Vary: Accept-Language``.
+
+    With ``prefix_default_language=False`` every path decides its language
+    (no prefix is English), so the header never changes a response and
+    caches need not keep a copy per browser language.
+    """
+
+    def process_response(self, request, response):
+        response = super().process_response(request, response)
+        if response.has_header('Vary'):
+            vary = [field for field in cc_delim_re.split(response['Vary'])
+                    if field and field.lower() != 'accept-language']
+            if vary:
+                response['Vary'] = ', '.join(vary)
+            else:
+                del response['Vary']
+        return response
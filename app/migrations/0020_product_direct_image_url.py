@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:29
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_direct_image_url(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    drive_file_re = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+    products = list(Product.objects.exclude(image_url__isnull=True).exclude(image_url=''))
+    for product in products:
+        match = drive_file_re.search(product.image_url)
+        if match:
+            product.direct_image_url = f"https://drive.google.com/uc?export=view&id={match.group(1)}"
+        else:
+            product.direct_image_url = product.image_url
+    Product.objects.bulk_update(products, ['direct_image_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_companyblog_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='direct_image_url',
+            field=models.URLField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.RunPython(fill_direct_image_url, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_mediaupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyblog',
+            name='seo_head',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='seo_head',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productblog',
+            name='seo_head',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
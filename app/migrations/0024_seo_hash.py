@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_seo_head'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyblog',
+            name='seo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='seo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='productblog',
+            name='seo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:51
+
+import app.locales
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_seo_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyblog',
+            name='translations',
+            field=models.JSONField(blank=True, default=dict, validators=[app.locales.validate_translations]),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='translations',
+            field=models.JSONField(blank=True, default=dict, validators=[app.locales.validate_translations]),
+        ),
+        migrations.AddField(
+            model_name='productblog',
+            name='translations',
+            field=models.JSONField(blank=True, default=dict, validators=[app.locales.validate_translations]),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:52
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def _convert(apps, mapping):
+    Contact = apps.get_model('app', 'Contact')
+    queryset = Contact.objects.filter(product__in=list(mapping)).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).only('pk', 'product')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for contact in batch:
+            contact.product = mapping[contact.product]
+        Contact.objects.bulk_update(batch, ['product'])
+
+
+def _match(value, products):
+    """Slug of the product ``value`` names: exact, then unique prefix, ignoring case."""
+    key = value.casefold().strip()
+    exact = [slug for name, slug in products if name.casefold() == key]
+    if len(exact) == 1:
+        return exact[0]
+    prefixed = [slug for name, slug in products if name.casefold().startswith(key)]
+    return prefixed[0] if len(prefixed) == 1 else None
+
+
+def names_to_slugs(apps, schema_editor):
+    # Rows hold the old hard-coded choice values, which were product names;
+    # values that match no product are left as they are.
+    Contact = apps.get_model('app', 'Contact')
+    Product = apps.get_model('app', 'Product')
+    products = list(Product.objects.values_list('name', 'slug'))
+    values = Contact.objects.exclude(product__in=['', 'other']).exclude(product=None) \
+        .values_list('product', flat=True).distinct()
+    mapping = {}
+    for value in values:
+        slug = _match(value, products)
+        if slug and slug != value:
+            mapping[value] = slug
+    _convert(apps, mapping)
+
+
+def slugs_to_names(apps, schema_editor):
+    # A name longer than the column would be cut mid-word; keep the slug instead.
+    Product = apps.get_model('app', 'Product')
+    max_length = apps.get_model('app', 'Contact')._meta.get_field('product').max_length
+    _convert(apps, {slug: name for slug, name in Product.objects.values_list('slug', 'name')
+                    if len(name) <= max_length})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_translations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='product',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Product Interest'),
+        ),
+        migrations.RunPython(names_to_slugs, slugs_to_names),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_contact_product_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBlog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='app.companyblog')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='app.companyblog')),
+            ],
+            options={
+                'ordering': ['source', 'rank'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('source', 'rank'), name='related_blog_rank')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='app.product')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='app.product')),
+            ],
+            options={
+                'ordering': ['source', 'rank'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('source', 'rank'), name='related_product_rank')],
+            },
+        ),
+    ]
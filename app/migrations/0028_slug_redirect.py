@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def add_triazine_redirect(apps, schema_editor):
+    # The old hard-coded MEA Triazine page (/triazine, /products/MEA-Triazine)
+    Product = apps.get_model('app', 'Product')
+    SlugRedirect = apps.get_model('app', 'SlugRedirect')
+    product = Product.objects.filter(name__istartswith='MEA Triazine').order_by('-priority', 'pk').first()
+    if product and product.slug != 'mea-triazine':
+        SlugRedirect.objects.get_or_create(kind='product', old_slug='mea-triazine',
+                                           defaults={'new_slug': product.slug})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_related_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('companyblog', 'Company blog')], max_length=20)),
+                ('old_slug', models.CharField(help_text='Lower-case; matched case-insensitively', max_length=200)),
+                ('new_slug', models.SlugField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['kind', 'old_slug'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'old_slug'), name='slug_redirect_old_slug')],
+            },
+        ),
+        migrations.RunPython(add_triazine_redirect, migrations.RunPython.noop),
+    ]
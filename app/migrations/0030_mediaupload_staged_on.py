@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_product_numeric_specs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaupload',
+            name='staged_on',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
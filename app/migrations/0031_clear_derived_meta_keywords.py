@@ -0,0 +1,50 @@
+from django.db import migrations
+
+RELATED = {'Product': 'category', 'CompanyBlog': None, 'ProductBlog': 'product'}
+SITE_NAME = 'Vasudev Chemo Pharma'
+
+
+def derived_keywords(name, obj):
+    # Frozen copy of the keywords the SEO backfill used to store, so later
+    # changes to app.seo cannot change which rows this migration clears.
+    if name == 'Product':
+        words = [obj.name]
+        if obj.category_id:
+            words.append(obj.category.name)
+        if obj.cas_number:
+            words.append(f'CAS {obj.cas_number}')
+        words += [f'{obj.name} manufacturer', f'{obj.name} supplier India']
+    else:
+        words = [obj.title]
+        if name == 'ProductBlog':
+            words.append(obj.product.name)
+        words += ['blog', SITE_NAME]
+    seen = []
+    for word in words:
+        if word and word.lower() not in (w.lower() for w in seen):
+            seen.append(word)
+    return ', '.join(seen)[:1300]
+
+
+def clear_derived_keywords(apps, schema_editor):
+    # Keywords are now derived when rendered; keep only the ones typed in the admin.
+    for name, related in RELATED.items():
+        model = apps.get_model('app', name)
+        queryset = model.objects.exclude(meta_keywords='')
+        if related:
+            queryset = queryset.select_related(related)
+        derived = [obj.pk for obj in queryset.iterator(chunk_size=1000)
+                   if obj.meta_keywords == derived_keywords(name, obj)]
+        for start in range(0, len(derived), 500):
+            model.objects.filter(pk__in=derived[start:start + 500]).update(meta_keywords='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0030_mediaupload_staged_on'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_derived_keywords, migrations.RunPython.noop),
+    ]
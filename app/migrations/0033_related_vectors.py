@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+def clear_indexes(apps, schema_editor):
+    # Pickled indexes cannot be read any more; build_related writes new ones.
+    apps.get_model('app', 'RelatedIndex').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0032_relatedindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_indexes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='relatedindex',
+            name='data',
+        ),
+        migrations.AddField(
+            model_name='relatedindex',
+            name='vocab',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='relatedindex',
+            name='idf',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RelatedVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('terms', models.BinaryField()),
+                ('weights', models.BinaryField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='related_vector_object')],
+            },
+        ),
+        migrations.RunPython(migrations.RunPython.noop, clear_indexes),
+    ]
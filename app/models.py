@@ -1,15 +1,28 @@
+import os
+
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
-from django.utils.html import strip_tags
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from . import seo, specs
+from .locales import validate_translations
+from .imageproxy import normalize_image_url, url_key
+from .storage import CachedURLStorage, MirroredStorage
 
 
 # -------------------------------------------------------------------
 # Helper: Dynamic storage (optional if using Google Drive or custom storage)
 # -------------------------------------------------------------------
 def get_file_storage():
-    """Return storage callable from settings."""
-    return settings.FILE_STORAGE_FUNCTION()
+    """
+    Return the storage from settings, mirrored locally and with URL lookups cached.
+
+    The settings backend (and the Google Drive client it imports) is only
+    built when a media file is first touched.
+    """
+    return CachedURLStorage(MirroredStorage(SimpleLazyObject(settings.FILE_STORAGE_FUNCTION)))
 
 
 # -------------------------------------------------------------------
@@ -33,20 +46,16 @@ class DownloadEmail(models.Model):
 # Contact Form Messages
 # -------------------------------------------------------------------
 class Contact(models.Model):
-    PRODUCT_CHOICES = [
-        ('', 'Select a product'),
-        ('MEA TRIAZINE 78%', 'MEA TRIAZINE 78%'),
-        ('P-TOLUENE SULPHONIC ACID', 'P-TOLUENE SULPHONIC ACID'),
-        ('DIISOPROPYLAMINO ETHYLYNE DIAMINE', 'DIISOPROPYLAMINO ETHYLYNE DIAMINE'),
-        ('SODIUM CUMENE SULPHONATE', 'SODIUM CUMENE SULPHONATE'),
-        ('other', 'Other'),
-    ]
+    # Stored in ``product`` when the visitor picks "Other" rather than a product slug
+    OTHER_PRODUCT = 'other'
+    OTHER_PRODUCT_LABEL = 'Other Industrial Chemicals'
 
     name = models.CharField(max_length=100, verbose_name="Full Name")
     email = models.EmailField(verbose_name="Email Address")
     company = models.CharField(max_length=150, blank=True, null=True, verbose_name="Company Name")
     phone = models.CharField(max_length=20, blank=True, null=True, verbose_name="Phone Number")
-    product = models.CharField(max_length=50, choices=PRODUCT_CHOICES, blank=True, null=True, verbose_name="Product Interest")
+    # Product slug; choices come from the active products (app.caching.product_names)
+    product = models.CharField(max_length=50, blank=True, null=True, verbose_name="Product Interest")
     message = models.TextField(verbose_name="Message")
     created_at = models.DateTimeField(default=timezone.now)
     is_read = models.BooleanField(default=False)
@@ -61,10 +70,13 @@ class Contact(models.Model):
 
     @property
     def get_product_display_name(self):
-        for choice in self.PRODUCT_CHOICES:
-            if choice[0] == self.product:
-                return choice[1]
-        return self.product
+        if self.product == self.OTHER_PRODUCT:
+            return self.OTHER_PRODUCT_LABEL
+        if not self.product:
+            return self.product
+        from .caching import product_names
+        # Products deleted or deactivated since keep showing their slug.
+        return product_names().get(self.product, self.product)
 
 
 # -------------------------------------------------------------------
@@ -109,15 +121,29 @@ class Product(models.Model):
     density = models.CharField(max_length=100, blank=True)
     boiling_point = models.CharField(max_length=100, blank=True)
     melting_point = models.CharField(max_length=100, blank=True)
+    # Numeric forms of the spec text above, parsed on save (see app/specs.py)
+    molecular_weight_g_mol = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    density_g_cm3 = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    boiling_point_c = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    melting_point_c = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    purity_pct = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    assay_pct = models.FloatField(null=True, blank=True, editable=False, db_index=True)
 
     # Image (with optional Google Drive URL)
     image_url = models.URLField(
         max_length=500, blank=True, null=True,
         help_text="https://lh3.googleusercontent.com/d/ID)"
     )
+    # Embeddable form of image_url, computed on save
+    direct_image_url = models.URLField(max_length=500, blank=True, null=True, editable=False)
     main_image = models.ImageField(upload_to='products/images/', blank=True, null=True)
     gallery_image_1 = models.ImageField(upload_to='products/images/', blank=True, null=True)
     gallery_image_2 = models.ImageField(upload_to='products/images/', blank=True, null=True)
+    # Inline placeholder and intrinsic size of the card image, computed on save
+    image_lqip = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_lqip_source = models.CharField(max_length=500, blank=True, editable=False)
 
     # Files and media
     video = models.FileField(
@@ -144,6 +170,12 @@ class Product(models.Model):
     meta_title = models.CharField(max_length=150, blank=True)
     meta_description = models.CharField(max_length=800, blank=True)
     meta_keywords = models.CharField(max_length=1300, blank=True)
+    # Rendered <head> tags and JSON-LD, computed on save (see app/seohead.py)
+    seo_head = models.TextField(blank=True, editable=False)
+    # Fingerprint of the fields seo_head was built from (app.seo.content_hash)
+    seo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Per-language text, e.g. {"es": {"name": "...", "short_description": "..."}} (see app/locales.py)
+    translations = models.JSONField(default=dict, blank=True, validators=[validate_translations])
     # Schema / reviews
     schema_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0,
                                         help_text='Average rating for schema.org (0.00 - 5.00)')
@@ -152,6 +184,8 @@ class Product(models.Model):
     # Control fields
     is_active = models.BooleanField(default=True)
 
+    DOWNLOAD_FIELDS = {'coa': 'coa_pdf', 'tds': 'tds_pdf', 'video': 'video'}
+
     class Meta:
         ordering = ['-priority', 'name']
 
@@ -163,6 +197,25 @@ class Product(models.Model):
         """Check if product has downloadable files."""
         return bool(self.coa_pdf or self.tds_pdf)
 
+    def get_download_url(self, kind):
+        """Local download URL for the 'coa', 'tds' or 'video' file."""
+        file = getattr(self, self.DOWNLOAD_FIELDS[kind])
+        if not file:
+            return None
+        return reverse('download_product_file', args=[self.slug, kind, os.path.basename(file.name)])
+
+    @property
+    def coa_download_url(self):
+        return self.get_download_url('coa')
+
+    @property
+    def tds_download_url(self):
+        return self.get_download_url('tds')
+
+    @property
+    def video_download_url(self):
+        return self.get_download_url('video')
+
     @property
     def specs(self):
         """Return product specifications as a dictionary."""
@@ -182,34 +235,68 @@ class Product(models.Model):
         return specs
 
     def get_direct_image_url(self):
-        """Convert Google Drive URL to embeddable format if applicable."""
-        if not self.image_url:
+        """Google Drive URL in embeddable format (stored on save)."""
+        return self.direct_image_url
+
+    @property
+    def proxied_image_url(self):
+        """Locally cached copy of the remote image, served by the image proxy."""
+        if not self.direct_image_url:
             return None
-        import re
-        match = re.search(r'/file/d/([a-zA-Z0-9_-]+)', self.image_url)
-        if match:
-            file_id = match.group(1)
-            return f"https://drive.google.com/uc?export=view&id={file_id}"
-        return self.image_url
+        return reverse('image_proxy', args=[self.pk, url_key(self.direct_image_url)])
+
+    @property
+    def keywords(self):
+        """``meta_keywords``, or keywords derived from the product and its category."""
+        return seo.meta_keywords(self)
 
     def save(self, *args, **kwargs):
-        """Auto-generate meta_description when empty using short/detailed description."""
-        # Prefer existing value
-        if not self.meta_description:
-            # pick the most descriptive field available
-            source = self.short_description or self.detailed_description or ''
-            # strip any HTML and truncate to ~150 chars for SERP
-            clean = strip_tags(source)[:160].strip()
-            # ensure we don't cut in the middle of a word if possible
-            if len(clean) > 150:
-                # cut at last space before 150
-                idx = clean.rfind(' ', 0, 150)
-                if idx > 50:
-                    clean = clean[:idx]
-            self.meta_description = clean
+        """Fill a blank meta description and the numeric spec columns."""
+        self.direct_image_url = normalize_image_url(self.image_url)
+        seo.fill_text(self)
+        specs.fill(self)
         super().save(*args, **kwargs)
 
 
+# -------------------------------------------------------------------
+# Queued media uploads (see app/uploads.py)
+# -------------------------------------------------------------------
+class MediaUpload(models.Model):
+    PENDING = 'pending'
+    UPLOADING = 'uploading'
+    RETRY = 'retry'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (UPLOADING, 'Uploading'),
+        (RETRY, 'Waiting to retry'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='media_uploads')
+    field_name = models.CharField(max_length=50)
+    filename = models.CharField(max_length=255)
+    staged_name = models.CharField(max_length=500)
+    # Host whose UPLOAD_STAGING_ROOT holds the staged file; only it can upload
+    staged_on = models.CharField(max_length=255, blank=True, db_index=True)
+    remote_name = models.CharField(max_length=500, blank=True)
+    size = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.product} - {self.field_name} - {self.status}"
+
+
 # -------------------------------------------------------------------
 # Product FAQs
 # -------------------------------------------------------------------
@@ -279,24 +366,30 @@ class CompanyBlog(models.Model):
     published_at = models.DateTimeField(default=timezone.now)
     author = models.CharField(max_length=100)
     image = models.ImageField(upload_to='blog_images/', blank=True, null=True)
+    image_lqip = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_lqip_source = models.CharField(max_length=500, blank=True, editable=False)
     # SEO fields
     meta_title = models.CharField(max_length=150, blank=True)
     meta_description = models.CharField(max_length=800, blank=True)
     meta_keywords = models.CharField(max_length=1300, blank=True)
+    seo_head = models.TextField(blank=True, editable=False)
+    seo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    translations = models.JSONField(default=dict, blank=True, validators=[validate_translations])
 
     class Meta:
         ordering = ['-published_at']
 
     def __str__(self):
         return self.title
+
+    @property
+    def keywords(self):
+        return seo.meta_keywords(self)
+
     def save(self, *args, **kwargs):
-        if not self.meta_description:
-            clean = strip_tags(self.content)[:160].strip()
-            if len(clean) > 150:
-                idx = clean.rfind(' ', 0, 150)
-                if idx > 50:
-                    clean = clean[:idx]
-            self.meta_description = clean
+        seo.fill_text(self)
         super().save(*args, **kwargs)
     
 class ProductBlog(models.Model):
@@ -310,6 +403,9 @@ class ProductBlog(models.Model):
     meta_title = models.CharField(max_length=150, blank=True)
     meta_description = models.CharField(max_length=800, blank=True)
     meta_keywords = models.CharField(max_length=1300, blank=True)
+    seo_head = models.TextField(blank=True, editable=False)
+    seo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    translations = models.JSONField(default=dict, blank=True, validators=[validate_translations])
 
     class Meta:
         ordering = ['-published_at']
@@ -317,11 +413,89 @@ class ProductBlog(models.Model):
     def __str__(self):
         return self.title
     def save(self, *args, **kwargs):
-        if not self.meta_description:
-            clean = strip_tags(self.content)[:160].strip()
-            if len(clean) > 150:
-                idx = clean.rfind(' ', 0, 150)
-                if idx > 50:
-                    clean = clean[:idx]
-            self.meta_description = clean
-        super().save(*args, **kwargs)
\ No newline at end of file
+        seo.fill_text(self)
+        super().save(*args, **kwargs)
+
+# -------------------------------------------------------------------
+# Old slugs and legacy URLs (resolved by app/slugs.py)
+# -------------------------------------------------------------------
+class SlugRedirect(models.Model):
+    KIND_CHOICES = [
+        ('product', 'Product'),
+        ('companyblog', 'Company blog'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    old_slug = models.CharField(max_length=200, help_text="Lower-case; matched case-insensitively")
+    new_slug = models.SlugField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['kind', 'old_slug']
+        constraints = [models.UniqueConstraint(fields=['kind', 'old_slug'], name='slug_redirect_old_slug')]
+
+    def __str__(self):
+        return f"{self.kind}: {self.old_slug} -> {self.new_slug}"
+
+    def save(self, *args, **kwargs):
+        self.old_slug = self.old_slug.strip().lower()
+        super().save(*args, **kwargs)
+
+
+# -------------------------------------------------------------------
+# Related content (computed by app/related.py)
+# -------------------------------------------------------------------
+class RelatedContent(models.Model):
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        abstract = True
+        ordering = ['source', 'rank']
+
+
+class RelatedProduct(RelatedContent):
+    source = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    target = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_from')
+
+    class Meta(RelatedContent.Meta):
+        constraints = [models.UniqueConstraint(fields=['source', 'rank'], name='related_product_rank')]
+
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id} ({self.score:.3f})"
+
+
+class RelatedBlog(RelatedContent):
+    source = models.ForeignKey(CompanyBlog, on_delete=models.CASCADE, related_name='related_links')
+    target = models.ForeignKey(CompanyBlog, on_delete=models.CASCADE, related_name='related_from')
+
+    class Meta(RelatedContent.Meta):
+        constraints = [models.UniqueConstraint(fields=['source', 'rank'], name='related_blog_rank')]
+
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id} ({self.score:.3f})"
+
+
+class RelatedIndex(models.Model):
+    """Vocabulary and IDF weights of one kind, written by build_related."""
+    kind = models.CharField(max_length=20, primary_key=True)
+    vocab = models.JSONField(default=list)  # terms in column order
+    idf = models.BinaryField()              # np.save of float32 weights
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.kind
+
+
+class RelatedVector(models.Model):
+    """One object's TF-IDF vector, as its strongest terms and their weights."""
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    terms = models.BinaryField()    # np.save of int32 vocabulary columns
+    weights = models.BinaryField()  # np.save of float32 weights, unit length
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='related_vector_object')]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
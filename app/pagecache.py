@@ -0,0 +1,224 @@
+"""
+Stale-while-revalidate cache for whole anonymous pages.
+
+``swr_page`` keeps the rendered page in the Django cache. A fresh copy is
+served as is. Once it goes stale (its jittered expiry passed, or a catalog
+edit bumped the content version in app.caching) the stale copy is still
+served and a single background job re-renders it. The ``page-lock:`` key
+(``cache.add``) makes sure only one worker does the rendering. When there is
+no copy at all, the request holding the lock renders it and the others wait
+up to ``PAGE_CACHE_WAIT`` for that result instead of all hitting the
+database.
+
+Stored pages hold a placeholder where the CSRF token was; every response
+gets the visitor's own token.
+
+Entries are keyed on the path plus the query parameters the page declares
+(``params``), sorted by name, so ``?a=1&b=2`` and ``?b=2&a=1`` share one
+entry. Requests carrying any other parameter bypass the cache, so tracking
+tags and junk query strings cannot fill it.
+
+Each language variant has its own URL (``/es/products``) and so its own
+entry. ``prerender`` fills them ahead of traffic; ``manage.py
+prerender_pages`` runs it for every page and language.
+"""
+import io
+import logging
+import random
+import re
+import time
+from functools import wraps
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.utils import translation
+
+from . import background, caching
+from .httpcache import tag
+
+logger = logging.getLogger(__name__)
+
+CSRF_PLACEHOLDER = '__CSRF_TOKEN__'
+_CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+# WSGI keys copied into the synthetic request used for background renders
+_ENVIRON_KEYS = ('SERVER_NAME', 'SERVER_PORT', 'HTTP_HOST', 'SCRIPT_NAME', 'PATH_INFO',
+                 'QUERY_STRING', 'HTTP_X_FORWARDED_PROTO', 'HTTP_ACCEPT_LANGUAGE', 'wsgi.url_scheme')
+
+# Page name -> (view, fresh_for, stale_for) for every swr_page view. Page
+# names double as URL names so ``prerender`` can find their paths.
+PAGES = {}
+
+
+def _key(name, path):
+    return f'page:{name}:{path}'
+
+
+def _cache_path(request, params):
+    """The path with its query sorted by name, or None if it has a parameter outside ``params``."""
+    if any(name not in params for name in request.GET):
+        return None
+    pairs = sorted(((name, value) for name in request.GET for value in request.GET.getlist(name)),
+                   key=lambda pair: pair[0])
+    return f'{request.path}?{urlencode(pairs)}' if pairs else request.path
+
+
+def _is_fresh(entry):
+    return (
+        entry is not None
+        and entry['fresh_until'] > time.time()
+        and entry['version'] == caching.content_version()
+    )
+
+
+def _cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and getattr(request, 'session_free', False)
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _store(key, response, request, fresh_for, stale_for):
+    if response.status_code != 200 or response.streaming:
+        return None
+    body, substitutions = _CSRF_INPUT_RE.subn(rb'\1' + CSRF_PLACEHOLDER.encode() + rb'\2', response.content)
+    entry = {
+        'body': body,
+        'content_type': response['Content-Type'],
+        'csrf': bool(substitutions),
+        'keys': sorted(getattr(request, 'surrogate_keys', ())),
+        'version': caching.content_version(),
+        # Jitter so pages cached together do not all expire together.
+        'fresh_until': time.time() + fresh_for * random.uniform(0.85, 1.15),
+    }
+    cache.set(key, entry, fresh_for + stale_for)
+    return entry
+
+
+def _serve(request, entry, state):
+    body = entry['body']
+    if entry['csrf']:
+        body = body.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    tag(request, *entry['keys'])
+    response = HttpResponse(body, content_type=entry['content_type'])
+    response['X-Page-Cache'] = state
+    return response
+
+
+def _background_request(environ, language):
+    environ = dict(environ, REQUEST_METHOD='GET')
+    environ['wsgi.input'] = io.BytesIO(b'')
+    request = WSGIRequest(environ)
+    request.session = SessionBase()
+    request.session_free = True
+    request.user = AnonymousUser()
+    request.LANGUAGE_CODE = language
+    return request
+
+
+def _regenerate(view, key, lock_key, environ, language, args, kwargs, fresh_for, stale_for):
+    try:
+        # Worker threads do not inherit the request's active language.
+        with translation.override(language):
+            request = _background_request(environ, language)
+            return _store(key, view(request, *args, **kwargs), request, fresh_for, stale_for)
+    finally:
+        cache.delete(lock_key)
+
+
+def _site_environ(path):
+    url = urlsplit(settings.SITE_URL)
+    return {
+        'SERVER_NAME': url.hostname,
+        'SERVER_PORT': str(url.port or (443 if url.scheme == 'https' else 80)),
+        'HTTP_HOST': url.netloc,
+        'HTTP_X_FORWARDED_PROTO': url.scheme,
+        'PATH_INFO': path,
+        'wsgi.url_scheme': url.scheme,
+    }
+
+
+def prerender(name, language, force=False):
+    """
+    Render page ``name`` in ``language`` into the cache unless a fresh copy
+    is there already. Returns whether it rendered.
+    """
+    view, fresh_for, stale_for = PAGES[name]
+    with translation.override(language):
+        path = reverse(name)
+    key = _key(name, path)
+    lock_key = f'page-lock:{key}'
+    if not force and _is_fresh(cache.get(key)):
+        return False
+    if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        return False
+    fresh = fresh_for or settings.PAGE_CACHE_FRESH_FOR
+    stale = stale_for or settings.PAGE_CACHE_STALE_FOR
+    return _regenerate(view, key, lock_key, _site_environ(path), language, (), {}, fresh, stale) is not None
+
+
+def prerender_all(languages=None, force=False):
+    """Prerender every registered page in ``languages`` (default: all); returns (rendered, skipped)."""
+    rendered = skipped = 0
+    for language in languages or [code for code, _ in settings.LANGUAGES]:
+        for name in PAGES:
+            if prerender(name, language, force):
+                rendered += 1
+            else:
+                skipped += 1
+    return rendered, skipped
+
+
+def swr_page(name, fresh_for=None, stale_for=None, params=()):
+    """
+    Serve the decorated view from the stale-while-revalidate page cache.
+
+    ``params`` names the query parameters the page may be cached with.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            path = _cache_path(request, params)
+            if not settings.PAGE_CACHE_ENABLED or not _cacheable(request) or path is None:
+                return view(request, *args, **kwargs)
+            fresh = fresh_for or settings.PAGE_CACHE_FRESH_FOR
+            stale = stale_for or settings.PAGE_CACHE_STALE_FOR
+            key = _key(name, path)
+            lock_key = f'page-lock:{key}'
+
+            entry = cache.get(key)
+            if entry is not None:
+                if _is_fresh(entry):
+                    return _serve(request, entry, 'hit')
+                if cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                    environ = {k: request.META[k] for k in _ENVIRON_KEYS if k in request.META}
+                    background.submit(_regenerate, view, key, lock_key, environ, translation.get_language(),
+                                      args, kwargs, fresh, stale)
+                return _serve(request, entry, 'stale')
+
+            if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                # Someone else is rendering it; wait for their copy.
+                deadline = time.monotonic() + settings.PAGE_CACHE_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return _serve(request, entry, 'coalesced')
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+                _store(key, response, request, fresh, stale)
+            finally:
+                cache.delete(lock_key)
+            response['X-Page-Cache'] = 'miss'
+            return response
+        PAGES[name] = (view, fresh_for, stale_for)
+        return wrapped
+    return decorator
@@ -0,0 +1,77 @@
+"""
+Per-request performance counters.
+
+``ServerTimingMiddleware`` opens a ``RequestMetrics`` for a sampled request;
+the DB execute wrapper, the timed template backend and the instrumented cache
+backends add to whichever one is active in the current context. Outside a
+sampled request ``current()`` is None and the hooks do nothing.
+"""
+import time
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = (
+        'start', 'db_count', 'db_time', 'template_time',
+        'cache_hits', 'cache_misses', '_token',
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def activate(self):
+        self._token = _current.set(self)
+        return self
+
+    def deactivate(self):
+        _current.reset(self._token)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_count += 1
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}", '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+    def as_log_fields(self, total):
+        return {
+            'duration_ms': round(total * 1000, 2),
+            'db_queries': self.db_count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    return _current.get()
+
+
+def record_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def record_template(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.template_time += duration
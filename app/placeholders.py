@@ -0,0 +1,74 @@
+"""
+Low-quality image placeholders (LQIP) for product and blog cards.
+
+Each row stores a tiny inline data URI plus the intrinsic size of its card
+image, so templates can reserve space and paint a blurred preview before the
+real image arrives. ``image_lqip_source`` records which image the placeholder
+was built from; rows are only reprocessed when that changes.
+"""
+import logging
+from io import BytesIO
+
+from . import caching, imageproxy
+from .images import make_placeholder
+from .models import CompanyBlog, Product
+
+logger = logging.getLogger(__name__)
+
+
+def placeholder_source(obj):
+    """
+    Identify the image shown on ``obj``'s card ('' if none).
+
+    Same order as the templates: a product's remote ``image_url`` (through
+    the image proxy) wins over its uploaded ``main_image``.
+    """
+    if isinstance(obj, Product):
+        if obj.direct_image_url:
+            return obj.direct_image_url
+        return obj.main_image.name if obj.main_image else ''
+    return obj.image.name if obj.image else ''
+
+
+def _open_source(obj):
+    if isinstance(obj, Product) and obj.direct_image_url:
+        return open(imageproxy.get_or_fetch(obj.direct_image_url), 'rb')
+    fieldfile = obj.main_image if isinstance(obj, Product) else obj.image
+    with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+        return BytesIO(f.read())
+
+
+def refresh_placeholder(model, pk, force=False):
+    """
+    Recompute the placeholder for one row if its source image changed.
+
+    Returns True if the row was rewritten; the caller invalidates the content
+    cache, so a backfill bumps the version once rather than per row.
+    """
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return False
+    source = placeholder_source(obj)
+    if source == obj.image_lqip_source and not force:
+        return False
+    fields = {'image_lqip': '', 'image_width': None, 'image_height': None, 'image_lqip_source': source}
+    if source:
+        try:
+            with _open_source(obj) as f:
+                fields['image_lqip'], fields['image_width'], fields['image_height'] = make_placeholder(f)
+        except Exception:
+            logger.exception('Could not build placeholder for %s %s', model.__name__, pk)
+            return False
+    # update() avoids re-running save() and its signal handlers
+    model.objects.filter(pk=pk).update(**fields)
+    return True
+
+
+def refresh_and_invalidate(model, pk):
+    """Background entry point for a single saved row."""
+    if refresh_placeholder(model, pk):
+        # Runs after commit, so the save's own invalidation came too early.
+        caching.invalidate()
+
+
+PLACEHOLDER_MODELS = {'product': Product, 'companyblog': CompanyBlog}
@@ -0,0 +1,87 @@
+"""
+SQL fingerprinting, slow-query logging and N+1 detection.
+
+``QueryLogMiddleware`` wraps every statement of a sampled request, groups
+them by fingerprint (the SQL with literals and ``IN`` lists collapsed) and
+writes JSON lines to the ``app.querylog`` logger, which settings route to a
+rotating file:
+
+* ``slow``: one statement over ``QUERY_SLOW_MS``
+* ``n_plus_one``: a fingerprint run more than ``QUERY_N_PLUS_ONE_THRESHOLD``
+  times in one request
+* ``request``: count and time per fingerprint for the whole request
+
+``manage.py query_report`` aggregates the file across a load run.
+"""
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+
+querylog_logger = logging.getLogger('app.querylog')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+_VALUES_RE = re.compile(r'\bVALUES\s*(\(\?\))(?:\s*,\s*\(\?\))*', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Normalise ``sql`` so statements differing only in values compare equal.
+
+    ``WHERE id IN (%s, %s, %s)`` and ``WHERE id = 42`` become
+    ``WHERE id IN (?)`` and ``WHERE id = ?``.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(?)', sql)
+    sql = _VALUES_RE.sub(r'VALUES \1', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryTracker:
+    """Execute wrapper collecting per-fingerprint stats for one request."""
+
+    def __init__(self, slow_seconds):
+        self.slow_seconds = slow_seconds
+        self.stats = {}  # fingerprint -> [count, seconds]
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            fp = fingerprint(sql)
+            row = self.stats.get(fp)
+            if row is None:
+                row = self.stats[fp] = [0, 0.0]
+            row[0] += 1
+            row[1] += duration
+            if duration >= self.slow_seconds:
+                self.slow.append((fp, sql, duration))
+
+    def records(self, view, threshold):
+        """JSON-ready records for the finished request."""
+        ts = round(time.time(), 3)
+        for fp, sql, duration in self.slow:
+            yield {'type': 'slow', 'ts': ts, 'view': view, 'fingerprint': fp,
+                   'sql': sql[:2000], 'ms': round(duration * 1000, 2)}
+        for fp, (count, seconds) in self.stats.items():
+            if count > threshold:
+                yield {'type': 'n_plus_one', 'ts': ts, 'view': view, 'fingerprint': fp,
+                       'count': count, 'ms': round(seconds * 1000, 2)}
+        yield {
+            'type': 'request', 'ts': ts, 'view': view,
+            'queries': [[fp, count, round(seconds * 1000, 3)] for fp, (count, seconds) in self.stats.items()],
+        }
+
+
+def write(records):
+    for record in records:
+        querylog_logger.info(json.dumps(record, separators=(',', ':')))
@@ -0,0 +1,424 @@
+"""
+Related products and blog posts by TF-IDF similarity.
+
+Each active product is a document made of its name, category,
+descriptions, applications and product blog posts. Each company blog post
+is a document made of its title, keywords and content. ``rebuild`` fits
+TF-IDF vectors with NumPy and stores the ``RELATED_CONTENT_TOP_K`` nearest
+neighbours of every object in RelatedProduct / RelatedBlog. Views then read
+those rows with one indexed join.
+
+Each vector keeps only its ``RELATED_CONTENT_MAX_TERMS`` heaviest terms,
+so the index grows linearly with the number of objects. Similarities are
+scored a block of rows at a time, keeping a running top k with
+``np.argpartition``, so peak memory does not depend on the catalogue size.
+
+The vocabulary and IDF weights are stored in RelatedIndex, each object's
+vector in RelatedVector, and the current neighbours are the link rows
+themselves. Arrays are written with ``np.save`` and the vocabulary as JSON.
+When an object changes, ``update`` rewrites only its vector and the lists it
+affects: its own list, the lists it was on, and the lists it now beats the
+last entry of. Each worker keeps the index in memory and reloads it from the
+database when the revision in the ``state`` cache (see app.caching) moves.
+The vocabulary and IDF weights stay fixed between rebuilds, so words new
+since the last ``manage.py build_related`` are ignored until the next one.
+Until ``build_related`` has run for a kind there is no index, ``update``
+does nothing and views fall back to simple queries (``built``).
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from . import background, httpcache
+from .caching import state, state_lock
+from .models import CompanyBlog, Product, RelatedBlog, RelatedIndex, RelatedProduct, RelatedVector
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 60
+# Rows scored per query block and per target block; peak scratch memory is
+# about QUERY_ROWS * (vocabulary + TARGET_ROWS * max terms) floats.
+QUERY_ROWS = 64
+TARGET_ROWS = 1024
+_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9\-]*[a-z0-9]')
+STOP_WORDS = frozenset('''
+    a about above after all also an and any are as at be been being below both but by can could did do
+    does doing down during each few for from further had has have having here how if in into is it its
+    itself just more most no nor not of off on once only or other our out over own same should so some
+    such than that the their them then there these they this those through to too under until up use
+    used uses using very was we were what when where which while who whom why will with would you your
+'''.split())
+
+QUERYSETS = {
+    'product': lambda: Product.objects.filter(is_active=True).select_related('category')
+    .prefetch_related('applications', 'Blogs'),
+    'companyblog': lambda: CompanyBlog.objects.all(),
+}
+LINK_MODELS = {'product': RelatedProduct, 'companyblog': RelatedBlog}
+
+_built = set()
+_indexes = {}   # kind -> (revision, Index) loaded by this worker
+_pending = {}   # kind -> pks waiting for update
+_pending_lock = threading.Lock()
+
+
+# ------------------------------------------------------------------
+# Documents
+# ------------------------------------------------------------------
+def tokenize(*texts):
+    tokens = []
+    for text in texts:
+        for token in _TOKEN_RE.findall(strip_tags(text or '').lower()):
+            if token not in STOP_WORDS and not token.isdigit():
+                tokens.append(token)
+    return tokens
+
+
+def product_document(product):
+    # The name counts three times so that it outweighs long descriptions.
+    texts = [product.name] * 3 + [
+        product.category.name if product.category_id else '',
+        product.short_description, product.detailed_description, product.application,
+    ]
+    for application in product.applications.all():
+        texts += [application.title, application.description]
+    for blog in product.Blogs.all():
+        texts += [blog.title, blog.content]
+    return tokenize(*texts)
+
+
+def blog_document(blog):
+    return tokenize(*[blog.title] * 3, blog.meta_keywords, blog.content)
+
+
+DOCUMENTS = {'product': product_document, 'companyblog': blog_document}
+
+
+# ------------------------------------------------------------------
+# Index
+# ------------------------------------------------------------------
+class Index:
+    """
+    Fitted TF-IDF model with one sparse row per indexed object.
+
+    Row ``i`` is ``weights[i]`` at vocabulary columns ``terms[i]``, padded
+    with zero weights up to the width of the widest row.
+    """
+
+    def __init__(self, vocab, idf, ids, terms, weights):
+        self.vocab = vocab
+        self.idf = idf
+        self.ids = list(ids)
+        self.terms = terms
+        self.weights = weights
+        self.neighbours = {}
+        self._reindex()
+
+    def _reindex(self):
+        self.pos = {pk: row for row, pk in enumerate(self.ids)}
+
+    @classmethod
+    def fit(cls, ids, documents):
+        vocab = {}
+        for tokens in documents:
+            for token in tokens:
+                vocab.setdefault(token, len(vocab))
+        df = np.zeros(len(vocab), dtype=np.float32)
+        for tokens in documents:
+            df[[vocab[token] for token in set(tokens)]] += 1
+        # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+        idf = np.log((1 + len(documents)) / (1 + df)) + 1
+        width = settings.RELATED_CONTENT_MAX_TERMS
+        index = cls(vocab, idf, ids, np.zeros((len(ids), width), dtype=np.int32),
+                    np.zeros((len(ids), width), dtype=np.float32))
+        for row, tokens in enumerate(documents):
+            index._set_row(row, *index.vectorize(tokens))
+        return index
+
+    def vectorize(self, tokens):
+        """``(terms, weights)`` of the heaviest terms of ``tokens``, scaled to unit length."""
+        counts = [(self.vocab[token], count) for token, count in Counter(tokens).items() if token in self.vocab]
+        terms = np.array([col for col, _ in counts], dtype=np.int32)
+        weights = np.array([(1 + math.log(count)) * self.idf[col] for col, count in counts], dtype=np.float32)
+        width = self.terms.shape[1]
+        if len(terms) > width:
+            keep = np.argpartition(-weights, width - 1)[:width]
+            terms, weights = terms[keep], weights[keep]
+        norm = np.linalg.norm(weights)
+        return terms, weights / norm if norm else weights
+
+    def _set_row(self, row, terms, weights):
+        self.terms[row] = 0
+        self.weights[row] = 0
+        self.terms[row, :len(terms)] = terms
+        self.weights[row, :len(weights)] = weights
+
+    def vector(self, pk):
+        """The stored ``(terms, weights)`` of ``pk``, without padding."""
+        row = self.pos[pk]
+        used = self.weights[row] > 0
+        return self.terms[row][used], self.weights[row][used]
+
+    def upsert(self, pk, terms, weights):
+        row = self.pos.get(pk)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(pk)
+            self.terms = np.vstack([self.terms, np.zeros((1, self.terms.shape[1]), dtype=np.int32)])
+            self.weights = np.vstack([self.weights, np.zeros((1, self.weights.shape[1]), dtype=np.float32)])
+            self._reindex()
+        self._set_row(row, terms, weights)
+
+    def remove(self, pk):
+        row = self.pos.get(pk)
+        if row is None:
+            return
+        del self.ids[row]
+        self.terms = np.delete(self.terms, row, axis=0)
+        self.weights = np.delete(self.weights, row, axis=0)
+        self.neighbours.pop(pk, None)
+        self._reindex()
+
+    def _dense(self, rows):
+        """The vectors of ``rows`` as a dense ``len(rows) x vocabulary`` block."""
+        dense = np.zeros((len(rows), len(self.vocab)), dtype=np.float32)
+        np.add.at(dense, (np.repeat(np.arange(len(rows)), self.terms.shape[1]), self.terms[rows].ravel()),
+                  self.weights[rows].ravel())
+        return dense
+
+    def _blocks(self, dense):
+        """``(start, scores)`` of the queries in ``dense`` against each block of rows."""
+        for start in range(0, len(self.ids), TARGET_ROWS):
+            stop = start + TARGET_ROWS
+            yield start, np.einsum('qrt,rt->qr', dense[:, self.terms[start:stop]], self.weights[start:stop])
+
+    def scores(self, pk):
+        """Similarity of ``pk`` to every indexed object, in ``ids`` order."""
+        dense = self._dense([self.pos[pk]])
+        return np.concatenate([scores[0] for _, scores in self._blocks(dense)])
+
+    def top_k(self, pks, k):
+        """Nearest neighbours ``[(pk, score), ...]`` of each of ``pks``."""
+        result = {}
+        for offset in range(0, len(pks), QUERY_ROWS):
+            chunk = pks[offset:offset + QUERY_ROWS]
+            rows = np.array([self.pos[pk] for pk in chunk])
+            best_rows = np.empty((len(rows), 0), dtype=np.int64)
+            best_scores = np.empty((len(rows), 0), dtype=np.float32)
+            for start, scores in self._blocks(self._dense(rows)):
+                targets = np.arange(start, start + scores.shape[1])
+                scores[targets == rows[:, np.newaxis]] = -1  # never related to itself
+                best_rows = np.hstack([best_rows, np.broadcast_to(targets, scores.shape)])
+                best_scores = np.hstack([best_scores, scores])
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            for i, pk in enumerate(chunk):
+                order = np.lexsort((best_rows[i], -best_scores[i]))
+                result[pk] = [(self.ids[best_rows[i, j]], float(best_scores[i, j]))
+                              for j in order if best_scores[i, j] > 0]
+        return result
+
+
+# ------------------------------------------------------------------
+# Storage
+# ------------------------------------------------------------------
+def _to_bytes(array):
+    buffer = BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _from_bytes(data):
+    return np.load(BytesIO(bytes(data)), allow_pickle=False)
+
+
+def _revision_key(kind):
+    return f'related-revision:{kind}'
+
+
+def _publish(kind, index):
+    """Make ``index`` this worker's copy and tell the others to reload."""
+    revision = time.time_ns()
+    state.set(_revision_key(kind), revision, None)
+    _indexes[kind] = (revision, index)
+
+
+def _store(kind, index):
+    """Write the full snapshot of ``index`` (rebuilds only)."""
+    RelatedIndex.objects.update_or_create(
+        kind=kind, defaults={'vocab': sorted(index.vocab, key=index.vocab.get), 'idf': _to_bytes(index.idf)})
+    RelatedVector.objects.filter(kind=kind).delete()
+    RelatedVector.objects.bulk_create(
+        (_vector_row(kind, index, pk) for pk in index.ids), batch_size=500)
+
+
+def _vector_row(kind, index, pk):
+    terms, weights = index.vector(pk)
+    return RelatedVector(kind=kind, object_id=pk, terms=_to_bytes(terms), weights=_to_bytes(weights))
+
+
+def _store_vector(kind, index, pk):
+    """Write or delete the stored vector of ``pk`` alone."""
+    if pk in index.pos:
+        row = _vector_row(kind, index, pk)
+        RelatedVector.objects.update_or_create(
+            kind=kind, object_id=pk, defaults={'terms': row.terms, 'weights': row.weights})
+    else:
+        RelatedVector.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def _read(kind):
+    row = RelatedIndex.objects.filter(kind=kind).first()
+    if row is None:
+        return None
+    vectors = [
+        (object_id, _from_bytes(terms), _from_bytes(weights))
+        for object_id, terms, weights in RelatedVector.objects.filter(kind=kind).order_by('object_id')
+        .values_list('object_id', 'terms', 'weights').iterator(chunk_size=2000)
+    ]
+    width = max([settings.RELATED_CONTENT_MAX_TERMS] + [len(terms) for _, terms, _ in vectors])
+    index = Index({term: col for col, term in enumerate(row.vocab)}, _from_bytes(row.idf),
+                  [object_id for object_id, _, _ in vectors],
+                  np.zeros((len(vectors), width), dtype=np.int32), np.zeros((len(vectors), width), dtype=np.float32))
+    for i, (_, terms, weights) in enumerate(vectors):
+        index._set_row(i, terms, weights)
+    links = LINK_MODELS[kind].objects.order_by('source_id', 'rank').values_list('source_id', 'target_id', 'score')
+    for source, target, score in links.iterator(chunk_size=2000):
+        index.neighbours.setdefault(source, []).append((target, score))
+    return index
+
+
+def _load(kind):
+    """This worker's index of ``kind``, or None before ``build_related`` has run."""
+    revision = state.get(_revision_key(kind))
+    local = _indexes.get(kind)
+    if local is not None and revision is not None and local[0] == revision:
+        return local[1]
+    index = _read(kind)
+    if index is None:
+        _indexes.pop(kind, None)
+    else:
+        _publish(kind, index)
+    return index
+
+
+def built(kind):
+    """Whether ``kind`` has an index, so its stored lists are complete."""
+    if kind not in _built and RelatedIndex.objects.filter(kind=kind).exists():
+        _built.add(kind)
+    return kind in _built
+
+
+def _write(kind, neighbours):
+    """Replace the stored lists of the sources in ``neighbours``."""
+    link_model = LINK_MODELS[kind]
+    rows = [
+        link_model(source_id=source, target_id=target, rank=rank, score=score)
+        for source, targets in neighbours.items()
+        for rank, (target, score) in enumerate(targets)
+    ]
+    with transaction.atomic():
+        link_model.objects.filter(source_id__in=list(neighbours)).delete()
+        link_model.objects.bulk_create(rows, batch_size=500)
+    httpcache.purge({f'{kind}-{pk}' for pk in neighbours})
+
+
+def _rebuild(kind):
+    objs = list(QUERYSETS[kind]())
+    index = Index.fit([obj.pk for obj in objs], [DOCUMENTS[kind](obj) for obj in objs])
+    if index.ids:
+        index.neighbours = index.top_k(index.ids, settings.RELATED_CONTENT_TOP_K)
+    with transaction.atomic():
+        LINK_MODELS[kind].objects.all().delete()
+        _write(kind, index.neighbours)
+        _store(kind, index)
+    _publish(kind, index)
+    return index
+
+
+def rebuild(kind):
+    """Refit ``kind`` from scratch and rewrite all of its stored lists."""
+    start = time.perf_counter()
+    with state_lock(f'related-lock:{kind}', LOCK_TIMEOUT):
+        index = _rebuild(kind)
+    logger.info('Rebuilt related %s index: %d objects, %d terms in %.1f ms',
+                kind, len(index.ids), len(index.vocab), (time.perf_counter() - start) * 1000)
+    return index
+
+
+def _apply(kind, index, pk):
+    k = settings.RELATED_CONTENT_TOP_K
+    obj = QUERYSETS[kind]().filter(pk=pk).first()
+    affected = {source for source, targets in index.neighbours.items()
+                if any(target == pk for target, _ in targets)}
+    if obj is None:
+        index.remove(pk)
+        LINK_MODELS[kind].objects.filter(source_id=pk).delete()
+    else:
+        index.upsert(pk, *index.vectorize(DOCUMENTS[kind](obj)))
+        affected.add(pk)
+        # Lists with room for ``pk`` or whose last entry it now beats
+        scores = index.scores(pk)
+        for row in np.flatnonzero(scores > 0):
+            source = index.ids[row]
+            targets = index.neighbours.get(source, ())
+            if source != pk and (len(targets) < k or scores[row] > targets[-1][1]):
+                affected.add(source)
+    _store_vector(kind, index, pk)
+    affected &= set(index.pos)
+    if affected:
+        changed = index.top_k(sorted(affected), k)
+        index.neighbours.update(changed)
+        _write(kind, changed)
+
+
+def update(kind, *pks):
+    """Bring the stored lists up to date after objects ``pks`` changed or went away."""
+    with state_lock(f'related-lock:{kind}', LOCK_TIMEOUT):
+        index = _load(kind)
+        if index is None:
+            logger.info('No related %s index yet; run manage.py build_related', kind)
+            return
+        try:
+            with transaction.atomic():
+                for pk in pks:
+                    _apply(kind, index, pk)
+        except BaseException:
+            # The in-memory copy may be half updated; reload it next time.
+            _indexes.pop(kind, None)
+            raise
+        _publish(kind, index)
+
+
+def _drain(kind):
+    with _pending_lock:
+        pks = sorted(_pending.pop(kind, ()))
+    if pks:
+        update(kind, *pks)
+
+
+def schedule_update(kind, pk):
+    """
+    Queue ``update`` to run once the current transaction commits.
+
+    Saves that arrive while an update is still queued join it, so a burst
+    of admin edits takes the lock once.
+    """
+    def queue():
+        with _pending_lock:
+            first = kind not in _pending
+            _pending.setdefault(kind, set()).add(pk)
+        if first:
+            background.submit(_drain, kind)
+    transaction.on_commit(queue)
@@ -0,0 +1,127 @@
+"""
+SEO text for products and blog posts.
+
+One place derives meta titles, descriptions and keywords from a row's
+content; ``Model.save()``, app.seohead and ``manage.py backfill_seo`` all go
+through it. Values typed in the admin always win: ``fill_text`` only fills
+a blank meta description. Keywords name the category or product, which can
+change without the row being saved, so derived keywords are never stored;
+``meta_keywords`` works them out whenever the field is blank.
+
+``content_hash`` fingerprints everything the SEO text and head block depend
+on, including the names of the related category or product. The backfill
+skips rows whose stored ``seo_hash`` still matches.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.html import strip_tags
+
+SITE_NAME = 'Vasudev Chemo Pharma'
+# Bump when the derivation rules change so the backfill redoes every row.
+ENGINE_VERSION = 2
+
+DESCRIPTION_LIMIT = 150
+DESCRIPTION_HARD_LIMIT = 160
+
+# Fields feeding the derived text or the head block, per model; dotted
+# names follow a foreign key
+SOURCE_FIELDS = {
+    'product': (
+        'name', 'slug', 'short_description', 'detailed_description', 'category_id', 'category.name',
+        'cas_number', 'image_url', 'main_image', 'coa_pdf', 'tds_pdf', 'schema_rating', 'schema_review_count',
+        'meta_title', 'meta_description', 'meta_keywords',
+    ),
+    'companyblog': ('title', 'slug', 'content', 'author', 'published_at', 'image',
+                    'meta_title', 'meta_description', 'meta_keywords'),
+    'productblog': ('title', 'slug', 'content', 'author', 'published_at', 'product_id', 'product.name',
+                    'product.slug', 'meta_title', 'meta_description', 'meta_keywords'),
+}
+
+
+def summarize(text, limit=DESCRIPTION_LIMIT, hard_limit=DESCRIPTION_HARD_LIMIT):
+    """Plain-text summary of ``text`` for a SERP snippet, cut at a word boundary."""
+    clean = ' '.join(strip_tags(text or '').split())[:hard_limit].strip()
+    if len(clean) > limit:
+        idx = clean.rfind(' ', 0, limit)
+        if idx > 50:
+            clean = clean[:idx]
+    return clean
+
+
+def _is_product(obj):
+    return obj._meta.model_name == 'product'
+
+
+def derived_description(obj):
+    if _is_product(obj):
+        return summarize(obj.short_description or obj.detailed_description)
+    return summarize(obj.content)
+
+
+def derived_keywords(obj):
+    if _is_product(obj):
+        words = [obj.name]
+        if obj.category_id:
+            words.append(obj.category.name)
+        if obj.cas_number:
+            words.append(f'CAS {obj.cas_number}')
+        words += [f'{obj.name} manufacturer', f'{obj.name} supplier India']
+    else:
+        words = [obj.title]
+        if obj._meta.model_name == 'productblog':
+            words.append(obj.product.name)
+        words += ['blog', SITE_NAME]
+    seen = []
+    for word in words:
+        if word and word.lower() not in (w.lower() for w in seen):
+            seen.append(word)
+    return ', '.join(seen)[:1300]
+
+
+def meta_title(obj):
+    if obj.meta_title:
+        return obj.meta_title
+    if _is_product(obj):
+        return f'{obj.name} Manufacturer & Supplier in India | {SITE_NAME}'
+    return f'{obj.title} - {SITE_NAME}'
+
+
+def share_title(obj):
+    """Shorter title for Open Graph and Twitter cards."""
+    if obj.meta_title:
+        return obj.meta_title
+    return f'{obj.name} | {SITE_NAME}' if _is_product(obj) else obj.title
+
+
+def meta_description(obj):
+    return obj.meta_description or derived_description(obj) or (
+        f'{obj.name} from {SITE_NAME}.' if _is_product(obj) else f'Read our latest blog post: {obj.title}'
+    )
+
+
+def meta_keywords(obj):
+    return obj.meta_keywords or derived_keywords(obj)
+
+
+def fill_text(obj):
+    """Fill a blank meta_description; returns the fields changed."""
+    changed = []
+    if not obj.meta_description:
+        obj.meta_description = derived_description(obj)
+        changed.append('meta_description')
+    return changed
+
+
+def _source_value(obj, name):
+    for attr in name.split('.'):
+        obj = getattr(obj, attr) if obj is not None else None
+    return obj
+
+
+def content_hash(obj):
+    parts = [str(ENGINE_VERSION), settings.SITE_URL]
+    for name in SOURCE_FIELDS[obj._meta.model_name]:
+        value = _source_value(obj, name)
+        parts.append(str(getattr(value, 'name', value) or ''))
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
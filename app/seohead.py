@@ -0,0 +1,258 @@
+"""
+Precomputed ``<head>`` SEO blocks.
+
+When a Product, CompanyBlog or ProductBlog is saved, ``refresh`` renders its
+title, meta description, canonical link, Open Graph/Twitter tags and
+schema.org JSON-LD once. The result is validated and stored in ``seo_head``,
+and the page templates inline it as is. A block that fails validation is
+not stored; the template then falls back to its inline tags and a warning
+is logged. Product blocks include the category name, so saving a
+ProductCategory refreshes its products' blocks (``refresh_category``).
+"""
+import json
+import logging
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.template.loader import render_to_string
+from django.urls import NoReverseMatch, reverse
+from django.utils.safestring import mark_safe
+
+from . import httpcache, seo
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+SITE_NAME = seo.SITE_NAME
+DEFAULT_PRODUCT_IMAGE = 'media/MEA-Triazine.jpg'
+
+# Keep "</script>" and friends out of inline JSON-LD
+_JSON_ESCAPES = {ord('<'): '\\u003C', ord('>'): '\\u003E', ord('&'): '\\u0026'}
+
+
+def absolute(url):
+    if not url or url.startswith(('http://', 'https://')):
+        return url
+    return settings.SITE_URL.rstrip('/') + url
+
+
+def _url(name, args):
+    try:
+        return absolute(reverse(name, args=args))
+    except NoReverseMatch:
+        return None
+
+
+def _file_url(fieldfile):
+    try:
+        return absolute(fieldfile.url) if fieldfile else None
+    except Exception:
+        return None
+
+
+def _json_ld(data):
+    return mark_safe(json.dumps(data, ensure_ascii=False, separators=(',', ':')).translate(_JSON_ESCAPES))
+
+
+def _organization():
+    return {'@type': 'Organization', 'name': SITE_NAME, 'url': absolute('/')}
+
+
+def product_head(product):
+    url = _url('product_detail', [product.slug])
+    description = seo.meta_description(product)
+    image = product.get_direct_image_url() or _file_url(product.main_image) or absolute(static(DEFAULT_PRODUCT_IMAGE))
+    data = {
+        '@context': 'https://schema.org',
+        '@type': 'Product',
+        'name': product.name,
+        'description': description,
+        'image': image,
+        'url': url,
+        'brand': {'@type': 'Brand', 'name': SITE_NAME},
+        'manufacturer': _organization(),
+        'offers': {
+            '@type': 'Offer',
+            'url': url,
+            'priceCurrency': 'INR',
+            'availability': 'https://schema.org/InStock',
+        },
+    }
+    if product.category_id:
+        data['category'] = product.category.name
+    data['keywords'] = seo.meta_keywords(product)
+    # Google rejects ratings without reviews, so leave it out until there are some.
+    if product.schema_review_count:
+        data['aggregateRating'] = {
+            '@type': 'AggregateRating',
+            'ratingValue': str(product.schema_rating),
+            'reviewCount': product.schema_review_count,
+        }
+    parts = []
+    for kind, label in (('tds', 'Technical Data Sheet (TDS)'), ('coa', 'Certificate of Analysis (COA)')):
+        download_url = product.get_download_url(kind)
+        if download_url:
+            parts.append({'@type': 'CreativeWork', 'name': f'{product.name} - {label}', 'url': absolute(download_url)})
+    if parts:
+        data['hasPart'] = parts
+    breadcrumbs = {
+        '@context': 'https://schema.org',
+        '@type': 'BreadcrumbList',
+        'itemListElement': [
+            {'@type': 'ListItem', 'position': 1, 'name': 'Home', 'item': absolute('/')},
+            {'@type': 'ListItem', 'position': 2, 'name': 'Products', 'item': _url('products', [])},
+            {'@type': 'ListItem', 'position': 3, 'name': product.name, 'item': url},
+        ],
+    }
+    return render_to_string('seo/product_head.html', {
+        'title': seo.meta_title(product),
+        'share_title': seo.share_title(product),
+        'description': description,
+        'keywords': seo.meta_keywords(product),
+        'url': url,
+        'image': image,
+        'site_name': SITE_NAME,
+        'json_ld': [_json_ld(data), _json_ld(breadcrumbs)],
+    })
+
+
+def article_head(blog, url, image=None):
+    description = seo.meta_description(blog)
+    data = {
+        '@context': 'https://schema.org',
+        '@type': 'BlogPosting',
+        'headline': blog.title[:110],
+        'description': description,
+        'datePublished': blog.published_at.isoformat(),
+        'author': {'@type': 'Person', 'name': blog.author},
+        'publisher': _organization(),
+        'mainEntityOfPage': url,
+    }
+    if image:
+        data['image'] = image
+    return render_to_string('seo/article_head.html', {
+        'title': seo.meta_title(blog),
+        'share_title': seo.share_title(blog),
+        'description': description,
+        'keywords': seo.meta_keywords(blog),
+        'author': blog.author,
+        'url': url,
+        'image': image,
+        'site_name': SITE_NAME,
+        'json_ld': [_json_ld(data)],
+    })
+
+
+def company_blog_head(blog):
+    return article_head(blog, _url('blog_detail', [blog.slug]), _file_url(blog.image))
+
+
+def product_blog_head(blog):
+    # Product blogs have no page of their own yet; they belong to the product page.
+    url = _url('product_blog_detail', [blog.slug]) or _url('product_detail', [blog.product.slug])
+    return article_head(blog, url)
+
+
+# ------------------------------------------------------------------
+# Validation
+# ------------------------------------------------------------------
+class _HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.meta = {}
+        self.links = {}
+        self.title = ''
+        self.scripts = []
+        self._in = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'meta':
+            self.meta[attrs.get('property') or attrs.get('name')] = attrs.get('content') or ''
+        elif tag == 'link':
+            self.links[attrs.get('rel')] = attrs.get('href') or ''
+        elif tag == 'title' or (tag == 'script' and attrs.get('type') == 'application/ld+json'):
+            self._in = tag
+            if tag == 'script':
+                self.scripts.append('')
+
+    def handle_endtag(self, tag):
+        self._in = None
+
+    def handle_data(self, data):
+        if self._in == 'title':
+            self.title += data
+        elif self._in == 'script':
+            self.scripts[-1] += data
+
+
+REQUIRED_META = ('description', 'og:title', 'og:description', 'og:url', 'og:type')
+
+
+def validate(html):
+    """Problems with a rendered head block; an empty list means it is usable."""
+    parser = _HeadParser()
+    parser.feed(html)
+    parser.close()
+    problems = []
+    if not parser.title.strip():
+        problems.append('empty <title>')
+    for name in REQUIRED_META:
+        if not parser.meta.get(name, '').strip():
+            problems.append(f'missing {name}')
+    for name in ('og:url', 'og:image'):
+        value = parser.meta.get(name)
+        if value and not value.startswith(('http://', 'https://')):
+            problems.append(f'{name} is not absolute: {value}')
+    if not parser.links.get('canonical', '').startswith(('http://', 'https://')):
+        problems.append('missing absolute canonical link')
+    if not parser.scripts:
+        problems.append('no JSON-LD')
+    for script in parser.scripts:
+        try:
+            data = json.loads(script)
+        except ValueError as e:
+            problems.append(f'invalid JSON-LD: {e}')
+            continue
+        if not data.get('@context') or not data.get('@type'):
+            problems.append('JSON-LD without @context/@type')
+    return problems
+
+
+BUILDERS = {
+    'product': product_head,
+    'companyblog': company_blog_head,
+    'productblog': product_blog_head,
+}
+
+
+def build(instance):
+    """Render and validate ``instance``'s head block; '' when it is not usable."""
+    html = BUILDERS[instance._meta.model_name](instance)
+    problems = validate(html)
+    if problems:
+        logger.warning('SEO head for %s %s not stored: %s',
+                       instance._meta.model_name, instance.pk, '; '.join(problems))
+        return ''
+    return html
+
+
+def refresh(instance):
+    """Store ``instance``'s head block if it changed; returns whether it did."""
+    html = build(instance)
+    content_hash = seo.content_hash(instance)
+    if html != instance.seo_head or content_hash != instance.seo_hash:
+        # update() avoids re-running save() and its signal handlers
+        type(instance).objects.filter(pk=instance.pk).update(seo_head=html, seo_hash=content_hash)
+        instance.seo_head, instance.seo_hash = html, content_hash
+        return True
+    return False
+
+
+def refresh_category(category_id):
+    """Refresh the head blocks of category ``category_id``'s products and purge their pages."""
+    products = Product.objects.filter(category_id=category_id).select_related('category')
+    changed = {f'product-{product.pk}' for product in products.iterator(chunk_size=500) if refresh(product)}
+    httpcache.purge(changed)
+    return len(changed)
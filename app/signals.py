@@ -0,0 +1,125 @@
+"""Model signal handlers; connected in AppConfig.ready()."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import background, caching, facets, httpcache, metrics, related, seohead, slugs
+from .images import build_later
+from .models import (
+    CompanyBlog, CompanyInformation, Contact, DownloadEmail, Product, ProductApplication, ProductBlog,
+    ProductCategory, ProductFAQ, SlugRedirect,
+)
+from .placeholders import placeholder_source, refresh_and_invalidate
+
+PRODUCT_IMAGE_FIELDS = ('main_image', 'gallery_image_1', 'gallery_image_2')
+
+
+@receiver(post_save, sender=Product)
+def process_product_images(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    build_later(*(getattr(instance, field) for field in PRODUCT_IMAGE_FIELDS))
+    if placeholder_source(instance) != instance.image_lqip_source:
+        # May download the remote image_url, so keep it off the admin request.
+        transaction.on_commit(lambda: background.submit(refresh_and_invalidate, Product, instance.pk))
+
+
+@receiver(post_save, sender=CompanyBlog)
+def process_blog_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    build_later(instance.image)
+    if placeholder_source(instance) != instance.image_lqip_source:
+        transaction.on_commit(lambda: background.submit(refresh_and_invalidate, CompanyBlog, instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=CompanyBlog)
+@receiver(post_save, sender=ProductBlog)
+def refresh_seo_head(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    seohead.refresh(instance)
+
+
+@receiver(post_save, sender=ProductCategory)
+def refresh_category_seo_heads(sender, instance, raw=False, **kwargs):
+    # Product head blocks include the category name.
+    if raw:
+        return
+    transaction.on_commit(lambda: background.submit(seohead.refresh_category, instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=CompanyBlog)
+@receiver(post_delete, sender=CompanyBlog)
+def update_related_content(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    related.schedule_update(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=ProductApplication)
+@receiver(post_delete, sender=ProductApplication)
+@receiver(post_save, sender=ProductBlog)
+@receiver(post_delete, sender=ProductBlog)
+def update_related_products(sender, instance, raw=False, **kwargs):
+    # Applications and product blog posts are part of the product's document.
+    if raw:
+        return
+    related.schedule_update('product', instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    facets.schedule_update(instance.pk)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def rebuild_facets(sender, instance, raw=False, **kwargs):
+    # Category names and slugs are facet labels and keys.
+    if raw:
+        return
+    facets.schedule_rebuild()
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=CompanyBlog)
+def record_slug_rename(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old_slug = sender.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+    if old_slug and old_slug != instance.slug:
+        slugs.record_rename(sender._meta.model_name, old_slug, instance.slug)
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=DownloadEmail)
+def count_inserts(sender, instance, created=False, **kwargs):
+    if created:
+        metrics.inc('model_inserts_total', model=sender.__name__)
+
+
+CACHED_MODELS = (
+    CompanyInformation, ProductCategory, Product, ProductFAQ, ProductApplication, CompanyBlog, ProductBlog,
+    SlugRedirect,
+)
+
+
+def invalidate_content_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # After commit, so a concurrent rebuild cannot cache the old rows under
+    # the new version.
+    transaction.on_commit(caching.invalidate)
+    transaction.on_commit(lambda: httpcache.purge_for(instance))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_content_cache, sender=model, dispatch_uid=f'content-cache-save-{model.__name__}')
+    post_delete.connect(invalidate_content_cache, sender=model, dispatch_uid=f'content-cache-delete-{model.__name__}')
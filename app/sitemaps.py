@@ -1,14 +1,22 @@
 from django.contrib.sitemaps import Sitemap
 from django.urls import reverse
-from .models import Product, CompanyBlog, ProductBlog
+from . import caching
+from .locales import translated_languages
 
 
 class ProductSitemap(Sitemap):
     changefreq = 'weekly'
     priority = 0.8
+    # One URL per translated language, with hreflang alternates
+    i18n = True
+    alternates = True
+    x_default = True
 
     def items(self):
-        return Product.objects.filter(is_active=True)
+        return caching.sitemap_items('products')
+
+    def get_languages_for_item(self, item):
+        return translated_languages(item)
 
     def location(self, obj):
         return reverse('product_detail', args=[obj.slug])
@@ -17,9 +25,16 @@ class ProductSitemap(Sitemap):
 class CompanyBlogSitemap(Sitemap):
     changefreq = 'monthly'
     priority = 0.6
+    # One URL per translated language, with hreflang alternates
+    i18n = True
+    alternates = True
+    x_default = True
 
     def items(self):
-        return CompanyBlog.objects.all()
+        return caching.sitemap_items('company_blogs')
+
+    def get_languages_for_item(self, item):
+        return translated_languages(item)
 
     def location(self, obj):
         return reverse('blog_detail', args=[obj.slug])
@@ -30,7 +45,7 @@ class ProductBlogSitemap(Sitemap):
     priority = 0.6
 
     def items(self):
-        return ProductBlog.objects.all()
+        return caching.sitemap_items('product_blogs')
 
     def location(self, obj):
         return reverse('product_blog_detail', args=[obj.slug])
@@ -0,0 +1,60 @@
+"""
+In-memory registry of product and blog slugs.
+
+Bots probe ``/product/<slug>/`` and ``/blog/<slug>/`` with made-up slugs.
+Every worker keeps the full set of valid slugs and the legacy redirects
+(SlugRedirect) for each kind, so ``resolve`` answers such probes, and
+renamed or legacy URLs, without a database query.
+
+The registry is loaded through app.caching and so shares its content
+version. Saving a product, blog post or redirect bumps the version, and
+each worker reloads its copy on the next lookup. The set is exact, so
+unknown slugs need no Bloom filter or separate negative cache. Renaming a
+slug in the admin records the old one as a redirect (see app.signals).
+"""
+from . import caching, metrics
+from .models import CompanyBlog, Product, SlugRedirect
+
+FOUND, REDIRECT, MISSING = 'found', 'redirect', 'missing'
+
+MODELS = {'product': Product, 'companyblog': CompanyBlog}
+
+_local = {}
+
+
+def _load(kind):
+    return {
+        'slugs': frozenset(MODELS[kind].objects.values_list('slug', flat=True)),
+        'redirects': dict(SlugRedirect.objects.filter(kind=kind).values_list('old_slug', 'new_slug')),
+    }
+
+
+def registry(kind):
+    version = caching.content_version()
+    entry = _local.get(kind)
+    if entry is None or entry[0] != version:
+        entry = (version, caching.cached(f'slugs:{kind}', lambda: _load(kind)))
+        _local[kind] = entry
+    return entry[1]
+
+
+def resolve(kind, slug):
+    """``(FOUND, slug)``, ``(REDIRECT, current_slug)`` or ``(MISSING, None)``."""
+    current = registry(kind)
+    if slug in current['slugs']:
+        result, target = FOUND, slug
+    else:
+        target = current['redirects'].get(slug.lower())
+        result = REDIRECT if target in current['slugs'] else MISSING
+        target = target if result == REDIRECT else None
+    metrics.inc('slug_lookups_total', kind=kind, result=result)
+    return result, target
+
+
+def record_rename(kind, old_slug, new_slug):
+    """Keep ``old_slug`` working after a rename, and repoint earlier redirects."""
+    old_slug = old_slug.lower()
+    SlugRedirect.objects.filter(kind=kind, new_slug=old_slug).update(new_slug=new_slug)
+    # A slug that is live again must not redirect anywhere.
+    SlugRedirect.objects.filter(kind=kind, old_slug=new_slug.lower()).delete()
+    SlugRedirect.objects.update_or_create(kind=kind, old_slug=old_slug, defaults={'new_slug': new_slug})
@@ -0,0 +1,163 @@
+"""
+Numeric values parsed from the free-text product specifications.
+
+Product.save() runs ``fill`` so that each spec text field has a matching
+indexed numeric column in one canonical unit:
+
+    molecular_weight -> molecular_weight_g_mol   (g/mol)
+    density          -> density_g_cm3            (g/cm³; kg/m³ and g/L converted)
+    boiling_point    -> boiling_point_c          (°C; °F and K converted)
+    melting_point    -> melting_point_c          (°C; °F and K converted)
+    purity, assay    -> purity_pct, assay_pct    (%)
+
+A range such as "100-105 °C" is stored as its midpoint; a temperature's
+unit is the one written right after it, so "100 °C (212 °F)" is 100. A
+percentage list such as "35%, 40%, 45%" (several grades) is stored as its
+highest value; besides bare numbers, only values marked with % count.
+Digits inside chemical formulas ("C7H8O3S·H2O 190.22") are skipped. Text
+with no usable number ("USP/BP Grade 2") is stored as NULL.
+
+``filter_products`` turns catalog query parameters such as
+``boiling_point__gte=100`` into lookups on those columns.
+``manage.py backfill_specs`` fills the columns for existing rows.
+"""
+import math
+import re
+
+_NUMBER = r'[-−]?\d+(?:\.\d+)?'
+_RANGE_RE = re.compile(rf'({_NUMBER})\s*(?:-|–|—|to|~)\s*({_NUMBER})', re.I)
+_NUMBER_RE = re.compile(_NUMBER)
+_DECIMAL_RE = re.compile(r'\d+(?:\.\d+)?')
+_PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+# "98.0 - 102.0 %" or "98.0% - 102.0%"; the sign may sit on both ends or only the last
+_PERCENT_RANGE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%?\s*(?:-|–|—|to|~)\s*(\d+(?:\.\d+)?)\s*(%?)', re.I)
+# Only numbers and separators, e.g. "99.5" or "98-102"
+_BARE_NUMBERS_RE = re.compile(r'^[\d.\s,;/~–—-]+$')
+_THOUSANDS_RE = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+# Unit right after a temperature: °C, ºF, deg. K, degrees Fahrenheit, ℃ ...
+_TEMPERATURE_UNIT_RE = re.compile(
+    r'\s*(?:(?:°|º|deg\.?|degrees?)\s*)?(c|celsius|centigrade|f|fahrenheit|k|kelvin)\b|\s*([℃℉])', re.I)
+# Words with an element symbol next to a digit: C7H8O3S·H2O, (C2H4O)n, ·5H2O
+_FORMULA_RE = re.compile(r'\S*(?:[A-Z][a-z]?\d|\d[A-Z])\S*')
+_PER_LITRE_RE = re.compile(r'(kg\s*/\s*m\s*(3|³)|g\s*/\s*l\b)', re.I)
+
+# Spec text field -> numeric column
+COLUMNS = {
+    'molecular_weight': 'molecular_weight_g_mol',
+    'density': 'density_g_cm3',
+    'boiling_point': 'boiling_point_c',
+    'melting_point': 'melting_point_c',
+    'purity': 'purity_pct',
+    'assay': 'assay_pct',
+}
+LOOKUPS = ('gte', 'lte', 'gt', 'lt')
+# Query parameters ``filter_products`` understands
+PARAMS = frozenset(f'{field}__{lookup}' for field in COLUMNS for lookup in LOOKUPS)
+
+
+def _float(text):
+    return float(text.replace('−', '-'))
+
+
+def first_value(text):
+    """The first number or range in ``text``; ranges give their midpoint."""
+    text = _THOUSANDS_RE.sub('', text)
+    match = _RANGE_RE.search(text)
+    single = _NUMBER_RE.search(text)
+    if match and match.start() <= single.start():
+        return round((_float(match.group(1)) + _float(match.group(2))) / 2, 4), text[match.end():]
+    if single:
+        return _float(single.group()), text[single.end():]
+    return None, ''
+
+
+def parse_temperature(text):
+    value, rest = first_value(text)
+    if value is None:
+        return None
+    unit = _TEMPERATURE_UNIT_RE.match(rest)
+    unit = (unit.group(1) or unit.group(2)).lower()[0] if unit else 'c'
+    if unit in 'f℉':
+        return round((value - 32) * 5 / 9, 2)
+    if unit == 'k':
+        return round(value - 273.15, 2)
+    return value
+
+
+def parse_density(text):
+    value, rest = first_value(text)
+    if value is None:
+        return None
+    if _PER_LITRE_RE.search(rest):
+        value /= 1000
+    return value if 0 < value < 30 else None
+
+
+def parse_molecular_weight(text):
+    value, _ = first_value(_FORMULA_RE.sub(' ', text))
+    return value if value and value > 0 else None
+
+
+def parse_percent(text):
+    text = _THOUSANDS_RE.sub('', text)
+    bare = _BARE_NUMBERS_RE.match(text)
+    ranges = []
+
+    def take_range(match):
+        # Assay limits such as 98.0-102.0% may go above 100; use the midpoint.
+        low, high = float(match.group(1)), float(match.group(2))
+        if (bare or match.group(3)) and 0 < low <= 100 and low <= high:
+            ranges.append((low + high) / 2)
+            return ' '
+        return match.group(0)
+
+    text = _PERCENT_RANGE_RE.sub(take_range, text)
+    pattern = _DECIMAL_RE if bare else _PERCENT_RE
+    values = ranges + [v for v in map(float, pattern.findall(text)) if 0 < v <= 100]
+    return max(values) if values else None
+
+
+PARSERS = {
+    'molecular_weight': parse_molecular_weight,
+    'density': parse_density,
+    'boiling_point': parse_temperature,
+    'melting_point': parse_temperature,
+    'purity': parse_percent,
+    'assay': parse_percent,
+}
+
+
+def parse(field, text):
+    return PARSERS[field](text) if text and text.strip() else None
+
+
+def fill(product):
+    """Set the numeric columns from the spec text; returns the columns changed."""
+    changed = []
+    for field, column in COLUMNS.items():
+        value = parse(field, getattr(product, field))
+        if getattr(product, column) != value:
+            setattr(product, column, value)
+            changed.append(column)
+    return changed
+
+
+def filter_products(queryset, params):
+    """
+    Apply ``<spec>__<gte|lte|gt|lt>=<number>`` parameters to ``queryset``.
+
+    Returns the filtered queryset and the filters used; unknown names and
+    non-numeric values are ignored.
+    """
+    filters = {}
+    for name, value in params.items():
+        field, _, lookup = name.partition('__')
+        if field not in COLUMNS or lookup not in LOOKUPS:
+            continue
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        if math.isfinite(number):
+            filters[f'{COLUMNS[field]}__{lookup}'] = number
+    return (queryset.filter(**filters) if filters else queryset), filters
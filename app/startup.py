@@ -0,0 +1,37 @@
+"""
+Worker boot helpers.
+
+``warm_imports`` pulls in URL routing, views and the main templates so that,
+with gunicorn ``preload_app``, the master does this work once and every
+forked worker shares it instead of paying for it on its first request. It
+deliberately opens no database connections, which must not be shared across
+a fork.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARM_TEMPLATES = (
+    'index.html',
+    'products.html',
+    'products/product_detail.html',
+    'blog_detail.html',
+    'aboutus.html',
+    'ourservices.html',
+)
+
+
+def warm_imports():
+    start = time.perf_counter()
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns  # imports app.urls and app.views
+    for name in WARM_TEMPLATES:
+        get_template(name)
+    if settings.USE_GOOGLE_DRIVE_STORAGE:
+        import gdstorage.storage  # noqa: F401
+    logger.info('Warmed imports and templates in %.1f ms', (time.perf_counter() - start) * 1000)
@@ -0,0 +1,316 @@
+"""
+Storage helpers for product media (video, COA and TDS files).
+
+In production these fields live on Google Drive, where resolving a public URL
+costs an API round trip. ``CachedURLStorage`` wraps the configured backend and
+keeps resolved URLs in the shared cache, so templates never wait on Drive:
+a cache miss returns a local redirect URL and resolves the real one in the
+background.
+
+``MirroredStorage`` keeps a size-bounded local copy of remote files so the
+download view can stream them from disk.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import Storage
+from django.urls import reverse
+from django.utils._os import safe_join
+
+from . import background, metrics
+
+logger = logging.getLogger(__name__)
+
+URL_CACHE_PREFIX = 'storage-url:'
+URL_RESOLVE_LOCK_PREFIX = 'storage-url-lock:'
+MIRROR_LOCK_PREFIX = 'storage-mirror-lock:'
+
+# Process-local LRU of recently seen URLs, shared by every wrapped field.
+# Maps file name -> (url, expires_at); bounded by STORAGE_URL_LOCAL_MAX.
+_local_urls = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _url_cache_timeout():
+    return getattr(settings, 'STORAGE_URL_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _remember(name, url, timeout):
+    with _local_lock:
+        _local_urls[name] = (url, time.monotonic() + min(timeout, 300))
+        _local_urls.move_to_end(name)
+        while len(_local_urls) > getattr(settings, 'STORAGE_URL_LOCAL_MAX', 2048):
+            _local_urls.popitem(last=False)
+
+
+def _recall(name):
+    with _local_lock:
+        entry = _local_urls.get(name)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del _local_urls[name]
+            return None
+        _local_urls.move_to_end(name)
+        return entry[0]
+
+
+class CachedURLStorage(Storage):
+    """
+    Wrap a storage backend and cache ``url()`` results per file name.
+
+    ``backend`` is any Django storage (GoogleDriveStorage in production, a
+    FileSystemStorage or fake in development and tests).
+    """
+
+    def __init__(self, backend, timeout=None):
+        self.backend = backend
+        self.timeout = timeout if timeout is not None else _url_cache_timeout()
+
+    def __getattr__(self, name):
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    # --- URL resolution ---
+    def resolve_url(self, name):
+        """Ask the backend for the URL (blocking) and store it in the cache."""
+        with metrics.timer('storage_call_duration_seconds', op='url'):
+            url = self.backend.url(name)
+        if url:
+            cache.set(URL_CACHE_PREFIX + name, url, self.timeout)
+            _remember(name, url, self.timeout)
+        return url
+
+    def _resolve_in_background(self, name):
+        # Only one worker needs to resolve a given name at a time.
+        if cache.add(URL_RESOLVE_LOCK_PREFIX + name, 1, 60):
+            background.submit(self.resolve_url, name)
+
+    def url(self, name):
+        url = _recall(name)
+        if url:
+            return url
+        url = cache.get(URL_CACHE_PREFIX + name)
+        if url:
+            _remember(name, url, self.timeout)
+            return url
+        self._resolve_in_background(name)
+        return reverse('storage_file', args=[name])
+
+    # --- Delegated storage API ---
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def _save(self, name, content):
+        name = self.backend.save(name, content)
+        try:
+            self.resolve_url(name)
+        except Exception:
+            logger.exception('Could not warm URL for %s', name)
+        return name
+
+    def delete(self, name):
+        cache.delete(URL_CACHE_PREFIX + name)
+        with _local_lock:
+            _local_urls.pop(name, None)
+        return self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+class MirroredStorage(Storage):
+    """
+    Read-through local mirror of a remote storage backend.
+
+    ``path(name)`` copies the file to ``root`` on first access and returns the
+    local path. Request handlers use ``local_path`` instead, which never
+    downloads, and ``mirror_in_background`` to start the copy. Access times are
+    refreshed on every hit and the least recently used files are evicted once
+    the mirror grows past ``max_bytes``. Backends that already live on local
+    disk are used directly.
+    """
+
+    def __init__(self, backend, root=None, max_bytes=None):
+        self.backend = backend
+        self.root = Path(root or settings.MEDIA_MIRROR_ROOT)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.MEDIA_MIRROR_MAX_BYTES
+
+    def __getattr__(self, name):
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def _is_local(self):
+        try:
+            self.backend.path('')
+        except NotImplementedError:
+            return False
+        return True
+
+    def path(self, name):
+        local_path = self.local_path(name)
+        if local_path is None:
+            local_path = safe_join(str(self.root), name)
+            self._fetch(name, local_path)
+        return local_path
+
+    def local_path(self, name):
+        """The mirrored copy of ``name``, or None if it is not on disk yet."""
+        if self._is_local():
+            return self.backend.path(name)
+        local_path = safe_join(str(self.root), name)
+        try:
+            stat = os.stat(local_path)
+        except FileNotFoundError:
+            return None
+        # Refresh atime only; mtime feeds the ETag and must stay stable.
+        os.utime(local_path, (time.time(), stat.st_mtime))
+        return local_path
+
+    def mirror_in_background(self, name):
+        """Queue the copy of ``name``; one worker at a time fetches a given file."""
+        lock_key = MIRROR_LOCK_PREFIX + name
+        if cache.add(lock_key, 1, 60 * 60):
+            background.submit(self._mirror, name, lock_key)
+
+    def _mirror(self, name, lock_key):
+        try:
+            if self.local_path(name) is None:
+                self._fetch(name, safe_join(str(self.root), name))
+        finally:
+            cache.delete(lock_key)
+
+    def _fetch(self, name, local_path):
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(local_path), suffix='.part')
+        try:
+            with metrics.timer('storage_call_duration_seconds', op='download'), \
+                    os.fdopen(fd, 'wb') as out, self.backend.open(name, 'rb') as remote:
+                shutil.copyfileobj(remote, out, 1024 * 1024)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info('Mirrored %s to local disk', name)
+        self.evict(keep=local_path)
+
+    def evict(self, keep=None):
+        """Drop least recently used files until the mirror fits ``max_bytes``."""
+        entries = []
+        total = 0
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _atime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _open(self, name, mode='rb'):
+        return open(self.path(name), mode)
+
+    def _save(self, name, content):
+        return self.backend.save(name, content)
+
+    def delete(self, name):
+        if not self._is_local():
+            try:
+                os.unlink(safe_join(str(self.root), name))
+            except FileNotFoundError:
+                pass
+        return self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+
+def prefetch_file_urls(objects, fields=('video', 'coa_pdf', 'tds_pdf')):
+    """
+    Load cached URLs for every file on ``objects`` with a single cache query.
+
+    Names that are not cached yet are resolved in the background, so the
+    page being rendered falls back to the redirect URL instead of blocking.
+    """
+    pending = {}
+    for obj in objects:
+        for field in fields:
+            file = getattr(obj, field, None)
+            if file and isinstance(file.storage, CachedURLStorage) and not _recall(file.name):
+                pending[file.name] = file.storage
+    if not pending:
+        return
+    found = cache.get_many([URL_CACHE_PREFIX + name for name in pending])
+    for name, storage in pending.items():
+        url = found.get(URL_CACHE_PREFIX + name)
+        if url:
+            _remember(name, url, storage.timeout)
+        else:
+            storage._resolve_in_background(name)
@@ -0,0 +1,38 @@
+from django import template
+from django.conf import settings
+from django.urls import translate_url
+from django.utils.html import format_html_join
+from django.utils.translation import get_language
+
+from ..locales import translated_languages
+from ..seohead import absolute
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def language_links(context):
+    """The current page in every language, for the language switcher."""
+    path = context['request'].path
+    current = get_language()
+    return [
+        {'code': code, 'name': name, 'url': translate_url(path, code), 'current': code == current}
+        for code, name in settings.LANGUAGES
+    ]
+
+
+@register.simple_tag(takes_context=True)
+def hreflang_links(context, obj=None):
+    """
+    ``<link rel="alternate" hreflang>`` tags for the languages ``obj`` is
+    translated into; nothing for pages without translated content.
+    """
+    languages = translated_languages(obj) if obj is not None else [settings.LANGUAGE_CODE]
+    if len(languages) < 2:
+        return ''
+    links = [link for link in language_links(context) if link['code'] in languages]
+    default = next(link['url'] for link in links if link['code'] == settings.LANGUAGE_CODE)
+    return format_html_join(
+        '\n', '<link rel="alternate" hreflang="{}" href="{}" />',
+        [(link['code'], absolute(link['url'])) for link in links] + [('x-default', absolute(default))],
+    )
@@ -0,0 +1,52 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import FORMATS, get_manifest
+
+register = template.Library()
+
+
+def _srcset(storage, entries):
+    return ', '.join(f"{storage.url(e['name'])} {e['width']}w" for e in entries)
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', style='', loading='lazy', placeholder=''):
+    """
+    Render ``image`` as a <picture> using its derivative manifest.
+
+    Falls back to a plain lazy <img> when no derivatives exist yet.
+    ``placeholder`` is an LQIP data URI painted as the image background.
+    """
+    if not image:
+        return ''
+    if placeholder:
+        style = f"background-image: url('{placeholder}'); background-size: cover; {style}".strip()
+    manifest = get_manifest(image.storage, image.name)
+    if not manifest:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="{}" decoding="async" />',
+            image.url, alt, css_class, style, loading,
+        )
+
+    storage = image.storage
+    sources = manifest['sources']
+    fallback = sources['jpeg']
+    # Mid-size src for browsers without srcset and for the LQIP swap
+    src = fallback[(len(fallback) - 1) // 2]
+    modern = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}" />',
+        ((FORMATS[fmt][1], _srcset(storage, entries), sizes)
+         for fmt, entries in sources.items() if fmt != 'jpeg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" style="{}" loading="{}" decoding="async" /></picture>',
+        modern,
+        storage.url(src['name']),
+        _srcset(storage, fallback),
+        sizes,
+        manifest['width'],
+        manifest['height'],
+        alt, css_class, style, loading,
+    )
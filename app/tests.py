@@ -1,3 +1,947 @@
-from django.test import TestCase
+import copy
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from PIL import Image
+
+from . import (
+    caching, downloads, facets, httpcache, imageproxy, images, metrics, placeholders, related, seo, slugs, specs,
+    storage, uploads,
+)
+from .imageproxy import url_key
+from .management.commands import bench_middleware
+from .localproxy import CachingProxy, Store
+from .models import (
+    MediaUpload, Product, ProductApplication, ProductCategory, ProductFAQ, RelatedIndex, RelatedProduct,
+    get_file_storage,
+)
+from .templatetags.media_tags import responsive_image
+
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'state': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'state'},
+}
+
+
+class CacheTestMixin:
+    """Start and finish every test with an empty cache."""
+
+    def setUp(self):
+        super().setUp()
+        self._clear_caches()
+        self.addCleanup(self._clear_caches)
+
+    def _clear_caches(self):
+        for backend in caches.all():
+            backend.clear()
+
+
+# ------------------------------------------------------------------
+# Storage URL cache (app/storage.py)
+# ------------------------------------------------------------------
+class FakeRemoteStorage(Storage):
+    """In-memory stand-in for GoogleDriveStorage that counts URL lookups."""
+
+    def __init__(self):
+        self.files = {}
+        self.url_calls = []
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.files[name], name=name)
+
+    def _save(self, name, content):
+        self.files[name] = content.read()
+        return name
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+    def exists(self, name):
+        return name in self.files
+
+    def size(self, name):
+        return len(self.files[name])
+
+    def url(self, name):
+        self.url_calls.append(name)
+        return f'https://drive.example/{name}'
+
+    def path(self, name):
+        raise NotImplementedError
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class CachedURLStorageTests(CacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        storage._local_urls.clear()
+        self.addCleanup(storage._local_urls.clear)
+        self.backend = FakeRemoteStorage()
+        self.storage = storage.CachedURLStorage(self.backend, timeout=60)
+
+    def test_miss_returns_redirect_and_resolves_in_background(self):
+        self.assertEqual(self.storage.url('docs/coa.pdf'), reverse('storage_file', args=['docs/coa.pdf']))
+        self.assertEqual(self.backend.url_calls, ['docs/coa.pdf'])
+        self.assertEqual(self.storage.url('docs/coa.pdf'), 'https://drive.example/docs/coa.pdf')
+        self.assertEqual(self.backend.url_calls, ['docs/coa.pdf'])
+
+    def test_save_warms_url(self):
+        name = self.storage.save('docs/tds.pdf', ContentFile(b'pdf'))
+        storage._local_urls.clear()
+        self.assertEqual(self.storage.url(name), 'https://drive.example/docs/tds.pdf')
+        self.assertEqual(self.backend.url_calls, ['docs/tds.pdf'])
+
+    def test_prefetch_reads_cache_in_one_query(self):
+        for name in ('a.pdf', 'b.pdf'):
+            cache.set(storage.URL_CACHE_PREFIX + name, f'https://cdn.example/{name}')
+        products = [
+            SimpleNamespace(coa_pdf=SimpleNamespace(name='a.pdf', storage=self.storage), tds_pdf=None, video=None),
+            SimpleNamespace(coa_pdf=SimpleNamespace(name='b.pdf', storage=self.storage), tds_pdf=None, video=None),
+        ]
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            storage.prefetch_file_urls(products)
+        get_many.assert_called_once()
+        self.assertEqual(self.storage.url('b.pdf'), 'https://cdn.example/b.pdf')
+        self.assertEqual(self.backend.url_calls, [])
+
+    @override_settings(STORAGE_URL_LOCAL_MAX=2)
+    def test_local_copy_is_bounded_lru(self):
+        for name in ('a', 'b'):
+            storage._remember(name, name, 60)
+        storage._recall('a')
+        storage._remember('c', 'c', 60)
+        self.assertEqual(list(storage._local_urls), ['a', 'c'])
+
+
+# ------------------------------------------------------------------
+# Local mirror and downloads (app/storage.py, app/downloads.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class MirroredStorageTests(CacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        self.backend = FakeRemoteStorage()
+        self.backend.files['docs/coa.pdf'] = b'0123456789'
+        self.mirror = storage.MirroredStorage(self.backend, root=root, max_bytes=1024)
+
+    def test_local_path_never_downloads(self):
+        self.assertIsNone(self.mirror.local_path('docs/coa.pdf'))
+        self.mirror.mirror_in_background('docs/coa.pdf')
+        with open(self.mirror.local_path('docs/coa.pdf'), 'rb') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+
+class ServeFileTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        self.addCleanup(os.unlink, self.path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'0123456789')
+        self.etag = downloads.make_etag(os.stat(self.path))
+        self.factory = RequestFactory()
+
+    def test_if_none_match_list(self):
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=f'"other", W/{self.etag}')
+        self.assertEqual(downloads.serve_file(request, self.path, 'f.bin').status_code, 304)
+        # A tag that merely contains ours is not a match.
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=f'"x{self.etag[1:]}')
+        response = downloads.serve_file(request, self.path, 'f.bin')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_range(self):
+        response = downloads.serve_file(self.factory.get('/', HTTP_RANGE='bytes=2-4'), self.path, 'f.bin')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        response.close()
+
+
+# ------------------------------------------------------------------
+# Remote image proxy (app/imageproxy.py)
+# ------------------------------------------------------------------
+class ImageHost:
+    """Local HTTP stand-in for googleusercontent: serves one PNG and counts hits."""
+
+    def __init__(self, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        body = buffer.getvalue()
+        self.hits = 0
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                host.hits += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/photo.png'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ImageProxyTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = self.settings(MEDIA_ROOT=media_root, IMAGE_PROXY_MAX_WIDTH=640)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.host = ImageHost()
+        self.addCleanup(self.host.close)
+
+    def test_normalize_drive_share_link(self):
+        self.assertEqual(
+            imageproxy.normalize_image_url('https://drive.google.com/file/d/abc_123/view?usp=sharing'),
+            'https://drive.google.com/uc?export=view&id=abc_123',
+        )
+
+    def test_fetches_once_and_resizes(self):
+        path = imageproxy.get_or_fetch(self.host.url)
+        self.assertEqual(imageproxy.get_or_fetch(self.host.url), path)
+        self.assertEqual(self.host.hits, 1)
+        with Image.open(path) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (640, 320)))
+
+    def test_view_serves_immutable_copy(self):
+        product = make_product(image_url=self.host.url)
+        url = product.proxied_image_url
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response['Cache-Control'])
+            response.close()
+        self.assertEqual(self.host.hits, 1)
+        self.assertEqual(self.client.get(url.replace(url_key(self.host.url), '0' * 16)).status_code, 404)
+
+
+# ------------------------------------------------------------------
+# Background media uploads (app/uploads.py)
+# ------------------------------------------------------------------
+class FailingRemoteStorage(FakeRemoteStorage):
+    def _save(self, name, content):
+        raise ConnectionError('Drive is down')
+
+
+def make_product(slug='toluene', **fields):
+    category, _ = ProductCategory.objects.get_or_create(
+        slug='solvents', defaults={'name': 'Solvents', 'icon': 'bi-droplet'})
+    fields.setdefault('name', slug.title())
+    return Product.objects.create(category=category, slug=slug, **fields)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class UploadQueueTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        staging_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging_root, True)
+        settings_override = self.settings(UPLOAD_STAGING_ROOT=staging_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.remote = FakeRemoteStorage()
+        self.remote.files['old/coa.pdf'] = b'old'
+        self.product = make_product(coa_pdf='old/coa.pdf')
+
+    def enqueue(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            return uploads.enqueue(self.product, 'coa_pdf', SimpleUploadedFile('coa.pdf', b'%PDF-new'))
+
+    def test_upload_switches_field_through_save(self):
+        job = self.enqueue()
+        self.assertEqual(job.staged_on, uploads.staging_host())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(uploads.process_upload(job.pk, storage=self.remote))
+        job.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(job.status, MediaUpload.DONE)
+        self.assertEqual(self.product.coa_pdf.name, job.remote_name)
+        self.assertEqual(self.remote.files[job.remote_name], b'%PDF-new')
+        # The replaced remote file is gone and the staged copy cleaned up.
+        self.assertNotIn('old/coa.pdf', self.remote.files)
+        self.assertFalse(uploads.staging_storage().exists(job.staged_name))
+        # post_save ran: the stored head links the new COA.
+        self.assertIn(self.product.get_download_url('coa'), self.product.seo_head)
+        self.assertEqual(self.product.seo_hash, seo.content_hash(self.product))
+
+    def test_failure_is_retried_with_backoff(self):
+        job = self.enqueue()
+        with mock.patch.object(uploads, 'schedule') as schedule:
+            self.assertFalse(uploads.process_upload(job.pk, storage=FailingRemoteStorage()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (MediaUpload.RETRY, 1))
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        schedule.assert_called_once()
+        self.assertEqual(uploads.due_jobs(), [])
+
+    @override_settings(UPLOAD_HEARTBEAT=0)
+    def test_heartbeat_keeps_long_upload_claimed(self):
+        job = self.enqueue()
+        MediaUpload.objects.filter(pk=job.pk).update(
+            status=MediaUpload.UPLOADING, updated_at=timezone.now() - timedelta(hours=1))
+        with uploads.staging_storage().open(job.staged_name, 'rb') as f:
+            uploads._Heartbeat(f, job.pk).read(4)
+        self.assertEqual([j.pk for j in uploads.unfinished_jobs()], [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaUpload.UPLOADING)
+
+    def test_other_hosts_jobs_are_left_alone(self):
+        job = self.enqueue()
+        MediaUpload.objects.filter(pk=job.pk).update(staged_on='another-instance')
+        self.assertEqual(uploads.due_jobs(), [])
+
+
+# ------------------------------------------------------------------
+# Lazy media storage (app/models.py get_file_storage)
+# ------------------------------------------------------------------
+class LazyFileStorageTests(SimpleTestCase):
+    def test_backend_built_on_first_use_and_copyable(self):
+        factory = mock.Mock(return_value=FakeRemoteStorage())
+        with self.settings(FILE_STORAGE_FUNCTION=factory):
+            media_storage = get_file_storage()
+            copy.deepcopy(media_storage)
+            factory.assert_not_called()
+            self.assertFalse(media_storage.exists('missing.pdf'))
+        factory.assert_called_once()
+
+    def test_loading_migrations_does_not_build_backend(self):
+        factory = mock.Mock(return_value=FakeRemoteStorage())
+        with self.settings(FILE_STORAGE_FUNCTION=factory), \
+                mock.patch('devapp.settings.build_file_storage', factory):
+            MigrationLoader(None, ignore_no_migrations=True).project_state()
+        factory.assert_not_called()
+
+
+# ------------------------------------------------------------------
+# Server-Timing middleware (app/middleware.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE)
+class ServerTimingTests(CacheTestMixin, SimpleTestCase):
+    def test_public_responses_have_no_timings(self):
+        response = self.client.get(reverse('healthz'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_internal_requests_get_private_timings(self):
+        response = self.client.get(reverse('healthz'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_overhead_within_budget(self):
+        overhead_us, _bare, _timed = bench_middleware.measure(iterations=5000, rounds=5)
+        self.assertLess(overhead_us, 50)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_view_closed_without_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_view_requires_bearer_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE http_requests_total counter', response.content.decode())
+
+    def test_retire_folds_dead_worker_into_retired_file(self):
+        key = ('model_inserts_total', (('model', 'product'),))
+        for pid, value in ((999991, 2), (999992, 3)):
+            metrics._write(self.directory, f'{pid}.json', {key: value})
+            metrics.retire(pid)
+        metrics.retire(999993)  # already gone
+        self.assertEqual(os.listdir(self.directory), [metrics.RETIRED_FILE])
+        self.assertEqual(metrics.collect()[key], 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ContentVersionTests(CacheTestMixin, SimpleTestCase):
+    def test_version_survives_default_cache_clear(self):
+        version = caching.content_version()
+        caching.invalidate()
+        cache.clear()
+        self.assertEqual(caching.content_version(), version + 1)
+
+    def test_lost_version_restarts_above_old_one(self):
+        old = caching.content_version()
+        caching.invalidate()
+        caching.state.clear()
+        self.assertGreater(caching.content_version(), old + 1)
+
+    def test_lock_is_only_released_by_its_holder(self):
+        with caching.state_lock('test-lock', 60):
+            # Our hold expired and another process took the lock
+            caching.state.set('test-lock', 'other-holder', 60)
+        self.assertEqual(caching.state.get('test-lock'), 'other-holder')
+        with self.assertRaises(caching.LockTimeout):
+            with caching.state_lock('test-lock', 0):
+                pass
+
+
+# ------------------------------------------------------------------
+# Surrogate-key purges (app/httpcache.py) through the reverse-proxy stand-in
+# ------------------------------------------------------------------
+class StorePurger:
+    def __init__(self, store):
+        self.store = store
+
+    def purge(self, keys):
+        self.store.purge(keys)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=False)
+class ProductPagePurgeTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = make_product()
+        self.store = Store()
+        self.proxy = CachingProxy(WSGIHandler(), self.store)
+        patcher = mock.patch.object(httpcache, 'get_purger', return_value=StorePurger(self.store))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self):
+        environ = {'PATH_INFO': reverse('product_detail', args=[self.product.slug])}
+        setup_testing_defaults(environ)
+        captured = {}
+        body = b''.join(self.proxy(environ, lambda status, headers: captured.update(headers)))
+        return captured['X-Cache'], body.decode()
+
+    def assert_purged_on_save(self, model, text, **fields):
+        self.assertEqual(self.fetch()[0], 'MISS')
+        self.assertEqual(self.fetch()[0], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            model.objects.create(product=self.product, **fields)
+        state, body = self.fetch()
+        self.assertEqual(state, 'MISS')
+        self.assertIn(text, body)
+
+    def test_faq_change_purges_product_page(self):
+        self.assert_purged_on_save(ProductFAQ, 'Is it anhydrous?', question='Is it anhydrous?', answer='Yes.')
+
+    def test_application_change_purges_product_page(self):
+        self.assert_purged_on_save(ProductApplication, 'Paint thinning', title='Paint thinning')
+
+
+# ------------------------------------------------------------------
+# Page cache keys (app/pagecache.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=True)
+class PageCacheKeyTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_product(grade='Industrial', boiling_point='111 °C')
+
+    def page_cache(self, query):
+        return self.client.get(reverse('products') + query).get('X-Page-Cache')
+
+    def test_known_params_share_one_entry_in_any_order(self):
+        self.assertEqual(self.page_cache('?grade=industrial&boiling_point__gte=100'), 'miss')
+        self.assertEqual(self.page_cache('?boiling_point__gte=100&grade=industrial'), 'hit')
+
+    def test_unknown_params_bypass_the_cache(self):
+        self.assertIsNone(self.page_cache('?utm_source=mail'))
+        self.assertIsNone(self.page_cache('?grade=industrial&x=1'))
+        self.assertFalse([key for key in cache._cache if 'page:products' in key])
+
+
+# ------------------------------------------------------------------
+# SEO head blocks (app/seohead.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class SeoHeadTests(CacheTestMixin, TestCase):
+    def test_category_rename_refreshes_product_heads(self):
+        product = make_product()
+        self.assertIn('"category":"Solvents"', product.seo_head)
+        category = product.category
+        category.name = 'Industrial Solvents'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        product.refresh_from_db()
+        self.assertIn('"category":"Industrial Solvents"', product.seo_head)
+        self.assertIn('Industrial Solvents', product.keywords)
+
+    def test_derived_keywords_are_not_stored(self):
+        product = make_product(meta_description='')
+        self.assertEqual(Product.objects.get(pk=product.pk).meta_keywords, '')
+        self.assertIn('Solvents', product.keywords)
+        typed = make_product('xylene', meta_keywords='xylene, mixed xylenes')
+        self.assertEqual(typed.keywords, 'xylene, mixed xylenes')
+
+    def test_content_hash_includes_category_name(self):
+        product = make_product()
+        before = seo.content_hash(product)
+        product.category.name = 'Industrial Solvents'
+        self.assertNotEqual(seo.content_hash(product), before)
+
+
+# ------------------------------------------------------------------
+# Translations (app/locales.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=False)
+class LocaleTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Requests to /es/ leave Spanish active, which would prefix reverse().
+        translation.activate('en')
+        self.addCleanup(translation.deactivate)
+
+    def test_responses_do_not_vary_on_accept_language(self):
+        for path in ('/', '/es/', reverse('healthz')):
+            response = self.client.get(path, HTTP_ACCEPT_LANGUAGE='de')
+            self.assertNotIn('accept-language', response.get('Vary', '').lower(), path)
+
+    def test_unprefixed_pages_are_english_whatever_the_header(self):
+        make_product(grade='Industrial')
+        facets.rebuild()
+        response = self.client.get(reverse('products'), HTTP_ACCEPT_LANGUAGE='es')
+        self.assertContains(response, 'Apply filters')
+
+    def test_facet_strings_are_translated(self):
+        make_product(grade='Industrial')
+        facets.rebuild()
+        response = self.client.get('/es/products')
+        self.assertContains(response, 'Aplicar filtros')
+        self.assertContains(response, 'Categoría')
+
+    def test_hreflang_lists_only_translated_languages(self):
+        product = make_product(translations={'es': {'name': 'Tolueno'}})
+        response = self.client.get(reverse('product_detail', args=[product.slug]))
+        self.assertContains(response, 'rel="alternate" hreflang="es"')
+        self.assertNotContains(response, 'rel="alternate" hreflang="fr"')
+        with self.captureOnCommitCallbacks(execute=True):
+            plain = make_product('xylene')
+        response = self.client.get(reverse('product_detail', args=[plain.slug]))
+        self.assertNotContains(response, 'rel="alternate" hreflang=')
+
+    def test_sitemap_lists_only_translated_languages(self):
+        make_product(translations={'es': {'name': 'Tolueno'}})
+        make_product('xylene')
+        body = self.client.get('/sitemap.xml').content.decode()
+        self.assertIn('/es/product/toluene/', body)
+        self.assertNotIn('/fr/product/toluene/', body)
+        self.assertNotIn('/es/product/xylene/', body)
+        self.assertIn('/product/xylene/', body)
+
+
+# ------------------------------------------------------------------
+# Migrations
+# ------------------------------------------------------------------
+class ContactProductSlugMigrationTests(TransactionTestCase):
+    """0026 turns the product names stored on Contact rows into slugs."""
+
+    before = [('app', '0025_translations')]
+    after = [('app', '0026_contact_product_slug')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes('app'))
+        category = apps.get_model('app', 'ProductCategory').objects.create(name='Solvents', slug='solvents')
+        Product = apps.get_model('app', 'Product')
+        for name, slug in (('MEA Triazine 78%', 'mea-triazine'), ('Toluene', 'toluene'),
+                           ('Xylene Mixed', 'xylene-mixed'), ('Xylene Ortho', 'xylene-ortho')):
+            Product.objects.create(category=category, name=name, slug=slug)
+        Contact = apps.get_model('app', 'Contact')
+        for product in ('MEA Triazine', 'toluene', 'Xylene', 'other', '', None, 'Unknown Stuff'):
+            Contact.objects.create(name='Buyer', email='buyer@example.com', message='Quote', product=product)
+
+    def products(self, apps):
+        return list(apps.get_model('app', 'Contact').objects.order_by('pk').values_list('product', flat=True))
+
+    def test_names_become_slugs(self):
+        apps = self.migrate(self.after)
+        self.assertEqual(self.products(apps),
+                         ['mea-triazine', 'toluene', 'Xylene', 'other', '', None, 'Unknown Stuff'])
+
+    def test_reverse_restores_names(self):
+        apps = self.migrate(self.after)
+        Product = apps.get_model('app', 'Product')
+        Product.objects.create(category=Product.objects.first().category, slug='tetramethylammonium',
+                               name='Tetramethylammonium Hydroxide Pentahydrate 25% Aqueous Solution')
+        apps.get_model('app', 'Contact').objects.create(
+            name='Buyer', email='buyer@example.com', message='Quote', product='tetramethylammonium')
+        apps = self.migrate(self.before)
+        self.assertEqual(self.products(apps), ['MEA Triazine 78%', 'Toluene', 'Xylene', 'other', '', None,
+                                               'Unknown Stuff', 'tetramethylammonium'])
+
+
+# ------------------------------------------------------------------
+# Related content (app/related.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=False)
+class RelatedContentTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for registry in (related._built, related._indexes, related._pending):
+            registry.clear()
+            self.addCleanup(registry.clear)
+        translation.activate('en')
+        self.addCleanup(translation.deactivate)
+        self.toluene = make_product(short_description='Aromatic hydrocarbon solvent for paints')
+        self.xylene = make_product('xylene', short_description='Aromatic hydrocarbon solvent for coatings')
+        alkalis = ProductCategory.objects.create(name='Alkalis', slug='alkalis', icon='bi-box')
+        self.caustic = Product.objects.create(category=alkalis, slug='caustic-soda', name='Caustic Soda',
+                                              short_description='Alkali flakes for soap making')
+
+    def related_slugs(self, product):
+        response = self.client.get(reverse('product_detail', args=[product.slug]))
+        return [p.slug for p in response.context['related_products']]
+
+    def test_same_category_fallback_until_built(self):
+        self.assertEqual(self.related_slugs(self.toluene), ['xylene'])
+
+    def test_no_fallback_once_built(self):
+        related.rebuild('product')
+        self.assertEqual(self.related_slugs(self.toluene), ['xylene'])
+        RelatedProduct.objects.filter(source=self.toluene).delete()
+        self.assertEqual(self.related_slugs(self.toluene), [])
+
+    def test_update_reloads_stored_index_after_cache_loss(self):
+        related.rebuild('product')
+        caching.state.clear()
+        with mock.patch.object(related, '_rebuild') as rebuild:
+            Product.objects.filter(pk=self.caustic.pk).update(
+                short_description='Aromatic hydrocarbon solvent blend')
+            related.update('product', self.caustic.pk)
+        rebuild.assert_not_called()
+        self.assertIn('caustic-soda', self.related_slugs(self.toluene))
+
+    def test_blocked_scoring_matches_dense(self):
+        index = related.rebuild('product')
+        dense = index._dense(np.arange(len(index.ids)))
+        expected = dense @ dense.T
+        with mock.patch.object(related, 'QUERY_ROWS', 2), mock.patch.object(related, 'TARGET_ROWS', 2):
+            neighbours = index.top_k(index.ids, 1)
+        for row, pk in enumerate(index.ids):
+            expected[row, row] = -1
+            best = int(np.argmax(expected[row]))
+            self.assertEqual([target for target, _ in neighbours[pk]],
+                             [index.ids[best]] if expected[row, best] > 0 else [])
+
+    @override_settings(RELATED_CONTENT_MAX_TERMS=4)
+    def test_vectors_are_bounded(self):
+        index = related.rebuild('product')
+        self.assertEqual(index.terms.shape, (3, 4))
+        self.assertAlmostEqual(float(np.linalg.norm(index.vector(self.toluene.pk)[1])), 1.0, places=5)
+
+    def test_update_persists_only_changed_rows(self):
+        related.rebuild('product')
+        snapshot = RelatedIndex.objects.get(kind='product').updated_at
+        Product.objects.filter(pk=self.caustic.pk).update(short_description='Aromatic hydrocarbon solvent blend')
+        related.update('product', self.caustic.pk)
+        self.assertEqual(RelatedIndex.objects.get(kind='product').updated_at, snapshot)
+        related._indexes.clear()
+        reloaded = related._load('product')
+        self.assertIn(self.caustic.pk, [target for target, _ in reloaded.neighbours[self.toluene.pk]])
+        terms, weights = reloaded.vector(self.caustic.pk)
+        self.assertIn(reloaded.vocab['aromatic'], terms)
+
+    def test_saves_in_a_burst_share_one_update(self):
+        related.rebuild('product')
+        with mock.patch.object(related.background, 'submit') as submit, \
+                self.captureOnCommitCallbacks(execute=True):
+            related.schedule_update('product', self.toluene.pk)
+            related.schedule_update('product', self.xylene.pk)
+        submit.assert_called_once_with(related._drain, 'product')
+        with mock.patch.object(related, 'update') as update:
+            related._drain('product')
+        update.assert_called_once_with('product', self.toluene.pk, self.xylene.pk)
+
+    def test_update_without_index_does_nothing(self):
+        with mock.patch.object(related, '_rebuild') as rebuild:
+            related.update('product', self.toluene.pk)
+        rebuild.assert_not_called()
+        self.assertFalse(related.built('product'))
+
+
+# ------------------------------------------------------------------
+# Slug registry (app/slugs.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=False)
+class SlugResolutionTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        slugs._local.clear()
+        self.addCleanup(slugs._local.clear)
+        translation.activate('en')
+        self.addCleanup(translation.deactivate)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = make_product()
+
+    def rename(self, new_slug):
+        self.product.slug = new_slug
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+    def test_known_slug_is_found_without_queries(self):
+        slugs.registry('product')
+        with self.assertNumQueries(0):
+            self.assertEqual(slugs.resolve('product', 'toluene'), (slugs.FOUND, 'toluene'))
+            self.assertEqual(slugs.resolve('product', 'made-up'), (slugs.MISSING, None))
+
+    def test_rename_redirects_old_slug(self):
+        self.rename('toluene-99')
+        self.assertEqual(slugs.resolve('product', 'toluene'), (slugs.REDIRECT, 'toluene-99'))
+        response = self.client.get(reverse('product_detail', args=['toluene']))
+        self.assertRedirects(response, reverse('product_detail', args=['toluene-99']),
+                             status_code=301, fetch_redirect_response=False)
+
+    def test_chained_renames_point_at_current_slug(self):
+        self.rename('toluene-99')
+        self.rename('toluene-pure')
+        self.assertEqual(slugs.resolve('product', 'toluene'), (slugs.REDIRECT, 'toluene-pure'))
+        self.assertEqual(slugs.resolve('product', 'toluene-99'), (slugs.REDIRECT, 'toluene-pure'))
+
+    def test_renaming_back_drops_the_redirect(self):
+        self.rename('toluene-99')
+        self.rename('toluene')
+        self.assertEqual(slugs.resolve('product', 'toluene'), (slugs.FOUND, 'toluene'))
+        self.assertEqual(slugs.resolve('product', 'toluene-99'), (slugs.REDIRECT, 'toluene'))
+
+    def test_unknown_slugs_404(self):
+        self.assertEqual(self.client.get(reverse('product_detail', args=['made-up'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('legacy_product', args=['made-up'])).status_code, 404)
+
+    def test_legacy_url_redirects_case_insensitively(self):
+        self.rename('toluene-99')
+        response = self.client.get(reverse('legacy_product', args=['Toluene']))
+        self.assertRedirects(response, reverse('product_detail', args=['toluene-99']),
+                             status_code=301, fetch_redirect_response=False)
+
+
+# ------------------------------------------------------------------
+# Spec parsing (app/specs.py)
+# ------------------------------------------------------------------
+class SpecParserTests(SimpleTestCase):
+    def assertParses(self, field, cases):
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(specs.parse(field, text), expected)
+
+    def test_temperature_unit_follows_the_value(self):
+        self.assertParses('boiling_point', [
+            ('100 °C (212 °F)', 100.0),
+            ('212 °F (100 °C)', 100.0),
+            ('212 degrees Fahrenheit', 100.0),
+            ('373.15 K', 100.0),
+            ('80-85 °C', 82.5),
+            ('-10 to -5 ºC', -7.5),
+            ('110.6', 110.6),
+            ('Decomposes', None),
+        ])
+
+    def test_percent_needs_sign_next_to_other_text(self):
+        self.assertParses('purity', [
+            ('USP/BP Grade 2', None),
+            ('IP/BP/USP', None),
+            ('99.5', 99.5),
+            ('Min 99%', 99.0),
+            ('≥ 99.5 %', 99.5),
+            ('35%, 40%, 45%', 45.0),
+        ])
+
+    def test_percent_ranges_give_their_midpoint(self):
+        self.assertParses('assay', [
+            ('98.0 - 102.0 %', 100.0),
+            ('98.0% - 102.0%', 100.0),
+            ('99.0 to 101.0% (on dried basis)', 100.0),
+            ('98-102', 100.0),
+            ('Grade 2 - 3 mm, 99%', 99.0),
+        ])
+
+    def test_molecular_weight_skips_formula_digits(self):
+        self.assertParses('molecular_weight', [
+            ('C7H8O3S·H2O 190.22', 190.22),
+            ('(C2H4O)n ~ 400', 400.0),
+            ('92.14 g/mol', 92.14),
+        ])
+
+    def test_density_units(self):
+        self.assertParses('density', [('0.867 g/cm³', 0.867), ('867 kg/m3', 0.867), ('1,200 g/L', 1.2)])
+
+
+# ------------------------------------------------------------------
+# Facets (app/facets.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, PAGE_CACHE_ENABLED=False)
+class FacetTests(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        facets._local.clear()
+        self.addCleanup(facets._local.clear)
+        translation.activate('en')
+        self.addCleanup(translation.deactivate)
+        make_product(grade='Industrial', form='Liquid', boiling_point='111 °C')
+        make_product('xylene', grade='Industrial/Technical', form='Liquid', boiling_point='139 °C')
+        make_product('urea', grade='Technical', form='Granules', melting_point='133 °C')
+        facets.rebuild()
+
+    def listed(self, query):
+        response = self.client.get(reverse('products') + query)
+        return sorted(product.slug for product in response.context['products']), response.context['facets']
+
+    def counts(self, options, facet):
+        group = next(group for group in options if group['name'] == facet)
+        return {option['key']: option['count'] for option in group['options']}
+
+    def test_selection_and_counts(self):
+        slugs, options = self.listed('?grade=technical')
+        self.assertEqual(slugs, ['urea', 'xylene'])
+        self.assertEqual(self.counts(options, 'grade'), {'industrial': 2, 'technical': 2})
+        self.assertEqual(self.counts(options, 'form'), {'liquid': 1, 'granules': 1})
+
+    def test_unknown_key_matches_nothing(self):
+        self.assertEqual(self.listed('?grade=nonexistent')[0], [])
+        self.assertEqual(self.listed('?grade=nonexistent&grade=technical')[0], ['urea', 'xylene'])
+
+    def test_counts_respect_spec_filters(self):
+        slugs, options = self.listed('?boiling_point__gte=120')
+        self.assertEqual(slugs, ['xylene'])
+        self.assertEqual(self.counts(options, 'grade'), {'industrial': 1, 'technical': 1})
+        self.assertEqual(self.counts(options, 'form'), {'liquid': 1})
+
+    def test_inactive_products_are_not_listed(self):
+        make_product('benzene', grade='Industrial', form='Liquid', boiling_point='80 °C', is_active=False)
+        facets.rebuild()
+        slugs, options = self.listed('')
+        self.assertEqual(slugs, ['toluene', 'urea', 'xylene'])
+        self.assertEqual(self.counts(options, 'grade'), {'industrial': 2, 'technical': 2})
+        slugs, options = self.listed('?boiling_point__lte=120')
+        self.assertEqual(slugs, ['toluene'])
+        self.assertEqual(self.counts(options, 'grade'), {'industrial': 1})
+
+    def test_update_records_change_instead_of_rewriting_index(self):
+        other_worker = facets.current()
+        Product.objects.filter(slug='urea').update(form='Powder')
+        with mock.patch.object(caching.state, 'set', wraps=caching.state.set) as state_set:
+            facets.update(Product.objects.get(slug='urea').pk)
+        self.assertNotIn(facets.INDEX_KEY, [call.args[0] for call in state_set.call_args_list])
+        facets._local['index'] = other_worker
+        self.assertEqual(self.counts(self.listed('')[1], 'form'), {'liquid': 2, 'powder': 1})
+        self.assertNotIn('powder', other_worker.bits['form'])
+
+    @mock.patch.object(facets, 'COMPACT_EVERY', 2)
+    def test_snapshot_rewritten_every_few_changes(self):
+        start = facets.current().revision
+        for slug in ('urea', 'xylene'):
+            facets.update(Product.objects.get(slug=slug).pk)
+        self.assertEqual(caching.state.get(facets.INDEX_KEY).revision, start + 2)
+        self.assertEqual(caching.state.get_many([facets._change_key(start + 1), facets._change_key(start + 2)]), {})
+        facets._local.clear()
+        self.assertEqual(facets.current().revision, start + 2)
+
+    def test_lost_index_is_rebuilt_in_background(self):
+        caching.state.clear()
+        facets._local.clear()
+        with mock.patch.object(facets.background, 'submit') as submit:
+            slugs, options = self.listed('?form=granules')
+            self.listed('')
+        submit.assert_called_once_with(facets.rebuild)
+        self.assertEqual(slugs, ['urea'])
+        self.assertEqual(options, [])
+
+
+# ------------------------------------------------------------------
+# Responsive image derivatives (app/images.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True, IMAGE_DERIVATIVE_FORMATS=('jpeg',))
+class ImageDerivativeTests(CacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        self.storage = FileSystemStorage(location=root, base_url='/media/')
+
+    def save_image(self, name, width):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2), 'teal').save(buffer, 'JPEG')
+        return self.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_widths_capped_at_largest_configured(self):
+        manifest = images.generate_derivatives(self.storage, self.save_image('big.jpg', 3000))
+        self.assertEqual([e['width'] for e in manifest['sources']['jpeg']], [320, 640, 960, 1280])
+        small = images.generate_derivatives(self.storage, self.save_image('small.jpg', 500))
+        self.assertEqual([e['width'] for e in small['sources']['jpeg']], [320, 500])
+
+    def test_fallback_src_is_mid_size(self):
+        name = self.save_image('big.jpg', 3000)
+        images.generate_derivatives(self.storage, name)
+        html = responsive_image(SimpleNamespace(storage=self.storage, name=name, url=self.storage.url(name)))
+        self.assertIn('src="/media/big.640w.jpg"', html)
+
+    def test_one_invalidation_per_object(self):
+        files = [SimpleNamespace(storage=self.storage, name=self.save_image(f'{n}.jpg', 800)) for n in 'abc']
+        with mock.patch.object(caching, 'invalidate') as invalidate:
+            images._build(files)
+        invalidate.assert_called_once_with()
+
+
+# ------------------------------------------------------------------
+# Image placeholders (app/placeholders.py)
+# ------------------------------------------------------------------
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class PlaceholderTests(CacheTestMixin, TestCase):
+    def test_refresh_leaves_invalidation_to_caller(self):
+        product = make_product()
+        Product.objects.filter(pk=product.pk).update(image_lqip='data:,', image_lqip_source='gone.jpg')
+        with mock.patch.object(caching, 'invalidate') as invalidate:
+            self.assertTrue(placeholders.refresh_placeholder(Product, product.pk))
+            self.assertFalse(placeholders.refresh_placeholder(Product, product.pk))
+        invalidate.assert_not_called()
+        self.assertEqual(Product.objects.get(pk=product.pk).image_lqip, '')
+
+    def test_background_refresh_invalidates_once_on_change(self):
+        product = make_product()
+        Product.objects.filter(pk=product.pk).update(image_lqip_source='gone.jpg')
+        with mock.patch.object(caching, 'invalidate') as invalidate:
+            placeholders.refresh_and_invalidate(Product, product.pk)
+            placeholders.refresh_and_invalidate(Product, product.pk)
+        invalidate.assert_called_once_with()
@@ -0,0 +1,183 @@
+"""
+Background upload queue for large product media (video, COA, TDS).
+
+The admin stages new files on local disk and records a ``MediaUpload`` job
+instead of pushing them to Google Drive inside the request. ``process_upload``
+claims a job, streams the staged file to the field's storage (gdstorage sends
+it in resumable 512 KB chunks) and saves the product with the uploaded file
+once it is done, so the usual save signals refresh its SEO head and purge its
+pages. The file it replaced is then deleted from the remote storage.
+
+Staged files live on the local disk of the instance that received them, so
+each job records that host and only that host's web workers run it. Failed
+jobs are retried there with exponential backoff, and workers pick up their
+host's unfinished jobs when they start (``resume``).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import background, metrics
+from .models import MediaUpload, Product
+
+logger = logging.getLogger(__name__)
+
+QUEUED_FIELDS = ('video', 'coa_pdf', 'tds_pdf')
+
+
+def staging_storage():
+    return FileSystemStorage(location=settings.UPLOAD_STAGING_ROOT)
+
+
+def staging_host():
+    return socket.gethostname()
+
+
+def enqueue(product, field_name, uploaded_file):
+    """Stage ``uploaded_file`` locally and queue it for upload to ``field_name``."""
+    staged_name = staging_storage().save(f'{field_name}/{uploaded_file.name}', uploaded_file)
+    job = MediaUpload.objects.create(
+        product=product,
+        field_name=field_name,
+        filename=os.path.basename(uploaded_file.name),
+        staged_name=staged_name,
+        staged_on=staging_host(),
+        size=uploaded_file.size or 0,
+    )
+    # Kick off the upload as soon as the admin transaction commits.
+    transaction.on_commit(lambda: background.submit(process_upload, job.pk))
+    return job
+
+
+def schedule(job):
+    """Run ``job`` in this process once its ``next_attempt_at`` has passed."""
+    delay = max(0.0, (job.next_attempt_at - timezone.now()).total_seconds())
+    timer = threading.Timer(delay, background.submit, args=(process_upload, job.pk))
+    timer.daemon = True
+    timer.start()
+
+
+class _Heartbeat:
+    """File wrapper that refreshes the job's ``updated_at`` while it is read."""
+
+    def __init__(self, fileobj, job_id):
+        self.fileobj = fileobj
+        self.job_id = job_id
+        self.beat_at = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self.fileobj, name)
+
+    def read(self, *args):
+        if time.monotonic() - self.beat_at >= settings.UPLOAD_HEARTBEAT:
+            self.beat_at = time.monotonic()
+            MediaUpload.objects.filter(pk=self.job_id, status=MediaUpload.UPLOADING).update(
+                updated_at=timezone.now())
+        return self.fileobj.read(*args)
+
+
+def _claim(job_id):
+    now = timezone.now()
+    claimed = MediaUpload.objects.filter(
+        pk=job_id, status__in=(MediaUpload.PENDING, MediaUpload.RETRY), next_attempt_at__lte=now,
+    ).update(status=MediaUpload.UPLOADING, updated_at=now)
+    return MediaUpload.objects.select_related('product').get(pk=job_id) if claimed else None
+
+
+def _delete_replaced(storage, name):
+    # Another product may still link to the same remote file.
+    in_use = Product.objects.filter(Q(video=name) | Q(coa_pdf=name) | Q(tds_pdf=name)).exists()
+    if in_use:
+        return
+    try:
+        storage.delete(name)
+        logger.info('Deleted replaced upload %s', name)
+    except Exception:
+        logger.exception('Could not delete replaced upload %s', name)
+
+
+def process_upload(job_id, storage=None):
+    """
+    Upload one queued file. Returns True when the job completed.
+
+    ``storage`` overrides the product field's storage (used by tests with a
+    fake remote backend).
+    """
+    job = _claim(job_id)
+    if job is None:
+        return False
+    field = Product._meta.get_field(job.field_name)
+    storage = storage or field.storage
+    staging = staging_storage()
+    try:
+        target = field.generate_filename(job.product, job.filename)
+        with metrics.timer('storage_call_duration_seconds', op='upload'), \
+                staging.open(job.staged_name, 'rb') as f:
+            remote_name = storage.save(target, File(_Heartbeat(f, job.pk), name=job.filename),
+                                       max_length=field.max_length)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = str(e)[:1000]
+        if job.attempts >= settings.UPLOAD_MAX_ATTEMPTS:
+            job.status = MediaUpload.FAILED
+        else:
+            job.status = MediaUpload.RETRY
+            job.next_attempt_at = timezone.now() + timedelta(seconds=30 * 2 ** job.attempts)
+        job.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'updated_at'])
+        logger.warning('Upload of %s failed (attempt %s): %s', job.staged_name, job.attempts, e)
+        if job.status == MediaUpload.RETRY:
+            schedule(job)
+        return False
+
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=job.product_id)
+        replaced = getattr(product, job.field_name).name
+        setattr(product, job.field_name, remote_name)
+        # save(), not update(): the save signals rebuild seo_head and purge the product's pages.
+        product.save(update_fields=[job.field_name])
+        job.status = MediaUpload.DONE
+        job.remote_name = remote_name
+        job.attempts += 1
+        job.last_error = ''
+        job.save(update_fields=['status', 'remote_name', 'attempts', 'last_error', 'updated_at'])
+        if replaced and replaced != remote_name:
+            transaction.on_commit(lambda: _delete_replaced(storage, replaced))
+    staging.delete(job.staged_name)
+    logger.info('Uploaded %s to %s', job.staged_name, remote_name)
+    return True
+
+
+def unfinished_jobs():
+    """This host's jobs still to run, including uploads orphaned by a crash."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.UPLOAD_STALE_AFTER)
+    # Jobs queued before staged_on existed have no host; try them here.
+    jobs = MediaUpload.objects.filter(Q(staged_on=staging_host()) | Q(staged_on=''))
+    jobs.filter(status=MediaUpload.UPLOADING, updated_at__lt=stale).update(
+        status=MediaUpload.RETRY, next_attempt_at=now, updated_at=now,
+    )
+    return list(jobs.filter(status__in=(MediaUpload.PENDING, MediaUpload.RETRY)).order_by('created_at'))
+
+
+def due_jobs():
+    """IDs of this host's jobs ready to (re)try now."""
+    now = timezone.now()
+    return [job.pk for job in unfinished_jobs() if job.next_attempt_at <= now]
+
+
+def resume():
+    """Schedule this host's unfinished jobs in this process (worker start)."""
+    jobs = unfinished_jobs()
+    for job in jobs:
+        schedule(job)
+    return len(jobs)
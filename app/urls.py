@@ -17,6 +17,7 @@ Including another URLconf
 from django.urls import path
 from django.contrib.sitemaps.views import sitemap
 from . import views
+from .httpcache import SITEMAP, cache_policy
 from .sitemaps import ProductSitemap, CompanyBlogSitemap, ProductBlogSitemap
 
 sitemaps = {
@@ -25,18 +26,32 @@ sitemaps = {
     'product_blogs': ProductBlogSitemap,
 }
 
-urlpatterns = [
+# Pages rendered per language; devapp/urls.py mounts these under
+# i18n_patterns (/es/products, /fr/product/<slug>/, ...).
+page_patterns = [
     path('', views.index, name='index'),
     path('aboutus', views.about, name='aboutus'),
     path('ourservices', views.ourservices, name='ourservices'),
     path('products', views.products, name='products'),
+    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
+]
+
+urlpatterns = [
     path('save-email/', views.save_email_for_download, name='save_email'),
     path('contact/', views.handle_contact_form, name='contact'),
     path('contact/ajax/', views.contact_ajax, name='contact_ajax'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
-    path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
+    # Legacy product URLs, redirected through app.slugs
+    path('triazine', views.triazine, name='triazine'),
+    path('products/<slug:slug>', views.legacy_product, name='legacy_product'),
+    path('product/<slug:slug>/download/<str:kind>/<str:filename>', views.download_product_file, name='download_product_file'),
+    path('files/<path:name>', views.storage_file, name='storage_file'),
+    path('img/<int:pk>/<str:key>.webp', views.image_proxy, name='image_proxy'),
     # SEO: sitemap and robots
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', cache_policy(max_age=3600, stale_while_revalidate=86400, keys=(SITEMAP,))(sitemap),
+         {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('healthz', views.healthz, name='healthz'),
+    path('readyz', views.readyz, name='readyz'),
 ]
-
@@ -3,7 +3,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
+import hmac
 import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from .models import DownloadEmail
 import logging
 from django.contrib import messages
@@ -11,51 +16,75 @@ from django.core.mail import send_mail
 from django.conf import settings
 from .forms import ContactForm
 from .models import (
-    Contact, Product, ProductCategory, CompanyInformation, 
+    Contact, Product,
     CompanyFAQ, ProductBlog, CompanyBlog
 )
-from django.db import OperationalError, ProgrammingError
+from django.core.cache import cache
+from django.db import OperationalError, ProgrammingError, connection
+from django.db.models import Q
+from django.http import Http404
+from .downloads import serve_file
+from .storage import prefetch_file_urls
+from . import caching, facets, imageproxy, locales, metrics, related, slugs, specs
+from .httpcache import BLOG_LIST, PRODUCT_LIST, cache_policy, tag
+from .pagecache import swr_page
 
 logger = logging.getLogger(__name__)
 
 
+@cache_policy(max_age=3600, stale_while_revalidate=86400, stale_if_error=86400)
 def about(request):
     return render(request, 'aboutus.html')
 
 
+@cache_policy(max_age=3600, stale_while_revalidate=86400, stale_if_error=86400)
 def ourservices(request):
     return render(request, 'ourservices.html')
 
 
+@cache_policy(max_age=300, stale_while_revalidate=3600, stale_if_error=86400, keys=(PRODUCT_LIST,))
+@swr_page('products', params=specs.PARAMS | frozenset(facets.FACETS))
 def products(request):
-    categories = ProductCategory.objects.all()
-    products = Product.objects.select_related('category').all()
+    categories = caching.categories()
+    # Range filters such as ?boiling_point__gte=100 go to the indexed spec columns.
+    queryset, spec_filters = specs.filter_products(caching.active_products(), request.GET)
+    products = list(queryset) if spec_filters else caching.product_list()
+    # Facet selections such as ?grade=industrial&form=powder are matched in memory.
+    selected = facets.selection(request.GET)
+    facet_index = facets.current()
+    within = facet_index.mask(product.pk for product in products) if facet_index and spec_filters else None
+    if selected and facet_index:
+        matching = facet_index.pks(facet_index.match(selected))
+        products = [product for product in products if product.pk in matching]
+    elif selected:
+        products = [product for product in products if facets.matches(product, selected)]
+    prefetch_file_urls(products)
+    locales.localize(*products)
+    tag(request, *categories, *products)
     
     context = {
         'categories': categories,
         'products': products,
+        'spec_filters': spec_filters,
+        'filtered': bool(spec_filters or selected),
+        'facets': facet_index.options(selected, within) if facet_index else [],
+        'spec_params': [(name, value) for name, value in request.GET.items()
+                        if name.partition('__')[0] in specs.COLUMNS],
     }
     return render(request, 'products.html', context)
 
 
 def triazine(request):
-    try:
-        pro = Product.objects.get(name='MEA TRIAZINE 78%')
-        
-        if pro.image_url:
-            image_link = pro.image_url
-        else:
-            image_link = '/static/img/default_product_image.png' 
-        context = {
-            'product': pro,
-            'triazine_image_url': image_link, 
-        }
-    except Product.DoesNotExist:
-        context = {
-            'error_message': 'Product not found.',
-            'triazine_image_url': '/static/img/product_not_found.png',
-        }
-    return render(request, 'products/MEA-Triazine.html', context)
+    """The old MEA Triazine page, now its product page."""
+    return legacy_product(request, 'mea-triazine')
+
+
+def legacy_product(request, slug):
+    """Old product URLs: a permanent redirect when the slug is known, else 404."""
+    result, target = slugs.resolve('product', slug)
+    if result == slugs.MISSING:
+        raise Http404('No such product')
+    return redirect('product_detail', slug=target, permanent=True)
 
 
 @csrf_exempt
@@ -92,22 +121,26 @@ def save_email_for_download(request):
         }, status=500)
 
 
+@cache_policy(max_age=60, stale_while_revalidate=600, stale_if_error=86400, keys=(BLOG_LIST,))
+@swr_page('index')
 def index(request):
     """Main index view that handles both GET and POST requests"""
     Faqs = CompanyFAQ.objects.all()
     # CompanyInformation may not have new columns until migrations run
     try:
-        Com_info = CompanyInformation.objects.first()
+        Com_info = caching.company_info()
     except (OperationalError, ProgrammingError) as e:
         logger.warning('CompanyInformation not available yet: %s', e)
         Com_info = None
     
     # Get recent blogs for homepage
-    recent_company_blogs = CompanyBlog.objects.all()[:3]
+    recent_company_blogs = list(CompanyBlog.objects.all()[:3])
+    locales.localize(*recent_company_blogs)
     
     if request.method == 'POST':
         return handle_contact_form(request)
     
+    tag(request, Com_info, *recent_company_blogs)
     form = ContactForm()
     context = {
         'form': form,
@@ -138,8 +171,8 @@ def handle_contact_form(request):
             
             try:
                 send_contact_email(contact)
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            except Exception:
+                logger.exception('Email sending failed for contact %s', contact.pk)
             
             if request.headers.get('Content-Type') == 'application/json':
                 return JsonResponse({
@@ -188,13 +221,14 @@ def send_contact_email(contact):
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = ['info@vasudevchemopharma.com']
     
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=from_email,
-        recipient_list=recipient_list,
-        fail_silently=False,
-    )
+    with metrics.timer('smtp_send_duration_seconds'):
+        send_mail(
+            subject=subject,
+            message=message,
+            from_email=from_email,
+            recipient_list=recipient_list,
+            fail_silently=False,
+        )
 
 
 @require_http_methods(["POST"])
@@ -209,8 +243,8 @@ def contact_ajax(request):
             
             try:
                 send_contact_email(contact)
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            except Exception:
+                logger.exception('Email sending failed for contact %s', contact.pk)
             
             return JsonResponse({
                 'success': True,
@@ -235,8 +269,15 @@ def contact_ajax(request):
         }, status=500)
 
 
-def product_detail(request, slug):    
+@cache_policy(max_age=300, stale_while_revalidate=3600, stale_if_error=86400)
+def product_detail(request, slug):
+    result, target = slugs.resolve('product', slug)
+    if result == slugs.MISSING:
+        raise Http404('No such product')
+    if result == slugs.REDIRECT:
+        return redirect('product_detail', slug=target, permanent=True)
     product = get_object_or_404(Product, slug=slug)
+    prefetch_file_urls([product])
     
     product_applications = product.applications.all() 
     product_faqs = product.faqs.all()
@@ -244,10 +285,16 @@ def product_detail(request, slug):
     # Get blogs related to this product
     product_blogs = product.Blogs.all()
     
-    related_products = Product.objects.filter(
-        category=product.category
-    ).exclude(id=product.id)[:3]
-    
+    # Precomputed by app/related.py; same-category products until build_related has run
+    related_products = list(
+        Product.objects.filter(related_from__source=product, is_active=True).order_by('related_from__rank')[:3]
+    )
+    if not related_products and not related.built('product'):
+        related_products = list(Product.objects.filter(category=product.category).exclude(id=product.id)[:3])
+    product_blogs = list(product_blogs)
+    locales.localize(product, *related_products, *product_blogs)
+
+    tag(request, product, product.category, *related_products, *product_blogs)
     context = {
         'product': product,
         'related_products': related_products,
@@ -262,7 +309,7 @@ def product_detail(request, slug):
 def blog_list(request):
     """Display all company blogs"""
     try:
-        company_info = CompanyInformation.objects.first()
+        company_info = caching.company_info()
     except (OperationalError, ProgrammingError) as e:
         logger.warning('CompanyInformation not available yet: %s', e)
         company_info = None
@@ -275,18 +322,30 @@ def blog_list(request):
     return render(request, 'blog_list.html', context)
 
 
+@cache_policy(max_age=600, stale_while_revalidate=3600, stale_if_error=86400)
 def blog_detail(request, slug):
     """Display individual blog post"""
+    result, target = slugs.resolve('companyblog', slug)
+    if result == slugs.MISSING:
+        raise Http404('No such blog post')
+    if result == slugs.REDIRECT:
+        return redirect('blog_detail', slug=target, permanent=True)
     try:
-        company_info = CompanyInformation.objects.first()
+        company_info = caching.company_info()
     except (OperationalError, ProgrammingError) as e:
         logger.warning('CompanyInformation not available yet: %s', e)
         company_info = None
     blog = get_object_or_404(CompanyBlog, slug=slug)
     
     # Get related blogs
-    related_blogs = CompanyBlog.objects.exclude(id=blog.id)[:3]
-    
+    related_blogs = list(
+        CompanyBlog.objects.filter(related_from__source=blog).order_by('related_from__rank')[:3]
+    )
+    if not related_blogs and not related.built('companyblog'):
+        related_blogs = list(CompanyBlog.objects.exclude(id=blog.id)[:3])
+    locales.localize(blog, *related_blogs)
+
+    tag(request, blog, company_info, *related_blogs)
     context = {
         'blog': blog,
         'related_blogs': related_blogs,
@@ -295,6 +354,7 @@ def blog_detail(request, slug):
     return render(request, 'blog_detail.html', context)
 
 
+@cache_policy(max_age=600, stale_while_revalidate=3600, stale_if_error=86400)
 def product_blog_detail(request, slug):
     """Display individual product blog post"""
     blog = get_object_or_404(ProductBlog, slug=slug)
@@ -304,6 +364,7 @@ def product_blog_detail(request, slug):
         product=blog.product
     ).exclude(id=blog.id)[:3]
     
+    tag(request, blog, blog.product, *related_blogs)
     context = {
         'blog': blog,
         'product': blog.product,
@@ -312,6 +373,127 @@ def product_blog_detail(request, slug):
     return render(request, 'product_blog_detail.html', context)
 
 
+def storage_file(request, name):
+    """Redirect to a media file whose storage URL is not cached yet."""
+    product_exists = Product.objects.filter(
+        Q(video=name) | Q(coa_pdf=name) | Q(tds_pdf=name)
+    ).exists()
+    if not product_exists:
+        raise Http404('File not found')
+    url = Product._meta.get_field('coa_pdf').storage.resolve_url(name)
+    if not url:
+        raise Http404('File not found')
+    return redirect(url)
+
+
+@require_http_methods(["GET", "HEAD"])
+def download_product_file(request, slug, kind, filename):
+    """Stream a product's COA, TDS or video from the local mirror."""
+    field_name = Product.DOWNLOAD_FIELDS.get(kind)
+    if not field_name:
+        raise Http404('Unknown file type')
+    product = get_object_or_404(Product, slug=slug, is_active=True)
+    file = getattr(product, field_name)
+    if not file:
+        raise Http404('File not found')
+    path = file.storage.local_path(file.name)
+    if path is None:
+        # Copying from Drive can take minutes; send this visitor to the
+        # remote file and let the next one get the local copy.
+        file.storage.mirror_in_background(file.name)
+        logger.info('Download %s/%s not mirrored yet; redirecting', slug, kind)
+        return redirect(file.url)
+    try:
+        response = serve_file(
+            request, path, os.path.basename(file.name),
+            as_attachment=(kind != 'video'),
+        )
+    except FileNotFoundError:
+        raise Http404('File not found')
+    logger.info(
+        'Download %s/%s status=%s range=%s',
+        slug, kind, response.status_code, request.headers.get('Range', '-'),
+    )
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def image_proxy(request, pk, key):
+    """Serve a product's remote image from the local proxy cache."""
+    path = imageproxy.cached_path(key)
+    if path is None:
+        product = get_object_or_404(Product, pk=pk)
+        source = product.direct_image_url
+        if not source or imageproxy.url_key(source) != key:
+            raise Http404('Unknown image')
+        try:
+            path = imageproxy.get_or_fetch(source)
+        except Exception as e:
+            logger.warning('Image proxy fetch failed for %s: %s', source, e)
+            response = redirect(source)
+            response['Cache-Control'] = 'no-cache'
+            return response
+    response = serve_file(request, path, os.path.basename(path))
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of metrics summed across workers."""
+    # Closed unless METRICS_TOKEN is set, and then only to that bearer token.
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def healthz(request):
+    """Liveness probe: the worker is up. Touches no database or template."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def _check_database():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        connection.close()
+
+
+def _check_cache():
+    token = uuid.uuid4().hex
+    cache.set('readyz', token, 10)
+    if cache.get('readyz') != token:
+        raise RuntimeError('cache round trip failed')
+
+
+_readiness_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='readyz')
+
+
+def readyz(request):
+    """Readiness probe: database and cache answer within HEALTH_CHECK_TIMEOUT."""
+    checks = {'database': _readiness_pool.submit(_check_database),
+              'cache': _readiness_pool.submit(_check_cache)}
+    deadline = time.monotonic() + settings.HEALTH_CHECK_TIMEOUT
+    results = {}
+    for name, future in checks.items():
+        try:
+            future.result(timeout=max(0, deadline - time.monotonic()))
+            results[name] = 'ok'
+        except FutureTimeout:
+            results[name] = 'timeout'
+        except Exception as e:
+            logger.warning('Readiness check %s failed: %s', name, e)
+            results[name] = 'error'
+    ok = all(result == 'ok' for result in results.values())
+    return JsonResponse({'status': 'ok' if ok else 'unavailable', 'checks': results},
+                        status=200 if ok else 503)
+
+
+@cache_policy(max_age=86400)
 def robots_txt(request):
     """Serve a robots.txt dynamically including sitemap location."""
     lines = [
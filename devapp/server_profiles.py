@@ -0,0 +1,95 @@
+"""
+Gunicorn worker profiles sized from the container's CPU and memory.
+
+``gunicorn.conf.py`` applies ``build(GUNICORN_PROFILE)``:
+
+* ``sync``: one request per process; most memory per request in flight.
+* ``gthread``: a few threads per process, so a slow SMTP send or Drive call
+  blocks one thread instead of the whole worker.
+* ``asgi``: uvicorn workers serving ``devapp.asgi`` (needs ``uvicorn``).
+
+``manage.py bench_server`` runs each profile against a fixed request mix and
+recommends the one with the best throughput per MB of RAM. This module is
+imported before Django is set up, so it must not import Django.
+"""
+import importlib.util
+import os
+
+PROFILES = ('sync', 'gthread', 'asgi')
+DEFAULT_PROFILE = 'gthread'
+
+
+def cpu_limit():
+    """CPUs available to this container (cgroup quota, then affinity)."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_limit_mb():
+    """Memory available to this container in MB (cgroup limit, then MemTotal)."""
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            value = f.read().strip()
+        if value != 'max':
+            return int(value) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return 512
+
+
+def asgi_available():
+    return importlib.util.find_spec('uvicorn') is not None
+
+
+def build(profile=None, env=os.environ):
+    """
+    Gunicorn settings for ``profile``.
+
+    ``WEB_CONCURRENCY`` and ``GUNICORN_THREADS`` override the computed worker
+    and thread counts; ``GUNICORN_WORKER_MB`` is the memory budget per worker
+    process used to cap the worker count.
+    """
+    profile = profile or env.get('GUNICORN_PROFILE', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown GUNICORN_PROFILE {profile!r}; choose from {", ".join(PROFILES)}')
+    if profile == 'asgi' and not asgi_available():
+        raise ValueError('GUNICORN_PROFILE=asgi needs uvicorn installed')
+
+    cpus = cpu_limit()
+    worker_mb = int(env.get('GUNICORN_WORKER_MB', 120))
+    by_memory = max(1, (memory_limit_mb() - 64) // worker_mb)  # leave room for the master
+    by_cpu = {'sync': 2 * cpus + 1, 'gthread': cpus + 1, 'asgi': cpus}[profile]
+    workers = int(env.get('WEB_CONCURRENCY', 0)) or max(1, min(by_cpu, by_memory))
+    threads = int(env.get('GUNICORN_THREADS', 0)) or (4 if profile == 'gthread' else 1)
+
+    settings = {
+        'workers': workers,
+        'threads': threads,
+        'worker_class': {'sync': 'sync', 'gthread': 'gthread',
+                         'asgi': 'uvicorn.workers.UvicornWorker'}[profile],
+        'wsgi_app': 'devapp.asgi:application' if profile == 'asgi' else 'devapp.wsgi:application',
+        # Recycle workers to contain slow leaks; jitter stops them all
+        # restarting at once.
+        'max_requests': int(env.get('GUNICORN_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(env.get('GUNICORN_MAX_REQUESTS_JITTER', 100)),
+        'timeout': int(env.get('GUNICORN_TIMEOUT', 30)),
+        'graceful_timeout': 20,
+        'keepalive': 5,
+    }
+    return profile, settings
@@ -1,18 +1,14 @@
 from pathlib import Path
+import logging
 import os
-from dotenv import load_dotenv
-from django.core.files.storage import FileSystemStorage
-# Import GoogleDriveStorage for use inside the conditional function
-try:
-    from gdstorage.storage import GoogleDriveStorage
-except ImportError:
-    # Allows settings to load even if gdstorage is not installed (e.g., lightweight dev environment)
-    GoogleDriveStorage = None
-
-load_dotenv() 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Only pay for python-dotenv when there is a .env file to read (local dev).
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 # =====================
 # Security
 # =====================
@@ -41,9 +37,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.RequestIDMiddleware',
+    'app.middleware.AccessLogMiddleware',
+    'app.middleware.ServerTimingMiddleware',
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'app.middleware.AnonymousSessionMiddleware',
+    'app.middleware.URLLocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -51,6 +53,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Anonymous GET/HEAD requests outside these paths skip the session entirely
+# (app.middleware.AnonymousSessionMiddleware); flash messages live in a
+# signed cookie so the contact form never creates a session row.
+SESSION_REQUIRED_PATHS = ('/admin/',)
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Public origin for canonical links and absolute URLs in precomputed SEO tags
+SITE_URL = os.getenv('SITE_URL', 'https://vasudevchemopharma.com')
+
 ROOT_URLCONF = 'devapp.urls'
 WSGI_APPLICATION = 'devapp.wsgi.application'
 
@@ -59,12 +70,13 @@ WSGI_APPLICATION = 'devapp.wsgi.application'
 # =====================
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'app.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
+                'django.template.context_processors.i18n',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 # The incorrect line 'django.template.context_processors.messages' 
@@ -109,6 +121,108 @@ MEDIA_URL = '/media/'
 # Use Path object for consistency
 MEDIA_ROOT = BASE_DIR / 'media' 
 
+# Local read-through copy of Google Drive media, served by the download view
+MEDIA_MIRROR_ROOT = Path(os.getenv('MEDIA_MIRROR_ROOT', BASE_DIR / '.media-mirror'))
+MEDIA_MIRROR_MAX_BYTES = int(os.getenv('MEDIA_MIRROR_MAX_BYTES', 2 * 1024 ** 3))
+
+# Admin media uploads are staged here before the upload queue sends them on
+UPLOAD_STAGING_ROOT = Path(os.getenv('UPLOAD_STAGING_ROOT', BASE_DIR / '.upload-staging'))
+UPLOAD_MAX_ATTEMPTS = 6
+UPLOAD_STALE_AFTER = 60 * 30  # seconds before an interrupted upload is retried
+UPLOAD_HEARTBEAT = 60  # seconds between updated_at refreshes while an upload runs
+
+# Resized copies generated for uploaded images (see app/images.py)
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280)
+IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')  # add 'avif' if Pillow supports it
+
+# Local copies of remote product image_url images (see app/imageproxy.py)
+IMAGE_PROXY_MAX_WIDTH = 1280
+IMAGE_PROXY_TIMEOUT = 10
+
+
+# =====================
+# Cache
+# =====================
+# File-based by default so every gunicorn worker on the host shares entries.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'app.cache_backends.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DJANGO_CACHE_MAX_ENTRIES', 20000)),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Content version, facet and related-content indexes (app.caching.state):
+    # a handful of long-lived keys kept apart so culling page and URL entries
+    # never drops them
+    'state': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'app.cache_backends.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_STATE_CACHE_LOCATION', str(BASE_DIR / '.cache-state')),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Company info, categories, product listing and sitemap (app/caching.py);
+# saves bump a version number, so the timeout is only a backstop
+CONTENT_CACHE_TIMEOUT = int(os.getenv('CONTENT_CACHE_TIMEOUT', 60 * 60 * 6))
+# Stale-while-revalidate page cache for index and products (app/pagecache.py):
+# seconds a page is fresh, how long a stale copy may still be served while it
+# is re-rendered in the background, and how long a request waits for another
+# worker's render on a cold miss
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true') == 'true'
+PAGE_CACHE_FRESH_FOR = int(os.getenv('PAGE_CACHE_FRESH_FOR', 60))
+PAGE_CACHE_STALE_FOR = int(os.getenv('PAGE_CACHE_STALE_FOR', 60 * 60 * 6))
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_WAIT = 2.0
+# Nearest neighbours kept per product / blog post (app/related.py)
+RELATED_CONTENT_TOP_K = int(os.getenv('RELATED_CONTENT_TOP_K', 6))
+# Heaviest terms kept per TF-IDF vector
+RELATED_CONTENT_MAX_TERMS = int(os.getenv('RELATED_CONTENT_MAX_TERMS', 64))
+
+# CDN purges on content changes (app/httpcache.py): LoggingPurger, HTTPPurger
+# (PURGE to HTTP_CACHE_PURGE_URL) or LocalProxyPurger for the in-process
+# stand-in enabled by HTTP_CACHE_LOCAL_PROXY=true
+HTTP_CACHE_LOCAL_PROXY = os.getenv('HTTP_CACHE_LOCAL_PROXY', 'false') == 'true'
+HTTP_CACHE_PURGER = os.getenv('HTTP_CACHE_PURGER', 'app.httpcache.LocalProxyPurger' if HTTP_CACHE_LOCAL_PROXY else 'app.httpcache.LoggingPurger')
+HTTP_CACHE_PURGE_URL = os.getenv('HTTP_CACHE_PURGE_URL', '')
+# Seconds /readyz waits for the database and cache
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', 2.0))
+
+# Seconds a resolved Google Drive file URL stays cached (see app/storage.py)
+STORAGE_URL_CACHE_TIMEOUT = int(os.getenv('STORAGE_URL_CACHE_TIMEOUT', 60 * 60 * 24))
+# Resolved URLs each worker also keeps in memory (least recently used dropped first)
+STORAGE_URL_LOCAL_MAX = int(os.getenv('STORAGE_URL_LOCAL_MAX', 2048))
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+
+# Sampled request capture for `manage.py replay_load` (0 disables it)
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', 0))
+ACCESS_LOG_PATH = Path(os.getenv('ACCESS_LOG_PATH', BASE_DIR / 'requests.jsonl'))
+
+
+# Server-Timing instrumentation (share of requests timed / of those, logged)
+PERF_TIMING_SAMPLE_RATE = float(os.getenv('PERF_TIMING_SAMPLE_RATE', 1.0))
+PERF_LOG_SAMPLE_RATE = float(os.getenv('PERF_LOG_SAMPLE_RATE', 0.01))
+# Only these client addresses (and logged-in staff) receive the Server-Timing header
+INTERNAL_IPS = [ip for ip in os.getenv('INTERNAL_IPS', '').split(',') if ip]
+
+
+# Per-worker metric files summed by /metrics; the view answers 403 until METRICS_TOKEN is set
+METRICS_DIR = Path(os.getenv('METRICS_DIR', BASE_DIR / '.metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+# SQL diagnostics (app.querylog): share of requests tracked, slow statement
+# threshold and how many repeats of one fingerprint count as N+1
+QUERY_LOG_SAMPLE_RATE = float(os.getenv('QUERY_LOG_SAMPLE_RATE', 0))
+QUERY_LOG_PATH = Path(os.getenv('QUERY_LOG_PATH', BASE_DIR / 'query_log.jsonl'))
+QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+QUERY_LOG_BACKUP_COUNT = 5
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', 100))
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_N_PLUS_ONE_THRESHOLD', 5))
+
 
 # =====================
 # Email
@@ -134,9 +248,20 @@ AUTH_PASSWORD_VALIDATORS = [
 # =====================
 # Localization
 # =====================
-LANGUAGE_CODE = 'en-us'
+LANGUAGE_CODE = 'en'
 TIME_ZONE = 'Asia/Kolkata'
 USE_I18N = True
+# Pages are rendered server-side in each of these (app/locales.py); English
+# URLs have no prefix, the others live under /<code>/.
+LANGUAGES = [
+    ('en', 'English'),
+    ('es', 'Español'),
+    ('fr', 'Français'),
+    ('de', 'Deutsch'),
+    ('pt', 'Português'),
+    ('ru', 'Русский'),
+]
+LOCALE_PATHS = [BASE_DIR / 'locale']
 # USE_L10N is deprecated in Django 4.0+. Using USE_TZ=True usually supersedes L10N for dates/times.
 # USE_L10N = True 
 USE_TZ = True
@@ -163,51 +288,95 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE = None
 GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE_CONTENTS = None
 GOOGLE_DRIVE_STORAGE_MEDIA_ROOT = 'vasudev_products' 
+# Media lives on Google Drive in production when the service key is present
+USE_GOOGLE_DRIVE_STORAGE = not DEBUG and bool(os.environ.get('GOOGLE_DRIVE_KEY_JSON'))
 
 
-def get_file_storage_instance():
+def build_file_storage():
     """
     Dynamically initializes and returns the correct storage backend.
-    
-    This function is used in models.py (storage=get_file_storage_instance) 
-    to defer storage initialization until runtime, preventing a crash when 
-    running manage.py commands locally without the key.
+
+    Deferring this to runtime prevents a crash when running manage.py
+    commands locally without the key.
+
+    gdstorage (and with it googleapiclient, httplib2 and protobuf) is only
+    imported here, and app.models.get_file_storage delays this call until a
+    media file is actually touched.
     """
-    
+    logger = logging.getLogger('devapp.settings')
+    from django.core.files.storage import FileSystemStorage
+
     # Check for PRODUCTION mode (not DEBUG) and if the required key is available
-    if not DEBUG and os.environ.get('GOOGLE_DRIVE_KEY_JSON'):
+    if USE_GOOGLE_DRIVE_STORAGE:
         # PRODUCTION (Koyeb) - Use Google Drive Storage
-        if GoogleDriveStorage:
-             # The storage package uses GOOGLE_DRIVE_STORAGE_... settings automatically
-            global GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE_CONTENTS
-            GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE_CONTENTS = os.environ.get('GOOGLE_DRIVE_KEY_JSON')
-            
-            print("Using Google Drive Storage...")
-            return GoogleDriveStorage()
-        else:
+        try:
+            from gdstorage.storage import GoogleDriveStorage
+        except ImportError:
             # Should not happen if gdstorage is in INSTALLED_APPS
-            print("WARNING: gdstorage not imported. Falling back to local FS.")
+            logger.warning("gdstorage not importable. Falling back to local FS.")
             return FileSystemStorage(location=MEDIA_ROOT)
+        # The storage package uses GOOGLE_DRIVE_STORAGE_... settings automatically
+        global GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE_CONTENTS
+        GOOGLE_DRIVE_STORAGE_JSON_KEY_FILE_CONTENTS = os.environ.get('GOOGLE_DRIVE_KEY_JSON')
+
+        logger.info("Using Google Drive Storage...")
+        return GoogleDriveStorage()
     else:
         # DEVELOPMENT (Local) - Use Local File System Storage
-        print("Using Local File System Storage...")
+        logger.info("Using Local File System Storage...")
         return FileSystemStorage(location=MEDIA_ROOT)
 
+
+def get_file_storage_instance():
+    """
+    Storage callable referenced by path from migration 0012.
+
+    Migrations are loaded by every migrate/makemigrations run, so this hands
+    back the lazy app storage instead of building the backend.
+    """
+    from app.models import get_file_storage
+    return get_file_storage()
+
+
 # This variable is referenced by models.py using 'settings.FILE_STORAGE_FUNCTION'
-FILE_STORAGE_FUNCTION = get_file_storage_instance
+FILE_STORAGE_FUNCTION = build_file_storage
 
 
 # printing logs :
+# Handlers only queue records; a listener thread per process does the I/O.
+# A full queue drops records (counted in /metrics) rather than block a request.
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # or "simple"
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "app.logutils.RequestIDFilter"},
+    },
     "formatters": {
-        "simple": {"format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"},
+        "simple": {"format": "%(asctime)s [%(levelname)s] %(name)s [%(request_id)s]: %(message)s"},
+        "json": {"()": "app.logutils.JSONFormatter"},
+        "raw": {"format": "%(message)s"},
     },
     "handlers": {
         "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "simple",
+            "()": "app.logutils.AsyncHandler",
+            "maxsize": LOG_QUEUE_SIZE,
+            "formatter": LOG_FORMAT,
+            "filters": ["request_id"],
+        },
+        "querylog": {
+            "()": "app.logutils.AsyncHandler",
+            "target": "logging.handlers.RotatingFileHandler",
+            "target_kwargs": {
+                "filename": QUERY_LOG_PATH,
+                "maxBytes": QUERY_LOG_MAX_BYTES,
+                "backupCount": QUERY_LOG_BACKUP_COUNT,
+                "delay": True,
+            },
+            "maxsize": LOG_QUEUE_SIZE,
+            "formatter": "raw",
         },
     },
     "root": {
@@ -215,11 +384,12 @@ LOGGING = {
         "level": "INFO",
     },
     "loggers": {
-        "django": {"handlers": ["console"], "level": "INFO", "propagate": True},
+        "django": {"handlers": ["console"], "level": "INFO", "propagate": False},
         "django.request": {
             "handlers": ["console"],
             "level": "ERROR",
             "propagate": False
         },
+        "app.querylog": {"handlers": ["querylog"], "level": "INFO", "propagate": False},
     },
 }
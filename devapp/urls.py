@@ -17,9 +17,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
+from django.conf.urls.i18n import i18n_patterns
 from django.conf.urls.static import static
 
+from app.urls import page_patterns
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('app.urls')),  # Include app URLs
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + i18n_patterns(
+    *page_patterns,
+    prefix_default_language=False,
+) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -15,3 +15,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devapp.settings')
 
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.HTTP_CACHE_LOCAL_PROXY:
+    # Serve cacheable pages from memory, like the CDN would (app/localproxy.py).
+    from app.localproxy import CachingProxy
+    application = CachingProxy(application)
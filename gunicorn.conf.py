@@ -0,0 +1,66 @@
+"""
+Gunicorn settings (picked up automatically from the working directory).
+
+With preload_app the master imports Django, the URLconf and the templates
+once and workers fork from that warm process, which keeps Koyeb scale-up
+cold starts short.
+
+Worker class, counts and recycling come from devapp/server_profiles.py;
+pick one with GUNICORN_PROFILE (sync, gthread or asgi). ``manage.py
+bench_server`` measures them against each other.
+"""
+import os
+
+from devapp.server_profiles import build
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true') == 'true'
+
+profile, _settings = build()
+workers = _settings['workers']
+threads = _settings['threads']
+worker_class = _settings['worker_class']
+wsgi_app = _settings['wsgi_app']
+max_requests = _settings['max_requests']
+max_requests_jitter = _settings['max_requests_jitter']
+timeout = _settings['timeout']
+graceful_timeout = _settings['graceful_timeout']
+keepalive = _settings['keepalive']
+
+
+def on_starting(server):
+    # Drop per-worker metric files left by a previous master.
+    import shutil
+    shutil.rmtree(os.getenv('METRICS_DIR', os.path.join(os.path.dirname(__file__), '.metrics')), ignore_errors=True)
+
+
+def child_exit(server, worker):
+    # Fold the dead worker's metrics into retired.json so its file goes away.
+    from app import metrics
+    metrics.retire(worker.pid, os.getenv('METRICS_DIR', os.path.join(os.path.dirname(__file__), '.metrics')))
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork.
+    server.log.info('Profile %s: %s x %s, %s thread(s) each', profile, workers, worker_class, threads)
+    if preload_app:
+        from app.startup import warm_imports
+        warm_imports()
+
+
+def post_worker_init(worker):
+    # Fill the content caches before the worker takes its first request.
+    try:
+        from django.conf import settings
+        from django.db import connections
+        from app import background, pagecache, uploads, views  # noqa: F401 -- views registers the cached pages
+        from app.caching import warm
+        warm()
+        # Staged uploads live on this host's disk; its workers finish them.
+        uploads.resume()
+        # Every language's cached pages, rendered off the boot path; the page
+        # locks let one worker render each page while the others skip it.
+        if settings.PAGE_CACHE_ENABLED:
+            background.submit(pagecache.prerender_all)
+        connections.close_all()
+    except Exception:
+        worker.log.exception('Cache warm-up failed')